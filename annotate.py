@@ -0,0 +1,101 @@
+"""
+Shared annotation helpers for model plugins.
+
+Plugins used to draw landmark by landmark: a pair of hands was over a
+hundred cv2 calls per frame, each preceded by Python-side coordinate
+conversion. These helpers take whole arrays (every hand, every box of the
+frame), convert them to ints once, and draw object by object:
+
+- draw_skeletons: the bones of a skeleton in one cv2.polylines call, with
+  invisible joints masked out over all skeletons at once
+- draw_points: joint dots, optionally labelled (e.g. landmark indices)
+- draw_boxes: box outlines with an optional label above each
+- draw_name_tags: boxes in their own colours, each with a filled name bar
+
+Objects are drawn one after the other, not grouped by primitive (all
+boxes, then all labels): the frame has usually just been decoded and is
+larger than the CPU cache, and drawing each object's box and label together
+touches its pixels once. Labels are drawn by cv2.putText, which rasterizes
+and antialiases one in a few microseconds; blitting pre-rendered sprites
+with NumPy measured slower (benchmarks/bench_render.py).
+"""
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+_pair_cache = {}
+
+
+def _pairs(connections):
+    """[C, 2] index array of a connection set (MediaPipe's are reused every frame)"""
+    entry = _pair_cache.get(id(connections))
+    if entry is None or entry[0] is not connections:
+        entry = _pair_cache[id(connections)] = (connections, np.asarray(list(connections), np.intp).reshape(-1, 2))
+    return entry[1]
+
+
+def draw_skeletons(frame, skeletons, connections, color, thickness=1, visible=None):
+    """
+    Bones between the `connections` pairs of each [K, 2+] skeleton in
+    `skeletons` ([N, K, 2+]). With `visible` ([N, K] bool) a bone is only
+    drawn if both its ends are visible.
+    """
+    skeletons = np.asarray(skeletons)
+    if not skeletons.size:
+        return frame
+    pairs = _pairs(connections)
+    points = skeletons[..., :2].astype(np.int32).reshape(-1, skeletons.shape[-2], 2)
+    if visible is not None:
+        visible = np.asarray(visible, bool).reshape(len(points), -1)
+        shown = visible[:, pairs[:, 0]] & visible[:, pairs[:, 1]]  # [N, C]
+    for i, joints in enumerate(points):
+        bones = pairs if visible is None else pairs[shown[i]]
+        if len(bones):
+            cv2.polylines(frame, joints[bones], False, color, thickness)  # [C, 2, 2]: one 2-point line per bone
+    return frame
+
+
+def draw_points(frame, points, color, radius, thickness=-1, labels=None, label_color=None,
+                label_offset=(5, -5), scale=0.4, label_thickness=1, font=FONT):
+    """A dot at each of `points` [..., 2+], followed by `labels[i]` (if given) next to it"""
+    points = np.asarray(points)
+    points = points[..., :2].reshape(-1, 2).astype(np.int32).tolist()
+    if labels is None:
+        for center in points:
+            cv2.circle(frame, center, radius, color, thickness)
+        return frame
+    dx, dy = label_offset
+    label_color = color if label_color is None else label_color
+    for (x, y), label in zip(points, labels):
+        cv2.circle(frame, (x, y), radius, color, thickness)
+        cv2.putText(frame, label, (x + dx, y + dy), font, scale, label_color, label_thickness)
+    return frame
+
+
+def draw_boxes(frame, boxes, color, thickness=2, labels=None, label_offset=(0, -8), scale=0.7,
+               label_thickness=2, font=FONT):
+    """x1, y1, x2, y2 `boxes` [N, 4+], each with `labels[i]` (if given) above its top-left corner"""
+    boxes = np.asarray(boxes)
+    boxes = boxes[..., :4].reshape(-1, 4).astype(np.int32).tolist()
+    if labels is None:
+        for x1, y1, x2, y2 in boxes:
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, thickness)
+        return frame
+    dx, dy = label_offset
+    for (x1, y1, x2, y2), label in zip(boxes, labels):
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, thickness)
+        cv2.putText(frame, label, (x1 + dx, y1 + dy), font, scale, color, label_thickness)
+    return frame
+
+
+def draw_name_tags(frame, boxes, colors, names, bar_height=35, thickness=2, text_color=(255, 255, 255),
+                   scale=0.8, font=cv2.FONT_HERSHEY_DUPLEX):
+    """x1, y1, x2, y2 `boxes` [N, 4+] outlined in `colors[i]`, with `names[i]` on a filled bar along the bottom"""
+    boxes = np.asarray(boxes)
+    boxes = boxes[..., :4].reshape(-1, 4).astype(np.int32).tolist()
+    for (x1, y1, x2, y2), color, name in zip(boxes, colors, names):
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, thickness)
+        cv2.rectangle(frame, (x1, y2 - bar_height), (x2, y2), color, cv2.FILLED)
+        cv2.putText(frame, name, (x1 + 6, y2 - 6), font, scale, text_color, 1)
+    return frame
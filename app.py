@@ -1,19 +1,26 @@
 # app.py
 import cv2
 import uvicorn
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import StreamingResponse, JSONResponse, FileResponse
+from fastapi import FastAPI, Request, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, FileResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-import numpy as np
 import os
-import importlib.util
 import json
 import threading
 import time
 import logs
+import metrics
+import pipeline
 import argparse
+import asyncio
+from broadcast import AsyncNotifier
+from registry import ModelRegistry, rss_bytes
+from frame_context import FrameContext
+from scheduler import DetectionScheduler
+from motion import MotionGate
+from recorder import FlightRecorder, RecordedModel
 from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 # === CRITICAL FIX: Increase FFmpeg timeouts (prevents 30s disconnects) ===
 os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = (
@@ -35,15 +42,28 @@ async def lifespan(app: FastAPI):
         json.dump(models, f, indent=2)
     logs.log("App", f"Generated static models.json with {len(models)} models", "INFO")
 
-    # Start processing thread
-    thread = threading.Thread(target=processing_loop, daemon=True)
-    thread.start()
+    if not sources:
+        add_source(DEFAULT_SOURCE, 0 if standalone_mode else SERVER_URL)
+
+    # Let the publish threads wake async /video_feed and /ws/results clients
+    # (and any thread that logs wake /api/logs/stream clients) on this loop
+    log_notifier.attach_loop(asyncio.get_running_loop())
+    for source in sources.values():
+        source.broadcaster.attach_loop(asyncio.get_running_loop())
+        source.results_feed.attach_loop(asyncio.get_running_loop())
+
+    # Start capture / inference / publish threads for every source
+    start_pipeline()
 
     yield  # App runs here
 
     # --- Shutdown ---
     global running
     running = False
+    for source in sources.values():
+        if source.recorder is not None:
+            source.recorder.close()
+    registry.close()
     logs.log("App", "Shutting down...", "INFO")
 
 
@@ -57,13 +77,36 @@ app.mount("/js", StaticFiles(directory="static/js"), name="js")
 
 # === Global State ===
 SERVER_URL = "http://10.52.156.118:8000/video_feed"  # Change if needed
+DEFAULT_SOURCE = "drone"
 current_model = None
-current_model_name = "opencv"  # Default fallback
-latest_processed_frame = None
-model_module = None
-video_capture = None
+registry = ModelRegistry("models", max_models=3)  # Warm LRU cache of loaded models
+model_executor = None  # Multi-model mode thread pool, sized per source in start_pipeline()
 running = True
 standalone_mode = False
+sources = {}  # name -> pipeline.VideoSource; the first one also serves /video_feed
+scheduler = DetectionScheduler(models=registry)  # Detect every K frames / within a latency budget (off by default)
+motion_gate = MotionGate()  # Skip inference on static frames (off by default)
+log_notifier = AsyncNotifier()  # Wakes /api/logs/stream clients when a log is stored
+logs.logger.listeners.append(lambda entry: log_notifier.notify())
+record_settings = None  # FlightRecorder options when --record is given
+LOG_BATCH_DELAY = 0.016  # collect logs for about one animation frame before pushing them
+
+
+def add_source(name, url):
+    if name in sources:
+        raise ValueError(f"Duplicate video source: {name}")
+    sources[name] = pipeline.VideoSource(name, url)
+    return sources[name]
+
+
+def get_source(name=None):
+    """Look up a source by name (default: the first one), 404 if unknown"""
+    if name is None:
+        return next(iter(sources.values()))
+    source = sources.get(name)
+    if source is None:
+        raise HTTPException(status_code=404, detail=f"Unknown video source: {name}")
+    return source
 
 
 def get_models():
@@ -82,80 +125,239 @@ def get_models():
     return model_list
 
 
-def load_model(model_id):
-    global model_module, current_model_name
-    model_path = os.path.join("models", model_id, "main.py")
-    if not os.path.exists(model_path):
-        logs.log("App", f"Model {model_id} not found", "ERROR")
-        return False
+def log_switch(info):
+    label = " + ".join(info["model_ids"])
+    if info["superseded"]:
+        logs.log("App", f"Loaded model {label} (superseded by a newer selection)", "INFO")
+    elif info["cached"]:
+        logs.log("App", f"Switched to cached model: {label} in {info['switch_ms']} ms", "SUCCESS")
+    else:
+        logs.log("App", f"Loaded model: {label} in {info['load_ms']:.0f} ms", "SUCCESS")
 
+
+def load_model(model_id):
+    """Warm up `model_id` (an id or list of ids) and swap it in once ready. Returns switch info or None"""
     try:
-        spec = importlib.util.spec_from_file_location("model_main", model_path)
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-        model_module = module
-        current_model_name = model_id
-        logs.log("App", f"Loaded model: {model_id}", "SUCCESS")
-        return True
+        info = registry.activate(model_id).result()
     except Exception as e:
         logs.log("App", f"Failed to load model {model_id}: {e}", "ERROR")
-        return False
+        return None
+    log_switch(info)
+    return info
 
 
-def processing_loop():
-    global latest_processed_frame, video_capture, model_module, standalone_mode
-
+def capture_loop(source):
+    """Stage 1: keep reading the video source and hand only the newest frame on"""
     retry_delay = 2
+    seq = 0
+    stats = source.stage_stats
     while running:
-        if video_capture is None or not video_capture.isOpened():
+        if source.capture is None or not source.capture.isOpened():
             while running:
                 try:
-                    logs.log("App", "Connecting to video source...", "INFO")
-                    if standalone_mode:
-                        video_capture = cv2.VideoCapture(0)
-                        logs.log("App", "Opened laptop webcam", "SUCCESS")
+                    logs.log("App", "Connecting to video source...", "INFO", stream=source.name)
+                    source.capture = pipeline.open_capture(source.url)
+                    if isinstance(source.url, int):
+                        logs.log("App", "Opened laptop webcam", "SUCCESS", stream=source.name)
                     else:
-                        video_capture = cv2.VideoCapture(SERVER_URL)
                         # Optimize for low latency
-                        video_capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-                        video_capture.set(cv2.CAP_PROP_FPS, 30)
+                        source.capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+                        source.capture.set(cv2.CAP_PROP_FPS, 30)
 
-                    if video_capture.isOpened():
-                        logs.log("App", "Connected to Drone Server Feed", "SUCCESS")
+                    if source.capture.isOpened():
+                        logs.log("App", "Connected to Drone Server Feed", "SUCCESS", stream=source.name)
                         retry_delay = 2  # Reset backoff
                         break
                     else:
                         raise Exception("VideoCapture failed to open")
                 except Exception as e:
-                    if video_capture:
-                        video_capture.release()
-                        video_capture = None
-                    logs.log("App", f"Connection failed: {e}. Retrying in {retry_delay}s...", "WARNING")
+                    if source.capture:
+                        source.capture.release()
+                        source.capture = None
+                    logs.log("App", f"Connection failed: {e}. Retrying in {retry_delay}s...", "WARNING",
+                             stream=source.name)
                     time.sleep(retry_delay)
                     retry_delay = min(retry_delay * 2, 30)  # Exponential backoff
 
-        ret, frame = video_capture.read()
+        t0 = time.monotonic()
+        ret, frame = source.capture.read()
         if not ret:
-            logs.log("App", "Frame read failed. Reconnecting...", "WARNING")
-            video_capture.release()
-            video_capture = None
+            logs.log("App", "Frame read failed. Reconnecting...", "WARNING", stream=source.name)
+            stats["capture"].errors += 1
+            source.reconnects += 1
+            source.capture.release()
+            source.capture = None
             time.sleep(0.5)
             continue
 
-        # Process frame with current model
-        if model_module and hasattr(model_module, 'process_frame'):
+        seq += 1
+        now = time.monotonic()
+        stats["capture"].record(now - t0)
+        # Drop-oldest: if inference is still busy, the previous frame is replaced
+        packet = pipeline.FramePacket(seq, frame, captured_at=now)
+        packet.recorded = getattr(source.capture, "last_results", None)  # replay: sources only
+        source.capture_slot.put(packet)
+        stats["capture"].dropped = source.capture_slot.dropped
+
+
+def processing_loop(source):
+    """Stage 2: run the active model(s) on the freshest captured frame whenever free"""
+    stats = source.stage_stats
+    while running:
+        packet = source.capture_slot.get(timeout=0.5)
+        if packet is None:
+            continue
+
+        # Take one reference so a model switch can't swap the set mid-frame; the
+        # registry doesn't close a model evicted by a switch until this frame is done
+        with registry.using() as active:
+            models = [(name, m) for name, m in active if hasattr(m, 'process_frame') or pipeline.is_structured(m)]
+            # Derived views (RGB, downscales, pose) are computed once per frame and shared.
+            # The source name lets models keep per-stream state and batch across streams.
+            context = FrameContext(packet.frame, seq=packet.seq, timestamp=packet.captured_at, source=source.name)
+            t0 = time.monotonic()
+            gate = motion_gate if motion_gate.enabled and models else None
+            if gate is not None and gate.check(context, [name for name, _ in models]):
+                # Nothing moved since the models last ran: show their results again
+                gate.reuse(source.name, packet)
+            elif models:
+                # Several models run concurrently on the same frame, so latency
+                # follows the slowest one. Structured models only produce results
+                # here; drawing is left to the publish stage.
+                packet.output, packet.results, packet.model_logs, errors = pipeline.run_models(
+                    models, packet.frame, model_executor, context, scheduler, gate)
+                for name, e in errors.items():
+                    logs.log("App", f"Model processing error ({name}): {e}", "ERROR", stream=source.name)
+                    stats["inference"].errors += 1
+                if gate is not None:
+                    if errors:
+                        gate.invalidate(source.name)
+                    else:
+                        gate.update(context, models, packet)
+            else:
+                packet.output = packet.frame
+                if packet.recorded:
+                    # A replayed flight with no model active: show what was detected when it was recorded
+                    packet.results = [(model_id, RecordedModel, d) for model_id, d in packet.recorded]
+            packet.inferred_at = time.monotonic()
+            stats["inference"].record(packet.inferred_at - t0)
+
+        source.result_slot.put(packet)
+        stats["inference"].dropped = source.result_slot.dropped
+
+
+def publish_loop(source):
+    """Stage 3: hand processed frames to viewers and flush model logs"""
+    broadcaster = source.broadcaster
+    while running:
+        packet = source.result_slot.get(timeout=0.5)
+        if packet is None:
+            continue
+
+        results = [(name, det) for name, _, det in packet.results]
+        if results:
+            source.results_feed.publish(packet.seq, packet.captured_at, packet.frame.shape, results)
+        if source.recorder is not None:
+            # Wall-clock capture time, so recordings can be searched by time of flight
+            captured = time.time() - (time.monotonic() - packet.captured_at)
+            source.recorder.record(packet.seq, captured, frame=packet.frame, results=results)
+        if packet.results:
+            # Annotation is only worth doing if somebody is watching the video
+            if broadcaster.viewers > 0:
+                output = packet.output
+                if source.recorder is not None and output is packet.frame:
+                    output = output.copy()  # the recorder may still be encoding the raw frame
+                try:
+                    packet.output = pipeline.render(output, packet.results)
+                except Exception as e:
+                    # A failing draw() must not stop the stream: show the frame unannotated
+                    logs.log("App", f"Drawing error: {e}", "ERROR", stream=source.name)
+                    source.stage_stats["publish"].errors += 1
+                    packet.output = packet.frame
+
+        broadcaster.publish(packet.output)
+        for name, l in packet.model_logs:
+            logs.log(name, l, "AI", stream=source.name)
+        # End-to-end latency: from the frame leaving the capture stage to reaching viewers
+        source.stage_stats["publish"].record(time.monotonic() - packet.captured_at)
+
+
+def start_pipeline():
+    global model_executor
+    # Every source's inference thread may fan out to the pool at once
+    model_executor = ThreadPoolExecutor(max_workers=4 * len(sources), thread_name_prefix="model")
+    for source in sources.values():
+        if record_settings is not None:
+            settings = dict(record_settings, directory=os.path.join(record_settings["directory"], source.name))
+            source.recorder = FlightRecorder(**settings)
+            logs.log("App", f"Recording to {settings['directory']}", "INFO", stream=source.name)
+        for target in (capture_loop, processing_loop, publish_loop):
+            threading.Thread(target=target, args=(source,), name=f"{target.__name__}-{source.name}",
+                             daemon=True).start()
+
+
+def get_pipeline_stats():
+    # The first source's stages stay at the top level; every source is under "sources"
+    result = get_source().stats()
+    if len(sources) > 1:
+        result["sources"] = {name: source.stats() for name, source in sources.items()}
+    # Models may report their own counters (e.g. encoder calls skipped)
+    model_stats = {}
+    for name, module in registry.active:
+        if hasattr(module, 'get_stats'):
             try:
-                processed, model_logs = model_module.process_frame(frame)
-                latest_processed_frame = processed
-                for l in model_logs:
-                    logs.log(current_model_name, l, "AI")
+                model_stats[name] = module.get_stats()
             except Exception as e:
-                logs.log("App", f"Model processing error: {e}", "ERROR")
-                latest_processed_frame = frame
-        else:
-            latest_processed_frame = frame
-
-        time.sleep(0.01)  # ~100 FPS processing max
+                model_stats[name] = {"error": str(e)}
+    if model_stats:
+        result["models"] = model_stats
+    if scheduler.enabled:
+        result["scheduler"] = scheduler.stats()
+    if motion_gate.enabled:
+        result["motion"] = motion_gate.stats()
+    return result
+
+
+def collect_metrics():
+    """Counters and gauges read when /metrics is scraped: (name, type, labels, value)"""
+    samples = []
+    for name, source in sources.items():
+        for stage, stats in source.stage_stats.items():
+            labels = {"source": name, "stage": stage}
+            snapshot = stats.snapshot()
+            samples.append(("drone_stage_frames_total", "counter", labels, snapshot["frames"]))
+            samples.append(("drone_stage_dropped_frames_total", "counter", labels, snapshot["dropped"]))
+            samples.append(("drone_stage_errors_total", "counter", labels, snapshot["errors"]))
+            samples.append(("drone_stage_fps", "gauge", labels, snapshot["fps"]))
+        samples.append(("drone_source_reconnects_total", "counter", {"source": name}, source.reconnects))
+        samples.append(("drone_video_viewers", "gauge", {"source": name}, source.broadcaster.viewers))
+        samples.append(("drone_jpeg_encodes_total", "counter", {"source": name}, source.broadcaster.encode_count))
+        if source.recorder is not None:
+            recorder_stats = source.recorder.stats()
+            samples.append(("drone_recorder_frames_total", "counter", {"source": name}, recorder_stats["frames"]))
+            samples.append(("drone_recorder_dropped_total", "counter", {"source": name}, recorder_stats["dropped"]))
+            samples.append(("drone_recorder_written_bytes_total", "counter", {"source": name},
+                            recorder_stats["bytes_written"]))
+            samples.append(("drone_recorder_queued_bytes", "gauge", {"source": name}, recorder_stats["queued_bytes"]))
+    for entry in registry.status()["cached"]:
+        samples.append(("drone_model_memory_bytes", "gauge", {"model": entry["id"]},
+                        int(entry["memory_mb"] * 1024 * 1024)))
+    samples.append(("drone_process_resident_memory_bytes", "gauge", {}, rss_bytes()))
+    for model_id, s in scheduler.stats()["models"].items():
+        samples.append(("drone_scheduler_detect_runs_total", "counter", {"model": model_id}, s["detect_runs"]))
+        samples.append(("drone_scheduler_propagated_total", "counter", {"model": model_id}, s["propagated"]))
+        samples.append(("drone_scheduler_k", "gauge", {"model": model_id}, s["k"]))
+    for name, s in motion_gate.stats()["sources"].items():
+        samples.append(("drone_motion_frames_total", "counter", {"source": name}, s["frames"]))
+        samples.append(("drone_motion_skipped_total", "counter", {"source": name}, s["skipped"]))
+        samples.append(("drone_motion_cropped_total", "counter", {"source": name}, s["cropped"]))
+        samples.append(("drone_motion_skip_ratio", "gauge", {"source": name}, s["skip_ratio"]))
+        samples.append(("drone_motion_crop_ratio", "gauge", {"source": name}, s["crop_ratio"]))
+        samples.append(("drone_motion_changed_fraction", "gauge", {"source": name}, s["changed"]))
+    return samples
+
+
+metrics.register_collector(collect_metrics)
 
 
 # === Routes ===
@@ -172,42 +374,218 @@ def list_models():
 @app.post("/api/select_model")
 async def select_model(request: Request):
     data = await request.json()
-    model_id = data.get("model_id")
-    if load_model(model_id):
-        return {"status": "success", "message": f"Switched to model: {model_id}"}
-    else:
+    # Accepts {"model_id": "yolov8"} or a list to run together:
+    # {"model_ids": ["yolov8", "opencv-handtrack"]} (or "model_id": [...])
+    model_id = data.get("model_ids") or data.get("model_id")
+    if not model_id:
+        raise HTTPException(status_code=400, detail="No model selected")
+    # The new model warms up in the background while the current one keeps
+    # serving frames; awaiting the future doesn't block the event loop
+    try:
+        info = await asyncio.wrap_future(registry.activate(model_id))
+    except Exception as e:
+        logs.log("App", f"Failed to load model {model_id}: {e}", "ERROR")
         raise HTTPException(status_code=400, detail="Failed to load model")
+    log_switch(info)
+    label = model_id if isinstance(model_id, str) else " + ".join(model_id)
+    return {"status": "success", "message": f"Switched to model: {label}", "switch": info}
+
+
+@app.get("/api/model_status")
+def model_status():
+    return registry.status()
+
+
+@app.post("/api/reload_model")
+async def reload_model():
+    # Lets a model re-read its data (e.g. the face gallery) without a restart
+    reloadable = [(name, m) for name, m in registry.active if hasattr(m, 'reload')]
+    if not reloadable:
+        raise HTTPException(status_code=400, detail="Active model has nothing to reload")
+    changed = False
+    for name, module in reloadable:
+        if await asyncio.to_thread(module.reload):
+            changed = True
+            logs.log("App", f"Reloaded data for model: {name}", "SUCCESS")
+    return {"status": "success", "changed": changed}
+
+
+@app.get("/api/pipeline")
+def pipeline_stats():
+    return get_pipeline_stats()
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/metrics")
+def metrics_summary():
+    # p50/p95/p99 per stage, model, encode and send over the last minute, plus counters
+    return metrics.summary()
+
+
+@app.get("/api/scheduler")
+def scheduler_status():
+    return scheduler.stats()
+
+
+@app.post("/api/scheduler")
+async def configure_scheduler(request: Request):
+    # {"every": 5} runs detectors on every 5th frame; {"target_ms": 20} picks K
+    # to fit a per-frame budget ({"target_ms": 0} goes back to a fixed K)
+    data = await request.json()
+    try:
+        scheduler.configure(every=data.get("every"), target_ms=data.get("target_ms"))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid scheduler settings")
+    logs.log("App", f"Detection scheduler: every={scheduler.every}, target_ms={scheduler.target_ms}", "INFO")
+    return scheduler.stats()
+
+
+@app.get("/api/motion")
+def motion_status():
+    return motion_gate.stats()
+
+
+@app.post("/api/motion")
+async def configure_motion(request: Request):
+    # {"threshold": 0.01} skips frames with under 1% changed pixels ({"threshold": 0} turns it off);
+    # {"crop": true} lets models that support crops detect only where something moved
+    data = await request.json()
+    try:
+        motion_gate.configure(threshold=data.get("threshold"), crop=data.get("crop"), refresh=data.get("refresh"))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid motion gate settings")
+    logs.log("App", f"Motion gate: threshold={motion_gate.threshold}, crop={motion_gate.crop}", "INFO")
+    return motion_gate.stats()
+
+
+@app.get("/api/sources")
+def list_sources():
+    return [{
+        "name": name,
+        "url": str(source.url),
+        "viewers": source.broadcaster.viewers,
+        "output": source.broadcaster.stats(),
+        "pipeline": source.stats(),
+        "recorder": source.recorder.stats() if source.recorder is not None else None,
+    } for name, source in sources.items()]
+
+
+@app.get("/api/results")
+def latest_results(source: str = None):
+    payload = get_source(source).results_feed.payload()
+    if payload is None:
+        raise HTTPException(status_code=404, detail="No structured results yet")
+    return payload
+
+
+@app.websocket("/ws/results")
+async def results_socket(websocket: WebSocket, source: str = None):
+    # Pushes every new set of structured results (boxes, classes, scores,
+    # landmarks, identities) as JSON, e.g. for the autopilot
+    if source is not None and source not in sources:
+        await websocket.close(code=1008)
+        return
+    results_feed = get_source(source).results_feed
+    await websocket.accept()
+    results_feed.subscribers += 1
+
+    async def wait_for_disconnect():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    # Notice clients that leave even while no new results are arriving
+    disconnected = asyncio.create_task(wait_for_disconnect())
+    try:
+        last_seq = 0
+        while not disconnected.done():
+            payload = await results_feed.next_payload(last_seq)
+            if payload is None:
+                continue
+            last_seq = payload["seq"]
+            await websocket.send_json(payload)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        disconnected.cancel()
+        results_feed.subscribers -= 1
+
+
+def resume_id(since):
+    """A client's last log id, or 0 if it is ahead of ours (it saw the logs of an earlier run)"""
+    return 0 if since is not None and since > logs.logger.last_id else since
 
 
 @app.get("/api/logs")
-def get_logs():
-    return logs.get_all_logs()
+def get_logs(stream: str = None, since: int = None, limit: int = 100):
+    # ?since=<id> returns only entries newer than the last one the client has;
+    # ?stream=<source> keeps only the logs about one video source
+    return logs.get_all_logs(stream, resume_id(since), limit)
 
 
-def generate_processed_frames():
-    global latest_processed_frame
+async def log_events(request: Request, last_id, stream=None):
+    """Server-sent events: every new log entry, in batches, resumable by entry id"""
+    if not log_notifier.attached:
+        log_notifier.attach_loop(asyncio.get_running_loop())
     while True:
-        if latest_processed_frame is not None:
-            ret, buffer = cv2.imencode('.jpg', latest_processed_frame, [int(cv2.IMWRITE_JPEG_QUALITY), 80])
-            if ret:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
+        upto = logs.logger.last_id
+        entries = logs.get_all_logs(stream, since=last_id)
+        if entries or upto > last_id:
+            last_id = max(upto, entries[-1]["id"] if entries else 0)
+        if entries:
+            # The event id lets EventSource resume from here (Last-Event-ID) after a reconnect
+            yield f"id: {last_id}\nevent: logs\ndata: {json.dumps(entries)}\n\n"
+        if logs.logger.last_id > last_id:
+            # Logged since the read above (or while suspended at the yield): its notify()
+            # has already fired, so waiting would hold it back until the next log
+            continue
+        if await log_notifier.wait(15):
+            # Let the rest of a burst arrive so it goes out as one event
+            await asyncio.sleep(LOG_BATCH_DELAY)
         else:
-            # Placeholder frame
-            blank = np.zeros((720, 1280, 3), dtype=np.uint8)
-            cv2.putText(blank, "Waiting for video feed...", (200, 360),
-                        cv2.FONT_HERSHEY_SIMPLEX, 2, (100, 200, 255), 4)
-            ret, buffer = cv2.imencode('.jpg', blank)
-            if ret:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
+            if await request.is_disconnected():
+                break
+            yield ": keepalive\n\n"
+
+
+@app.get("/api/logs/stream")
+async def stream_logs(request: Request, since: int = None, stream: str = None):
+    last_id = request.headers.get("last-event-id")
+    if last_id is not None and last_id.isdigit():
+        since = resume_id(int(last_id))
+    elif since is not None:
+        since = resume_id(since)
+    else:
+        # Fresh client: start with the recent history, like /api/logs
+        since = max(logs.logger.last_id - 100, 0)
+    return StreamingResponse(log_events(request, since, stream), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 
-        time.sleep(0.033)  # ~30 FPS output
+def generate_processed_frames(request: Request, source, w=None, q=None, adaptive=False):
+    # Async generator woken by the broadcaster when a new frame is published:
+    # viewers don't hold a threadpool thread, so the API stays responsive
+    # with many streams open. Each frame is JPEG-encoded once per rendition
+    # (?w=640&q=60) for everyone watching that rendition.
+    broadcaster = source.broadcaster
+    return broadcaster.aframes(request.is_disconnected, rendition=broadcaster.rendition(w, q),
+                               adaptive=adaptive)
 
 
 @app.get("/video_feed")
-def video_feed():
-    return StreamingResponse(generate_processed_frames(),
+async def video_feed(request: Request, w: int = None, q: int = None, adaptive: bool = False):
+    return StreamingResponse(generate_processed_frames(request, get_source(), w, q, adaptive),
+                             media_type="multipart/x-mixed-replace; boundary=frame")
+
+
+@app.get("/video_feed/{source_name}")
+async def source_video_feed(request: Request, source_name: str, w: int = None, q: int = None,
+                            adaptive: bool = False):
+    return StreamingResponse(generate_processed_frames(request, get_source(source_name), w, q, adaptive),
                              media_type="multipart/x-mixed-replace; boundary=frame")
 
 
@@ -215,20 +593,59 @@ def video_feed():
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="AI Drone Vision App")
     parser.add_argument("--standalone", action="store_true", help="Use laptop webcam instead of drone")
-    parser.add_argument("--model", type=str, help="Load specific model on startup", default=None)
+    parser.add_argument("--model", type=str, help="Load specific model on startup (comma separated to run several)", default=None)
+    parser.add_argument("--max-models", type=int, default=3, help="Loaded models kept warm for instant switching")
+    parser.add_argument("--model-memory-mb", type=int, default=None, help="Memory budget for warm models")
+    parser.add_argument("--model-workers", action="store_true",
+                        help="Run each model in a supervised worker process (frames via shared memory)")
+    parser.add_argument("--source", action="append", default=[], metavar="NAME=URL",
+                        help="Video source, repeat for several drones (default: the drone server, or webcam with --standalone)")
+    parser.add_argument("--detect-every", type=int, default=1,
+                        help="Run detectors on every K-th frame and propagate boxes in between")
+    parser.add_argument("--latency-budget-ms", type=float, default=None,
+                        help="Pick K per model so the average inference time per frame fits this budget")
+    parser.add_argument("--motion-threshold", type=float, default=None, metavar="FRACTION",
+                        help="Skip inference while less than this fraction of pixels changed (e.g. 0.01)")
+    parser.add_argument("--motion-crop", action="store_true",
+                        help="Let models that support it detect only in the regions that changed")
+    parser.add_argument("--motion-refresh", type=float, default=2.0,
+                        help="Seconds between full runs while the scene is static")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--record", metavar="DIR", default=None,
+                        help="Record every source's frames and results under DIR/<source name>")
+    parser.add_argument("--record-segment-mb", type=int, default=256, help="Start a new segment after this size")
+    parser.add_argument("--record-segment-seconds", type=int, default=300, help="Start a new segment after this long")
     args = parser.parse_args()
 
+    scheduler.configure(every=args.detect_every, target_ms=args.latency_budget_ms)
+    motion_gate.configure(threshold=args.motion_threshold, crop=args.motion_crop, refresh=args.motion_refresh)
+
+    if args.record:
+        record_settings = {"directory": args.record,
+                           "max_segment_bytes": args.record_segment_mb * 1024 * 1024,
+                           "max_segment_seconds": args.record_segment_seconds}
+
+    registry.max_models = max(1, args.max_models)
+    registry.use_workers = args.model_workers
+    if args.model_memory_mb:
+        registry.memory_budget = args.model_memory_mb * 1024 * 1024
+
     if args.standalone:
         standalone_mode = True
         logs.log("App", "Running in standalone (webcam) mode", "INFO")
 
+    for i, spec in enumerate(args.source):
+        name, url = pipeline.parse_source(spec, DEFAULT_SOURCE if i == 0 else f"{DEFAULT_SOURCE}{i + 1}")
+        add_source(name, url)
+        logs.log("App", f"Video source {name}: {url}", "INFO")
+
     if args.model:
         logs.log("App", f"Loading requested model: {args.model}", "INFO")
-        if not load_model(args.model):
+        if not load_model(args.model.split(",")):
             logs.log("App", f"Could not load model: {args.model}", "ERROR")
     else:
         logs.log("App", "No model specified. Running in Video Only mode.", "INFO")
 
-    print("\nAI Drone Vision Server Running → http://localhost:5000")
+    print(f"\nAI Drone Vision Server Running → http://localhost:{args.port}")
     print("Press CTRL+C to stop\n")
-    uvicorn.run(app, host="0.0.0.0", port=5000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=args.port)
\ No newline at end of file
@@ -0,0 +1,134 @@
+import threading
+import time
+
+
+class _Pending:
+    __slots__ = ("item", "result", "error", "done")
+
+    def __init__(self, item):
+        self.item = item
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """
+    Collects single calls from several threads into one batched call.
+
+    Every video source's inference thread calls submit() with its freshest
+    frame and blocks until its own result is back. A worker thread runs
+    `batch_fn(items) -> results` as soon as every recently active stream has
+    an item waiting, or after waiting at most `max_wait` seconds for the
+    rest, whichever comes first. With a single stream a batch of one runs at once.
+    """
+
+    def __init__(self, batch_fn, max_batch=8, max_wait=0.02, stream_ttl=1.0, name="batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.stream_ttl = stream_ttl  # a stream silent for this long stops being waited for
+        self.name = name
+        self._cond = threading.Condition()
+        self._queue = []       # [(key, _Pending)]
+        self._first_at = None  # arrival time of the oldest queued item
+        self._seen = {}        # key -> last submit time
+        self._thread = None
+        self._closed = False
+        self.batches = 0
+        self.items = 0
+        self.full_batches = 0
+        self.wait_ms = 0.0
+        self.run_ms = 0.0
+
+    def submit(self, item, key=None):
+        """Queue `item` from stream `key` and block until its result is ready"""
+        pending = _Pending(item)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{self.name} is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            now = time.monotonic()
+            self._seen[key] = now
+            if not self._queue:
+                self._first_at = now
+            self._queue.append((key, pending))
+            self._cond.notify()
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _expected(self, now):
+        # Streams that submitted recently are worth waiting for
+        for key, seen in list(self._seen.items()):
+            if now - seen > self.stream_ttl:
+                del self._seen[key]
+        return max(1, min(len(self._seen), self.max_batch))
+
+    def _take_batch(self):
+        # The wait window opens when the worker is free, not when the oldest
+        # item arrived: items queued during the previous batch would otherwise
+        # be already overdue and go out without the callers just released by it
+        idle_since = time.monotonic()
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None, 0.0
+                if self._queue:
+                    now = time.monotonic()
+                    deadline = max(self._first_at, idle_since) + self.max_wait
+                    if len(self._queue) >= self._expected(now) or now >= deadline:
+                        break
+                    self._cond.wait(deadline - now)
+                else:
+                    self._cond.wait()
+            batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+            waited = time.monotonic() - self._first_at
+            self._first_at = time.monotonic() if self._queue else None
+            if len(batch) >= self._expected(time.monotonic()):
+                self.full_batches += 1
+            return batch, waited
+
+    def _run(self):
+        while True:
+            batch, waited = self._take_batch()
+            if batch is None:
+                return
+            t0 = time.perf_counter()
+            try:
+                results = self.batch_fn([p.item for _, p in batch])
+                for (_, p), result in zip(batch, results):
+                    p.result = result
+            except Exception as e:
+                for _, p in batch:
+                    p.error = e
+            self.batches += 1
+            self.items += len(batch)
+            self.wait_ms += waited * 1000
+            self.run_ms += (time.perf_counter() - t0) * 1000
+            for _, p in batch:
+                p.done.set()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            queued, self._queue = self._queue, []
+            self._cond.notify_all()
+        for _, p in queued:
+            p.error = RuntimeError(f"{self.name} is closed")
+            p.done.set()
+
+    def stats(self):
+        batches = max(self.batches, 1)
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": round(self.items / batches, 2),
+            "full_batches": self.full_batches,
+            "avg_wait_ms": round(self.wait_ms / batches, 2),
+            "avg_run_ms": round(self.run_ms / batches, 2),
+            "streams": len(self._seen),
+        }
@@ -0,0 +1,153 @@
+"""
+Benchmark: cross-source batched YOLO vs. one independent inference loop per source.
+
+Each synthetic source is a thread that always has a fresh frame ready (as the
+capture stage would). In "independent" mode every source owns a YOLO instance
+and calls it one frame at a time; in "batched" mode all sources go through
+the MicroBatcher used by models/yolov8, so their freshest frames share one
+forward pass. Reports total frames/sec and per-frame latency for each.
+
+    python benchmarks/bench_batched_yolo.py --sources 4 --seconds 20
+    python benchmarks/bench_batched_yolo.py --backend synthetic   # no ultralytics: batcher overhead only
+
+The synthetic backend models a forward pass on a saturated CPU as a fixed
+per-call cost plus a smaller per-frame cost, which is enough to check the
+scheduling, not YOLO itself.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from batching import MicroBatcher  # noqa: E402
+
+
+def make_frames(count, width, height, seed=0):
+    """A few distinct frames with some shapes on them so the detector has work"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(count):
+        frame = rng.integers(0, 60, size=(height, width, 3), dtype=np.uint8)
+        for _ in range(6):
+            x, y = int(rng.integers(0, width - 80)), int(rng.integers(0, height - 80))
+            color = tuple(int(c) for c in rng.integers(80, 255, size=3))
+            cv2.rectangle(frame, (x, y), (x + int(rng.integers(30, 80)), y + int(rng.integers(30, 80))), color, -1)
+        frames.append(frame)
+    return frames
+
+
+def yolo_factory(weights):
+    from ultralytics import YOLO
+
+    def new_model():
+        model = YOLO(weights)
+
+        def run(frames):
+            return model(frames, verbose=False)
+        return run
+    return new_model
+
+
+def synthetic_factory(call_ms, frame_ms):
+    # All instances share one lock: the CPU is saturated either way, so
+    # independent loops queue behind each other instead of running in parallel
+    cpu = threading.Lock()
+
+    def new_model():
+        def run(frames):
+            with cpu:
+                time.sleep((call_ms + frame_ms * len(frames)) / 1000)
+            return [None] * len(frames)
+        return run
+    return new_model
+
+
+def run_sources(n, seconds, frames, infer_for_source):
+    """Drive `n` source threads for `seconds`; infer_for_source(i) returns a frame -> result callable"""
+    counts = [0] * n
+    latencies = [[] for _ in range(n)]
+    stop = threading.Event()
+
+    def source(i):
+        infer = infer_for_source(i)
+        k = i
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            infer(frames[k % len(frames)])
+            latencies[i].append(time.perf_counter() - t0)
+            counts[i] += 1
+            k += 1
+
+    threads = [threading.Thread(target=source, args=(i,), daemon=True) for i in range(n)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    lat = np.concatenate([np.asarray(l) for l in latencies]) * 1000 if sum(counts) else np.zeros(1)
+    return {
+        "fps": sum(counts) / elapsed,
+        "per_source_fps": [round(c / elapsed, 1) for c in counts],
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p95_ms": float(np.percentile(lat, 95)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sources", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--backend", choices=("yolo", "synthetic"), default="yolo")
+    parser.add_argument("--weights", default=os.path.join(os.path.dirname(__file__), "..", "models", "yolov8", "yolov8n.pt"))
+    parser.add_argument("--max-wait-ms", type=float, default=20)
+    parser.add_argument("--call-ms", type=float, default=30, help="synthetic: fixed cost per forward pass")
+    parser.add_argument("--frame-ms", type=float, default=8, help="synthetic: extra cost per frame in a pass")
+    args = parser.parse_args()
+
+    if args.backend == "yolo":
+        weights = args.weights if os.path.exists(args.weights) else "yolov8n.pt"
+        new_model = yolo_factory(weights)
+    else:
+        new_model = synthetic_factory(args.call_ms, args.frame_ms)
+
+    frames = make_frames(8, args.width, args.height)
+    print(f"{args.sources} sources, {args.width}x{args.height}, backend={args.backend}, {args.seconds:.0f}s per mode")
+
+    # Warm up once so model load / first-call setup isn't timed
+    warm = new_model()
+    warm(frames[:1])
+    warm(frames[:args.sources])
+
+    # Independent: one model instance and one loop per source
+    models = [new_model() for _ in range(args.sources)]
+    for m in models:
+        m(frames[:1])
+    independent = run_sources(args.sources, args.seconds, frames, lambda i: lambda f: models[i]([f]))
+
+    # Batched: every source submits to one batcher over one model instance
+    batcher = MicroBatcher(warm, max_batch=max(args.sources, 1), max_wait=args.max_wait_ms / 1000)
+    batched = run_sources(args.sources, args.seconds, frames, lambda i: lambda f: batcher.submit(f, key=i))
+    stats = batcher.stats()
+    batcher.close()
+
+    print(f"{'mode':<12} {'total fps':>10} {'p50 ms':>8} {'p95 ms':>8}  per-source fps")
+    for name, r in (("independent", independent), ("batched", batched)):
+        print(f"{name:<12} {r['fps']:>10.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f}  {r['per_source_fps']}")
+    print(f"speedup: {batched['fps'] / max(independent['fps'], 1e-9):.2f}x  "
+          f"(avg batch {stats['avg_batch']}, full batches {stats['full_batches']}/{stats['batches']}, "
+          f"avg wait {stats['avg_wait_ms']} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Benchmark: opencv-face detectors on aerial frames, whole frame vs. cascaded.
+
+Runs the opencv-face plugin's detect() over a directory of frames once per
+detector mode ("frame": the whole frame at 0.25x; "pose" / "yolo": faces
+only in head regions proposed by MediaPipe Pose / YOLOv8 persons) and
+reports per mode:
+
+- latency per frame and pixels handed to dlib's face detector per frame
+- faces found, and with --annotations the recall (overall and for faces
+  smaller than --small px) and precision at IoU >= --iou
+
+Annotations are a JSON object mapping image file names to face boxes in
+pixels: {"0001.jpg": [[x1, y1, x2, y2], ...], ...}.
+
+    python benchmarks/bench_face_cascade.py --images aerial/ --annotations aerial/faces.json
+    python benchmarks/bench_face_cascade.py --images aerial/ --modes frame,pose --output faces.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(__file__))
+
+import harness  # noqa: E402
+from frame_context import FrameContext  # noqa: E402
+from registry import import_model  # noqa: E402
+
+
+def load_images(directory, count):
+    names = sorted(n for n in os.listdir(directory) if n.lower().endswith(harness.IMAGE_EXTENSIONS))[:count]
+    images = [(n, cv2.imread(os.path.join(directory, n))) for n in names]
+    images = [(n, f) for n, f in images if f is not None]
+    if not images:
+        raise SystemExit(f"No images found in {directory}")
+    return images
+
+
+def iou(a, b):
+    """IoU between every xyxy box in a [N,4] and b [M,4]"""
+    a = np.asarray(a, np.float32).reshape(-1, 4)
+    b = np.asarray(b, np.float32).reshape(-1, 4)
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+def match(found, truth, threshold):
+    """Greedy one-to-one matching. Returns a bool per truth box: was it found"""
+    hit = np.zeros(len(truth), bool)
+    if len(found) and len(truth):
+        overlaps = iou(found, truth)
+        used = set()
+        for flat in np.argsort(-overlaps, axis=None):
+            fi, ti = np.unravel_index(flat, overlaps.shape)
+            if overlaps[fi, ti] < threshold:
+                break
+            if fi not in used and not hit[ti]:
+                used.add(fi)
+                hit[ti] = True
+    return hit
+
+
+def bench_mode(module, mode, images, annotations, args):
+    module.config["detector"] = mode
+    # Warm-up: loads YOLO on first use and starts the pose graph
+    name, frame = images[0]
+    module.detect(frame, FrameContext(frame, 0, time.monotonic(), "warmup"))
+
+    durations, pixels, faces = [], [], 0
+    hits, small_hits, found_total, matched = [], [], 0, 0
+    for i, (name, frame) in enumerate(images):
+        # The frames are unrelated, so no track (or cached identity) carries over
+        with module.trackers_lock:
+            module.trackers.clear()
+        before = module.detector_stats["pixels"]
+        context = FrameContext(frame, i, time.monotonic(), "bench")
+        t0 = time.perf_counter()
+        detections = module.detect(frame, context)
+        durations.append(time.perf_counter() - t0)
+        pixels.append(module.detector_stats["pixels"] - before)
+        faces += len(detections)
+        if name in annotations:
+            truth = np.asarray(annotations[name], np.float32).reshape(-1, 4)
+            hit = match(detections.boxes, truth, args.iou)
+            hits.extend(hit.tolist())
+            small = (truth[:, 3] - truth[:, 1]) < args.small
+            small_hits.extend(hit[small].tolist())
+            found_total += len(detections)
+            matched += int(hit.sum())
+
+    wall = sum(durations)
+    result = dict(harness.latency_summary(durations),
+                  fps=round(len(durations) / wall, 2) if wall else None,
+                  detector_pixels=int(np.mean(pixels)),
+                  faces=faces)
+    if hits:
+        result["recall"] = round(float(np.mean(hits)), 3)
+        result["small_recall"] = round(float(np.mean(small_hits)), 3) if small_hits else None
+        result["precision"] = round(matched / found_total, 3) if found_total else None
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="Directory of aerial frames")
+    parser.add_argument("--annotations", help="JSON of ground-truth face boxes per image file")
+    parser.add_argument("--modes", default="frame,pose,yolo", help="opencv-face detector modes to compare")
+    parser.add_argument("--frames", type=int, default=200, help="Use at most this many images")
+    parser.add_argument("--iou", type=float, default=0.3, help="IoU that counts as a match (small boxes)")
+    parser.add_argument("--small", type=float, default=32, help="Faces shorter than this (px) are 'small'")
+    harness.add_report_arguments(parser)
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.frames)
+    annotations = {}
+    if args.annotations:
+        with open(args.annotations) as f:
+            annotations = json.load(f)
+    module = import_model(os.path.join(ROOT, "models"), "opencv-face")
+    h, w = images[0][1].shape[:2]
+    print(f"{len(images)} images ({w}x{h}), {sum(len(v) for v in annotations.values())} annotated faces")
+
+    results = {}
+    print(f"{'mode':<8} {'fps':>7} {'p50 ms':>8} {'p95 ms':>8} {'dlib px':>10} {'faces':>6} "
+          f"{'recall':>7} {'small':>7} {'prec.':>7}")
+    for mode in args.modes.split(","):
+        try:
+            r = bench_mode(module, mode, images, annotations, args)
+        except ImportError as e:
+            print(f"{mode:<8} skipped: {e}")
+            continue
+        results[f"mode:{mode}"] = r
+        print(f"{mode:<8} {r['fps']:>7.2f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['detector_pixels']:>10} "
+              f"{r['faces']:>6} {r.get('recall', '-')!s:>7} {r.get('small_recall', '-')!s:>7} "
+              f"{r.get('precision', '-')!s:>7}")
+
+    report = {
+        "benchmark": "face_cascade",
+        "timestamp": time.time(),
+        "config": {"images": args.images, "frames": len(images), "size": [w, h], "modes": args.modes,
+                   "iou": args.iou, "small": args.small, "annotations": args.annotations},
+        "environment": harness.environment(),
+        "results": results,
+    }
+    harness.finish(report, args)
+
+
+if __name__ == "__main__":
+    main()
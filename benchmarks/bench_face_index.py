@@ -0,0 +1,92 @@
+"""
+Benchmark: FaceIndex batched matching vs. the per-face compare_faces/face_distance loop.
+
+Uses synthetic 128-d embeddings (no dlib needed) and reports matches/sec at
+several gallery sizes, plus the recall of the partitioned search against
+exact search.
+
+    python benchmarks/bench_face_index.py --sizes 10,1000,50000 --faces 8
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "models", "opencv-face")))
+
+from face_index import FaceIndex  # noqa: E402
+
+
+def legacy_match(known_encodings, known_names, face_encodings, tolerance=0.6):
+    """What opencv-face did before FaceIndex (face_recognition.compare_faces + face_distance per face)"""
+    names = []
+    for enc in face_encodings:
+        # compare_faces() is face_distance() <= tolerance, so distances were computed twice
+        matches = list(np.linalg.norm(known_encodings - enc, axis=1) <= tolerance)
+        dists = np.linalg.norm(known_encodings - enc, axis=1)
+        name = "Unknown"
+        if len(dists) > 0:
+            best = np.argmin(dists)
+            if matches[best]:
+                name = known_names[best]
+        names.append(name)
+    return names
+
+
+def make_gallery(n, rng, dim=128):
+    # dlib embeddings sit on a ~unit-norm shell; identities are well separated
+    centers = rng.normal(size=(n, dim))
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    return centers, np.array([f"person_{i}" for i in range(n)], dtype=object)
+
+
+def make_queries(gallery, count, rng, noise=0.02):
+    idx = rng.integers(0, len(gallery), size=count)
+    return gallery[idx] + rng.normal(scale=noise, size=(count, gallery.shape[1])), idx
+
+
+def timed(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        out = fn()
+    return (time.perf_counter() - t0) / repeat, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,1000,50000")
+    parser.add_argument("--faces", type=int, default=8, help="Faces per frame")
+    parser.add_argument("--frames", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'gallery':>8} {'method':<12} {'matches/s':>12} {'ms/frame':>9} {'recall':>7}")
+    for n in (int(s) for s in args.sizes.split(",")):
+        gallery, names = make_gallery(n, rng)
+        queries, truth = make_queries(gallery, args.faces, rng)
+        legacy_list = [g for g in gallery]  # face_recognition took a Python list
+
+        methods = [("legacy", lambda: legacy_match(np.array(legacy_list), names, queries))]
+
+        exact = FaceIndex(gallery, names, partition_threshold=n + 1)
+        methods.append(("exact", lambda: exact.match(queries)[0]))
+        if n >= 1000:
+            t0 = time.perf_counter()
+            ivf = FaceIndex(gallery, names, partition_threshold=0)
+            build = time.perf_counter() - t0
+            methods.append(("partitioned", lambda: ivf.match(queries)[0]))
+        else:
+            build = None
+
+        for label, fn in methods:
+            per_frame, got = timed(fn, args.frames)
+            recall = np.mean([g == names[t] for g, t in zip(got, truth)])
+            print(f"{n:>8} {label:<12} {args.faces / per_frame:>12,.0f} {per_frame * 1000:>9.3f} {recall:>7.2f}")
+        if build is not None:
+            print(f"{'':>8} (partition build {build:.2f}s, once per gallery load)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Micro-benchmark: incremental MJPEGParser vs. the original find()-from-start loop.
+
+Builds a synthetic multipart stream in memory (no camera or network needed)
+and times both parsers at several chunk sizes.
+
+    python benchmarks/bench_mjpeg_parser.py --frames 60 --frame-kb 400
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mjpeg import MJPEGParser, SOI, EOI  # noqa: E402
+
+
+def make_jpeg_like(size, embed_eoi=False):
+    """Random payload framed like a JPEG. Optionally hide an FFD9 inside (e.g. an EXIF thumbnail)"""
+    body = bytearray(os.urandom(size))
+    body = body.replace(b'\xff', b'\xfe')  # no accidental markers
+    if embed_eoi:
+        mid = size // 3
+        body[mid:mid + 2] = EOI
+    return SOI + bytes(body) + EOI
+
+
+def make_stream(frames, frame_size, embed_eoi=False):
+    parts = []
+    payloads = []
+    for _ in range(frames):
+        jpg = make_jpeg_like(frame_size, embed_eoi)
+        payloads.append(jpg)
+        parts.append(b'--frame\r\nContent-Type: image/jpeg\r\n'
+                     b'Content-Length: ' + str(len(jpg)).encode() + b'\r\n\r\n' + jpg + b'\r\n')
+    return b''.join(parts), payloads
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def legacy_parse(chunks):
+    """The loop server.py used before MJPEGParser"""
+    out = []
+    bytes_data = b''
+    for chunk in chunks:
+        bytes_data += chunk
+        a = bytes_data.find(b'\xff\xd8')
+        b = bytes_data.find(b'\xff\xd9')
+        if a != -1 and b != -1:
+            out.append(bytes_data[a:b + 2])
+            bytes_data = bytes_data[b + 2:]
+    return out
+
+
+def incremental_parse(chunks):
+    parser = MJPEGParser('frame')
+    out = []
+    for chunk in chunks:
+        out.extend(parser.feed(chunk))
+    return out
+
+
+def run(name, fn, chunks, expected):
+    t0 = time.perf_counter()
+    got = fn(chunks)
+    elapsed = time.perf_counter() - t0
+    correct = sum(1 for g, e in zip(got, expected) if g == e)
+    total_mb = sum(len(c) for c in chunks) / 1e6
+    print(f"  {name:<12} {elapsed * 1000:9.1f} ms  {total_mb / elapsed:8.1f} MB/s  "
+          f"{len(got):4d} frames, {correct:4d} intact")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--frame-kb", type=int, default=400, help="Approximate JPEG size (1080p is ~300-500 KB)")
+    parser.add_argument("--chunks", type=str, default="1024,65536", help="Comma separated chunk sizes")
+    args = parser.parse_args()
+
+    for embed in (False, True):
+        data, payloads = make_stream(args.frames, args.frame_kb * 1024, embed_eoi=embed)
+        label = "with FFD9 inside payload" if embed else "clean payloads"
+        print(f"\n{args.frames} frames x {args.frame_kb} KB, {label}")
+        for size in (int(s) for s in args.chunks.split(",")):
+            chunks = chunked(data, size)
+            print(f" chunk={size} B")
+            run("legacy", legacy_parse, chunks, payloads)
+            run("incremental", incremental_parse, chunks, payloads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark: replay frames through each model plugin, without a camera.
+
+Every plugin in models/ (or the ones given with --model) is imported the way
+the app does it and fed the same frames through process_frame(), each call
+with a fresh copy of the frame and its own FrameContext. Structured plugins
+also get detect() timed on its own, which is what the pipeline runs when
+nobody watches the video. Reports throughput, latency percentiles, import
+time, peak RSS and CPU utilization per plugin.
+
+    python benchmarks/bench_models.py --seconds 10 --output models.json
+    python benchmarks/bench_models.py --video flight.mp4 --model yolov8,opencv-person
+    python benchmarks/bench_models.py --baseline models.json   # exit 1 if anything got slower
+
+Plugins whose dependencies are missing are reported with their import error
+and skipped.
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(__file__))
+
+import harness  # noqa: E402
+import pipeline  # noqa: E402
+from frame_context import FrameContext, call_with_context  # noqa: E402
+from registry import ModelRegistry  # noqa: E402
+
+
+def model_ids(models_dir, requested):
+    if requested:
+        return requested.split(",")
+    return sorted(d for d in os.listdir(models_dir)
+                  if os.path.exists(os.path.join(models_dir, d, "model.json")))
+
+
+def replay(fn, frames, seconds, warmup):
+    """Call fn(frame, context) on looped frames for `seconds`; returns per-call durations"""
+    for i in range(warmup):
+        frame = frames[i % len(frames)].copy()
+        fn(frame, FrameContext(frame, i, time.monotonic(), "bench"))
+    durations = []
+    deadline = time.perf_counter() + seconds
+    i = 0
+    while time.perf_counter() < deadline:
+        frame = frames[i % len(frames)].copy()
+        context = FrameContext(frame, i, time.monotonic(), "bench")
+        t0 = time.perf_counter()
+        fn(frame, context)
+        durations.append(time.perf_counter() - t0)
+        i += 1
+    return durations
+
+
+def bench_model(registry, model_id, frames, args):
+    try:
+        entry, _ = registry.get(model_id)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    module = entry.module
+    if not hasattr(module, "process_frame"):
+        return {"error": "no process_frame()"}
+    result = {"load_ms": round(entry.load_ms, 1), "import_memory_mb": round(entry.memory_bytes / (1024 * 1024), 1)}
+
+    with harness.ResourceMonitor() as monitor:
+        durations = replay(lambda f, c: call_with_context(module.process_frame, f, c),
+                           frames, args.seconds, args.warmup)
+    result["frames"] = len(durations)
+    result["fps"] = round(len(durations) / max(sum(durations), 1e-9), 2)
+    result.update(harness.latency_summary(durations))
+    result.update(monitor.summary())
+
+    if pipeline.is_structured(module):
+        detect = replay(lambda f, c: call_with_context(module.detect, f, c), frames, args.seconds, 0)
+        result["detect"] = dict(harness.latency_summary(detect),
+                                fps=round(len(detect) / max(sum(detect), 1e-9), 2))
+    if hasattr(module, "get_stats"):
+        try:
+            result["model_stats"] = module.get_stats()
+        except Exception:
+            pass
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="Comma separated model ids (default: every plugin in --models-dir)")
+    parser.add_argument("--models-dir", default=os.path.join(ROOT, "models"))
+    parser.add_argument("--seconds", type=float, default=10, help="Timed run per plugin")
+    parser.add_argument("--warmup", type=int, default=10, help="Untimed calls before each run")
+    harness.add_frame_arguments(parser)
+    harness.add_report_arguments(parser)
+    args = parser.parse_args()
+
+    frames = harness.load_frames(args.video, args.images, args.frames, args.width, args.height)
+    h, w = frames[0].shape[:2]
+    print(f"{len(frames)} frames ({w}x{h}), {args.seconds:.0f}s per plugin")
+
+    # Plugins load their own assets (weights, known_faces/) relative to the app directory
+    os.chdir(ROOT)
+    registry = ModelRegistry(args.models_dir, max_models=1)
+    results = {}
+    print(f"{'model':<24} {'fps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'rss MB':>8} {'cpu %':>6}")
+    for model_id in model_ids(args.models_dir, args.model):
+        r = results[model_id] = bench_model(registry, model_id, frames, args)
+        if "error" in r:
+            print(f"{model_id:<24} skipped: {r['error']}")
+            continue
+        print(f"{model_id:<24} {r['fps']:>8.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+              f"{r['peak_rss_mb']:>8.1f} {r['cpu_percent']:>6.0f}")
+        if "detect" in r:
+            d = r["detect"]
+            print(f"{'  detect() only':<24} {d['fps']:>8.1f} {d['p50_ms']:>8.2f} {d['p95_ms']:>8.2f} {d['p99_ms']:>8.2f}")
+        gc.collect()
+
+    report = {
+        "benchmark": "models",
+        "timestamp": time.time(),
+        "config": {"frames": len(frames), "size": [w, h], "seconds": args.seconds,
+                   "source": harness.frames_description(args)},
+        "environment": harness.environment(),
+        "results": results,
+    }
+    harness.finish(report, args)
+
+
+if __name__ == "__main__":
+    main()
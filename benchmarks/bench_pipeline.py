@@ -0,0 +1,250 @@
+"""
+Benchmark: the whole app.py serving pipeline, fed by a local synthetic drone.
+
+Starts an MJPEG server on localhost that streams the benchmark frames (a
+recorded video, an image directory or synthetic frames) at a fixed rate, the
+way server.py would, runs app.py against it in a subprocess, and reads
+/video_feed with a number of viewers. After a warm-up it measures, over the
+timed window:
+
+- capture / inference / publish throughput and dropped frames (/api/pipeline)
+- stage and per-model latency percentiles (/api/metrics)
+- frames delivered per viewer
+- peak RSS and CPU utilization of the app process
+
+    python benchmarks/bench_pipeline.py --seconds 20 --output pipeline.json
+    python benchmarks/bench_pipeline.py --model yolov8 --detect-every 3 --viewers 4
+    python benchmarks/bench_pipeline.py --baseline pipeline.json   # exit 1 if anything got slower
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(__file__))
+
+import harness  # noqa: E402
+from broadcast import multipart_chunk  # noqa: E402
+from mjpeg import MJPEGParser, read_chunks  # noqa: E402
+
+
+class SyntheticDrone:
+    """Serves `frames` as an endless multipart MJPEG stream at `fps` on /video_feed"""
+
+    def __init__(self, frames, fps=30, quality=85):
+        self.jpegs = [cv2.imencode(".jpg", f, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes() for f in frames]
+        self.fps = fps
+        drone = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+                self.end_headers()
+                interval = 1.0 / drone.fps
+                next_at = time.perf_counter()
+                i = 0
+                try:
+                    while True:
+                        self.wfile.write(multipart_chunk(drone.jpegs[i % len(drone.jpegs)]))
+                        i += 1
+                        next_at += interval
+                        time.sleep(max(next_at - time.perf_counter(), 0))
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/video_feed"
+        threading.Thread(target=self.server.serve_forever, name="synthetic-drone", daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def get_json(port, path):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.request("GET", path)
+        return json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+
+def wait_for_frames(port, proc, timeout):
+    """Wait until the app answers and has published at least one frame"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"app.py exited early with status {proc.returncode}")
+        try:
+            if get_json(port, "/api/pipeline")["publish"]["frames"] > 0:
+                return
+        except (OSError, ValueError, KeyError):
+            pass
+        time.sleep(0.25)
+    raise SystemExit(f"No frames published within {timeout:.0f}s")
+
+
+class Viewer(threading.Thread):
+    """Reads /video_feed and counts frames once `counting` is set"""
+
+    def __init__(self, port, path, counting, stop):
+        super().__init__(daemon=True)
+        self.port, self.path = port, path
+        self.counting, self.stop = counting, stop
+        self.frames = 0
+
+    def run(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+        try:
+            conn.request("GET", self.path)
+            response = conn.getresponse()
+            parser = MJPEGParser.from_content_type(response.getheader("Content-Type"))
+            for chunk in read_chunks(response, 64 * 1024):
+                frames = len(parser.feed(chunk))
+                if self.counting.is_set():
+                    self.frames += frames
+                if self.stop.is_set():
+                    break
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+
+def stage_window(before, after, seconds):
+    """Per-stage throughput over the timed window from two /api/pipeline snapshots"""
+    out = {}
+    for stage in ("capture", "inference", "publish"):
+        a, b = before[stage], after[stage]
+        out[stage] = {
+            "fps": round((b["frames"] - a["frames"]) / seconds, 2),
+            "dropped": b["dropped"] - a["dropped"],
+            "errors": b["errors"] - a["errors"],
+            "p50_ms": b.get("p50_ms"),
+            "p95_ms": b.get("p95_ms"),
+            "p99_ms": b.get("p99_ms"),
+        }
+    return out
+
+
+def model_latency(summary):
+    out = {}
+    for h in summary["histograms"].get("drone_model_inference_seconds", []):
+        out[f"model:{h['labels'].get('model')}"] = {k: h[k] for k in ("p50_ms", "p95_ms", "p99_ms", "mean_ms")}
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="Model id(s) for app.py --model (default: video only)")
+    parser.add_argument("--detect-every", type=int, default=1)
+    parser.add_argument("--model-workers", action="store_true", help="Run models in worker processes")
+    parser.add_argument("--motion-threshold", type=float, help="app.py --motion-threshold (e.g. 0.002)")
+    parser.add_argument("--fps", type=float, default=30, help="Rate of the synthetic drone stream")
+    parser.add_argument("--viewers", type=int, default=1, help="Concurrent /video_feed clients")
+    parser.add_argument("--feed", default="/video_feed", help="Path (and query) the viewers read")
+    parser.add_argument("--seconds", type=float, default=15, help="Timed window")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds before the timed window")
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    parser.add_argument("--app-log", default=os.devnull, help="Where app.py's output goes")
+    harness.add_frame_arguments(parser)
+    harness.add_report_arguments(parser)
+    args = parser.parse_args()
+
+    frames = harness.load_frames(args.video, args.images, args.frames, args.width, args.height)
+    drone = SyntheticDrone(frames, fps=args.fps)
+    port = free_port()
+    command = [sys.executable, "app.py", "--source", f"bench={drone.url}", "--port", str(port),
+               "--detect-every", str(args.detect_every)]
+    if args.model:
+        command += ["--model", args.model]
+    if args.model_workers:
+        command.append("--model-workers")
+    if args.motion_threshold:
+        command += ["--motion-threshold", str(args.motion_threshold)]
+    h, w = frames[0].shape[:2]
+    print(f"{len(frames)} frames ({w}x{h}) at {args.fps:g} fps -> {' '.join(command[1:])}")
+
+    with open(args.app_log, "w") as app_log:
+        proc = subprocess.Popen(command, cwd=ROOT, stdout=app_log, stderr=subprocess.STDOUT)
+    counting, stop = threading.Event(), threading.Event()
+    try:
+        wait_for_frames(port, proc, args.startup_timeout)
+        viewers = [Viewer(port, args.feed, counting, stop) for _ in range(args.viewers)]
+        for v in viewers:
+            v.start()
+        time.sleep(args.warmup)
+
+        before = get_json(port, "/api/pipeline")
+        with harness.ResourceMonitor(proc.pid) as monitor:
+            counting.set()
+            time.sleep(args.seconds)
+            counting.clear()
+        after = get_json(port, "/api/pipeline")
+        summary = get_json(port, "/api/metrics")
+    finally:
+        stop.set()
+        proc.send_signal(signal.SIGINT)
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        drone.close()
+
+    stages = stage_window(before, after, monitor.wall)
+    viewer_fps = [round(v.frames / monitor.wall, 2) for v in viewers]
+    pipeline = dict(stages["publish"], **monitor.summary(),
+                    viewer_fps=round(min(viewer_fps), 2) if viewer_fps else None)
+    results = {"pipeline": pipeline}
+    results.update({f"stage:{name}": s for name, s in stages.items()})
+    results.update(model_latency(summary))
+
+    print(f"{'stage':<12} {'fps':>8} {'dropped':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, s in stages.items():
+        print(f"{name:<12} {s['fps']:>8.1f} {s['dropped']:>8} {s['p50_ms'] or 0:>8.2f} "
+              f"{s['p95_ms'] or 0:>8.2f} {s['p99_ms'] or 0:>8.2f}")
+    for name, m in model_latency(summary).items():
+        print(f"{name:<24} p50 {m['p50_ms']} ms  p95 {m['p95_ms']} ms  p99 {m['p99_ms']} ms")
+    motion = after.get("motion", {}).get("sources", {}).get("bench")
+    if motion is not None:
+        print(f"motion gate: {motion['skip_ratio']:.0%} of frames skipped")
+    print(f"viewers: {viewer_fps} fps   app: peak RSS {pipeline['peak_rss_mb']} MB, "
+          f"CPU {pipeline['cpu_percent']}% of one core")
+
+    report = {
+        "benchmark": "pipeline",
+        "timestamp": time.time(),
+        "config": {"frames": len(frames), "size": [w, h], "source_fps": args.fps, "seconds": args.seconds,
+                   "model": args.model, "detect_every": args.detect_every, "model_workers": args.model_workers,
+                   "motion_threshold": args.motion_threshold, "viewers": args.viewers,
+                   "feed": args.feed, "source": harness.frames_description(args)},
+        "environment": harness.environment(),
+        "results": results,
+    }
+    harness.finish(report, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Benchmark: per-frame annotation cost, before and after the annotate helpers.
+
+Draws synthetic detections the way the plugins' draw() did before (one
+cv2.line / circle / rectangle / putText call per bone, joint, box and label,
+with per-point coordinate conversion) and the way they do now (annotate's
+draw_skeletons / draw_points / draw_boxes), on a freshly copied frame as in
+the publish stage. Both run interleaved, so they see the same machine load.
+Reports per scenario the time per frame for both, the speedup, and the
+largest pixel difference between the two outputs.
+
+Scenarios: two hands with index labels (handtrack), one pose skeleton with
+visibility (personskeleton, which keeps per-call drawing since the helpers
+measured slower for it), 20 YOLO boxes with class and score, five named
+faces (opencv-face), and all of them together. The connection lists are copied from MediaPipe so mediapipe
+does not need to be installed.
+
+    python benchmarks/bench_render.py --width 1280 --height 720 --repeat 1000
+    python benchmarks/bench_render.py --output render.json
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(__file__))
+
+import harness  # noqa: E402
+from annotate import draw_boxes, draw_name_tags, draw_points, draw_skeletons  # noqa: E402
+
+HAND_CONNECTIONS = [(0, 1), (1, 2), (2, 3), (3, 4), (0, 5), (5, 6), (6, 7), (7, 8), (5, 9), (9, 10),
+                    (10, 11), (11, 12), (9, 13), (13, 14), (14, 15), (15, 16), (13, 17), (0, 17),
+                    (17, 18), (18, 19), (19, 20)]
+POSE_CONNECTIONS = [(0, 1), (1, 2), (2, 3), (3, 7), (0, 4), (4, 5), (5, 6), (6, 8), (9, 10), (11, 12),
+                    (11, 13), (13, 15), (15, 17), (15, 19), (15, 21), (17, 19), (12, 14), (14, 16),
+                    (16, 18), (16, 20), (16, 22), (18, 20), (11, 23), (12, 24), (23, 24), (23, 25),
+                    (24, 26), (25, 27), (26, 28), (27, 29), (28, 30), (29, 31), (30, 32), (27, 31),
+                    (28, 32)]
+COCO_LABELS = ["person", "car", "truck", "bicycle", "dog", "boat"]
+GREEN, RED = (0, 255, 0), (0, 0, 255)
+INDEX_LABELS = [str(i) for i in range(21)]
+
+
+def make_scene(w, h, rng):
+    """Detections shaped like each plugin's, at random places in a w x h frame"""
+    hands = np.stack([rng.uniform((0.2 * w, 0.2 * h), (0.8 * w, 0.8 * h)) + rng.normal(0, 40, (21, 2))
+                      for _ in range(2)]).astype(np.float32)
+    pose = np.column_stack([rng.uniform((0.3 * w, 0.1 * h), (0.7 * w, 0.9 * h), (33, 2)),
+                            rng.uniform(0.2, 1.0, 33)]).astype(np.float32)[None]
+
+    def boxes(n, size):
+        xy = rng.uniform((0, 40), (w - size, h - size), (n, 2))
+        return np.column_stack([xy, xy + rng.uniform(size / 2, size, (n, 2))]).astype(np.float32)
+
+    return {
+        "hands": hands,
+        "pose": pose,
+        "yolo": (boxes(20, 160), [COCO_LABELS[i % len(COCO_LABELS)] for i in range(20)],
+                 rng.uniform(0.3, 1.0, 20).round(2)),
+        "faces": (boxes(5, 120), ["alice", "Unknown", "bob", "Unknown", "carol"]),
+    }
+
+
+# === Before: one cv2 call per primitive (the plugins' old draw()) ===
+
+def legacy_hands(frame, hands):
+    for points in hands:
+        points = [tuple(p) for p in points.astype(int).tolist()]
+        for start_idx, end_idx in HAND_CONNECTIONS:
+            cv2.line(frame, points[start_idx], points[end_idx], (200, 200, 200), 2)
+        for idx, (cx, cy) in enumerate(points):
+            cv2.circle(frame, (cx, cy), 3, (255, 255, 255), -1)
+            cv2.putText(frame, str(idx), (cx + 5, cy - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 0, 0), 1)
+
+
+def legacy_pose(frame, skeletons):
+    for skeleton in skeletons:
+        points = [tuple(p) for p in skeleton[:, :2].astype(int).tolist()]
+        visible = (skeleton[:, 2] >= 0.5).tolist()
+        for start_idx, end_idx in POSE_CONNECTIONS:
+            if visible[start_idx] and visible[end_idx]:
+                cv2.line(frame, points[start_idx], points[end_idx], (245, 66, 230), 2)
+        for point, vis in zip(points, visible):
+            if vis:
+                cv2.circle(frame, point, 2, (245, 117, 66), 2)
+
+
+def legacy_yolo(frame, yolo):
+    boxes, labels, scores = yolo
+    for (x1, y1, x2, y2), label, conf in zip(boxes.astype(int).tolist(), labels, scores.tolist()):
+        cv2.rectangle(frame, (x1, y1), (x2, y2), GREEN, 2)
+        cv2.putText(frame, f"{label} {conf:.2f}", (x1, y1 - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.7, GREEN, 2)
+
+
+def legacy_faces(frame, faces):
+    boxes, names = faces
+    for (left, top, right, bottom), name in zip(boxes.astype(int).tolist(), names):
+        color = GREEN if name != "Unknown" else RED
+        cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+        cv2.rectangle(frame, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
+        cv2.putText(frame, name, (left + 6, bottom - 6), cv2.FONT_HERSHEY_DUPLEX, 0.8, (255, 255, 255), 1)
+
+
+# === After: the annotate helpers the plugins use now ===
+
+def helper_hands(frame, hands):
+    for points in hands:
+        draw_skeletons(frame, points[None], HAND_CONNECTIONS, (200, 200, 200), 2)
+        draw_points(frame, points, (255, 255, 255), 3, labels=INDEX_LABELS, label_color=(255, 0, 0))
+
+
+def helper_pose(frame, skeletons):
+    visible = skeletons[..., 2] >= 0.5
+    draw_skeletons(frame, skeletons, POSE_CONNECTIONS, (245, 66, 230), 2, visible=visible)
+    draw_points(frame, skeletons[visible], (245, 117, 66), 2, 2)
+
+
+def helper_yolo(frame, yolo):
+    boxes, labels, scores = yolo
+    draw_boxes(frame, boxes, GREEN, 2, [f"{label} {conf:.2f}" for label, conf in zip(labels, scores.tolist())])
+
+
+def helper_faces(frame, faces):
+    boxes, names = faces
+    draw_name_tags(frame, boxes, [GREEN if name != "Unknown" else RED for name in names], names)
+
+
+PLUGINS = {
+    "hands": (legacy_hands, helper_hands),
+    "pose": (legacy_pose, helper_pose),
+    "yolo": (legacy_yolo, helper_yolo),
+    "faces": (legacy_faces, helper_faces),
+}
+
+
+def render_legacy(frame, scene, names):
+    for name in names:
+        PLUGINS[name][0](frame, scene[name])
+    return frame
+
+
+def render_helpers(frame, scene, names):
+    for name in names:
+        PLUGINS[name][1](frame, scene[name])
+    return frame
+
+
+def time_renders(renders, background, scene, names, repeat):
+    """
+    Per-frame durations of each renderer, interleaved (in alternating order)
+    so they all see the same machine load
+    """
+    frame = background.copy()
+    durations = [[] for _ in renders]
+    for i in range(repeat + 1):
+        order = list(zip(renders, durations))
+        for render, samples in (order if i % 2 else order[::-1]):
+            np.copyto(frame, background)
+            t0 = time.perf_counter()
+            render(frame, scene, names)
+            if i:  # the first round is a warm-up
+                samples.append(time.perf_counter() - t0)
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--repeat", type=int, default=300, help="Frames drawn per scenario and renderer")
+    parser.add_argument("--seed", type=int, default=0)
+    harness.add_report_arguments(parser)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    background = harness.synthetic_frames(1, args.width, args.height, seed=args.seed)[0]
+    scene = make_scene(args.width, args.height, rng)
+    scenarios = {name: [name] for name in PLUGINS}
+    scenarios["all"] = list(PLUGINS)
+
+    results = {}
+    print(f"{args.width}x{args.height}, {args.repeat} frames per run")
+    print(f"{'scenario':<8} {'before us':>10} {'after us':>10} {'speedup':>8} {'max diff':>9}")
+    for name, names in scenarios.items():
+        before, after = time_renders([render_legacy, render_helpers], background, scene, names, args.repeat)
+        diff = cv2.absdiff(render_legacy(background.copy(), scene, names),
+                           render_helpers(background.copy(), scene, names))
+        b, a = np.median(before) * 1e6, np.median(after) * 1e6
+        results[f"scenario:{name}"] = {
+            "before": harness.latency_summary(before),
+            **harness.latency_summary(after),
+            "speedup": round(b / a, 2),
+            "max_pixel_diff": int(diff.max()),
+        }
+        print(f"{name:<8} {b:>10.1f} {a:>10.1f} {b / a:>7.1f}x {int(diff.max()):>9}")
+
+    report = {
+        "benchmark": "render",
+        "timestamp": time.time(),
+        "config": {"size": [args.width, args.height], "repeat": args.repeat, "seed": args.seed},
+        "environment": harness.environment(),
+        "results": results,
+    }
+    harness.finish(report, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Fake drone: pushes JPEG frames to server.py's ingest port, like the real drone would.
+
+Frames come from a video, an image directory or are generated, and are
+encoded once up front, so the sender itself costs almost nothing. With
+--watch it also reads the relay's /video_feed and matches each received
+JPEG to the moment it was sent, which gives end-to-end relay latency.
+
+    python server.py --no-pull &
+    python benchmarks/fake_drone.py --fps 30 --seconds 20 --watch http://127.0.0.1:8080/video_feed
+    python benchmarks/fake_drone.py --fps 0 --width 1920 --height 1080   # as fast as the link allows
+"""
+import argparse
+import http.client
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import cv2
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(__file__))
+
+import harness  # noqa: E402
+from ingest import FrameSender  # noqa: E402
+from mjpeg import MJPEGParser, read_chunks  # noqa: E402
+
+
+class Watcher(threading.Thread):
+    """Reads the relay's MJPEG feed and measures how long each sent frame took to come out"""
+
+    def __init__(self, url, index_of, sent_at):
+        super().__init__(daemon=True)
+        self.url = urlsplit(url)
+        self.index_of = index_of
+        self.sent_at = sent_at
+        self.latencies = []
+        self.received = 0
+        self.counting = False
+
+    def run(self):
+        conn = http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=10)
+        conn.request("GET", self.url.path + (f"?{self.url.query}" if self.url.query else ""))
+        response = conn.getresponse()
+        parser = MJPEGParser.from_content_type(response.getheader("Content-Type"))
+        for chunk in read_chunks(response, 64 * 1024):
+            now = time.perf_counter()
+            for jpeg in parser.feed(chunk):
+                i = self.index_of.get(jpeg)
+                if i is None or not self.counting:
+                    continue  # the placeholder, or a frame from before the timed run
+                self.received += 1
+                self.latencies.append(now - self.sent_at[i])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Relay (server.py) address")
+    parser.add_argument("--port", type=int, default=9000, help="Relay ingest port")
+    parser.add_argument("--fps", type=float, default=30, help="Send rate (0 = as fast as possible)")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument("--watch", help="Relay /video_feed URL to measure end-to-end latency")
+    harness.add_frame_arguments(parser)
+    harness.add_report_arguments(parser)
+    args = parser.parse_args()
+
+    frames = harness.load_frames(args.video, args.images, args.frames, args.width, args.height)
+    jpegs = [cv2.imencode(".jpg", f, [cv2.IMWRITE_JPEG_QUALITY, args.quality])[1].tobytes() for f in frames]
+    index_of = {jpeg: i for i, jpeg in enumerate(jpegs)}
+    sent_at = [0.0] * len(jpegs)
+    avg_kb = sum(map(len, jpegs)) / len(jpegs) / 1024
+    h, w = frames[0].shape[:2]
+    print(f"{len(jpegs)} frames ({w}x{h}, ~{avg_kb:.0f} KB) -> {args.host}:{args.port} "
+          f"at {'max' if not args.fps else f'{args.fps:g}'} fps for {args.seconds:.0f}s")
+
+    watcher = None
+    if args.watch:
+        watcher = Watcher(args.watch, index_of, sent_at)
+        watcher.start()
+
+    sender = FrameSender(args.host, args.port)
+    sender.connect()
+    interval = 1.0 / args.fps if args.fps else 0.0
+    if watcher is not None:
+        watcher.counting = True
+    send_times = []
+    sent_bytes = 0
+    with harness.ResourceMonitor() as monitor:
+        t0 = next_at = time.perf_counter()
+        i = 0
+        while time.perf_counter() - t0 < args.seconds:
+            k = i % len(jpegs)
+            sent_at[k] = time.perf_counter()
+            if sender.send(jpegs[k]):
+                send_times.append(time.perf_counter() - sent_at[k])
+                sent_bytes += len(jpegs[k])
+            i += 1
+            if interval:
+                next_at += interval
+                time.sleep(max(next_at - time.perf_counter(), 0))
+        elapsed = time.perf_counter() - t0
+    time.sleep(0.5)  # let the last frames reach the watcher
+    sender.close()
+
+    result = {
+        "frames": len(send_times),
+        "fps": round(len(send_times) / elapsed, 2),
+        "mb_per_s": round(sent_bytes / elapsed / (1024 * 1024), 2),
+        "send_p95_ms": harness.latency_summary(send_times)["p95_ms"],
+        "sender_cpu_percent": monitor.summary()["cpu_percent"],
+    }
+    print(f"sent {result['frames']} frames: {result['fps']} fps, {result['mb_per_s']} MB/s, "
+          f"send p95 {result['send_p95_ms']} ms")
+    results = {"ingest": result}
+    if watcher is not None:
+        relay = dict(harness.latency_summary(watcher.latencies), viewer_fps=round(watcher.received / elapsed, 2))
+        print(f"relay -> viewer: {relay['viewer_fps']} fps, latency p50 {relay['p50_ms']} ms, "
+              f"p95 {relay['p95_ms']} ms, p99 {relay['p99_ms']} ms")
+        results["relay"] = relay
+
+    report = {
+        "benchmark": "ingest",
+        "timestamp": time.time(),
+        "config": {"frames": len(jpegs), "size": [w, h], "fps": args.fps, "seconds": args.seconds,
+                   "quality": args.quality, "source": harness.frames_description(args)},
+        "environment": harness.environment(),
+        "results": results,
+    }
+    harness.finish(report, args)
+
+
+if __name__ == "__main__":
+    main()
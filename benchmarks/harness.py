@@ -0,0 +1,217 @@
+"""
+Shared helpers for the offline benchmarks (bench_models.py, bench_pipeline.py).
+
+- load_frames(): frames from a recorded video, a directory of images, or
+  generated synthetic frames, all held in memory so decoding isn't timed.
+- ResourceMonitor: samples a process's RSS and CPU time from /proc while a
+  benchmark runs (Linux only, no psutil needed).
+- latency_summary(): p50/p95/p99 of a list of durations.
+- write_report() / compare(): JSON results and the baseline check. A metric
+  that is worse than the baseline by more than the tolerance is a regression
+  and the benchmark exits with status 1.
+"""
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+# Metrics compared against a baseline, and which direction is better
+HIGHER_IS_BETTER = ("fps", "viewer_fps")
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "peak_rss_mb")
+MIN_LATENCY_DELTA_MS = 1.0  # sub-millisecond latencies jitter by more than any sane tolerance
+
+
+def synthetic_frames(count, width, height, seed=0, objects=6):
+    """Noise background with a few shapes moving across it, so trackers and detectors have work"""
+    rng = np.random.default_rng(seed)
+    background = rng.integers(0, 60, size=(height, width, 3), dtype=np.uint8)
+    shapes = [{
+        "pos": rng.uniform([0, 0], [width - 80, height - 80]),
+        "vel": rng.uniform(-6, 6, size=2),
+        "size": rng.integers(30, 80, size=2),
+        "color": tuple(int(c) for c in rng.integers(80, 255, size=3)),
+    } for _ in range(objects)]
+    frames = []
+    for _ in range(count):
+        frame = background.copy()
+        for s in shapes:
+            s["pos"] = np.clip(s["pos"] + s["vel"], 0, [width - s["size"][0], height - s["size"][1]])
+            x, y = s["pos"].astype(int)
+            cv2.rectangle(frame, (x, y), (x + int(s["size"][0]), y + int(s["size"][1])), s["color"], -1)
+        frames.append(frame)
+    return frames
+
+
+def load_frames(video=None, images=None, count=120, width=640, height=480):
+    """Up to `count` BGR frames from `video`, the files in `images`, or synthetic ones"""
+    if video:
+        cap = cv2.VideoCapture(video)
+        frames = []
+        while len(frames) < count:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            frames.append(frame)
+        cap.release()
+        if not frames:
+            raise SystemExit(f"No frames could be read from {video}")
+        return frames
+    if images:
+        names = sorted(n for n in os.listdir(images) if n.lower().endswith(IMAGE_EXTENSIONS))
+        frames = [f for f in (cv2.imread(os.path.join(images, n)) for n in names[:count]) if f is not None]
+        if not frames:
+            raise SystemExit(f"No images found in {images}")
+        return frames
+    return synthetic_frames(count, width, height)
+
+
+def frames_description(args):
+    return {"video": args.video} if args.video else {"images": args.images} if args.images else \
+        {"synthetic": f"{args.width}x{args.height}"}
+
+
+def add_frame_arguments(parser):
+    parser.add_argument("--video", help="Recorded video to replay")
+    parser.add_argument("--images", help="Directory of images to replay")
+    parser.add_argument("--frames", type=int, default=120, help="Frames to load (looped during the run)")
+    parser.add_argument("--width", type=int, default=640, help="Synthetic frame width")
+    parser.add_argument("--height", type=int, default=480, help="Synthetic frame height")
+
+
+def add_report_arguments(parser):
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a previous JSON result; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed relative slowdown before a metric counts as a regression")
+
+
+def latency_summary(seconds):
+    if not len(seconds):
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None}
+    ms = np.asarray(seconds) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+    }
+
+
+class ResourceMonitor:
+    """Peak RSS and CPU utilization of process `pid` (default: this one) over a run"""
+
+    def __init__(self, pid=None, interval=0.1):
+        self.pid = pid or os.getpid()
+        self.interval = interval
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._ticks = os.sysconf("SC_CLK_TCK")
+
+    def rss(self):
+        try:
+            with open(f"/proc/{self.pid}/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            return 0
+
+    def cpu_seconds(self):
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                # utime and stime follow the parenthesised command name
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / self._ticks
+        except (OSError, ValueError, IndexError):
+            return 0.0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, self.rss())
+
+    def __enter__(self):
+        self.peak_rss = self.rss()
+        self._cpu0, self._t0 = self.cpu_seconds(), time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="resource-monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, self.rss())
+        self.wall = time.perf_counter() - self._t0
+        self.cpu = self.cpu_seconds() - self._cpu0
+
+    def summary(self):
+        return {
+            "peak_rss_mb": round(self.peak_rss / (1024 * 1024), 1),
+            # Percent of one core; can exceed 100 with several busy threads
+            "cpu_percent": round(100 * self.cpu / max(self.wall, 1e-9), 1),
+        }
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "opencv_threads": cv2.getNumThreads(),
+    }
+
+
+def write_report(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {path}")
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare {name: {metric: value}} with the same structure from a baseline.
+    Prints every checked metric and returns the list of regressions.
+    """
+    regressions = []
+    print(f"\nBaseline comparison (tolerance {tolerance:.0%})")
+    for name, current in results.items():
+        before = baseline.get(name)
+        if not isinstance(before, dict) or "error" in current or "error" in before:
+            continue
+        for metric in HIGHER_IS_BETTER + LOWER_IS_BETTER:
+            old, new = before.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            if metric.endswith("_ms") and new - old < MIN_LATENCY_DELTA_MS:
+                worse = min(worse, 0.0)
+            status = "REGRESSION" if worse > tolerance else "ok"
+            print(f"  {name:<28} {metric:<12} {old:>10} -> {new:<10} {change:+.1%}  {status}")
+            if worse > tolerance:
+                regressions.append(f"{name} {metric}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def finish(report, args):
+    """Write the report and check it against --baseline; exits 1 on regression"""
+    if args.output:
+        write_report(report, args.output)
+    if not args.baseline:
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(report["results"], baseline.get("results", {}), args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} REGRESSION(S) against {args.baseline}:", file=sys.stderr)
+        for line in regressions:
+            print(f"  {line}", file=sys.stderr)
+        sys.exit(1)
+    print("No regressions.")
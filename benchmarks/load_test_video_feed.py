@@ -0,0 +1,137 @@
+"""
+Load test for the /video_feed endpoint of app.py.
+
+Opens N simulated MJPEG viewers over raw asyncio sockets, counts the frames
+each receives and reports per-client FPS. While the viewers are connected it
+also probes /api/logs to show whether the API stays responsive.
+
+Start the app first (e.g. `python app.py --standalone`), then:
+
+    python benchmarks/load_test_video_feed.py --clients 200 --duration 20
+
+Renditions and adaptive mode can be exercised through the URL, with some
+clients reading through a throttled link:
+
+    python benchmarks/load_test_video_feed.py --url "http://127.0.0.1:5000/video_feed?adaptive=1" \
+        --clients 20 --slow-clients 5 --slow-kbps 800
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mjpeg import MJPEGParser  # noqa: E402
+
+
+async def open_get(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    return reader, writer, head
+
+
+async def viewer(host, port, path, deadline, results, idx, kbps=None):
+    frames = 0
+    received = 0
+    first = None
+    try:
+        reader, writer, head = await open_get(host, port, path)
+        content_type = ""
+        for line in head.decode(errors="replace").split("\r\n"):
+            if line.lower().startswith("content-type:"):
+                content_type = line.split(":", 1)[1].strip()
+        parser = MJPEGParser.from_content_type(content_type)
+        while time.monotonic() < deadline:
+            try:
+                data = await asyncio.wait_for(reader.read(64 * 1024), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+            if not data:
+                break
+            got = len(parser.feed(data))
+            if got and first is None:
+                first = time.monotonic()
+            frames += got
+            received += len(data)
+            if kbps:
+                # Simulated weak link: don't read faster than `kbps`
+                await asyncio.sleep(len(data) * 8 / (kbps * 1000))
+        writer.close()
+    except (OSError, asyncio.IncompleteReadError) as e:
+        results[idx] = {"frames": frames, "fps": 0.0, "error": str(e)}
+        return
+    elapsed = max(deadline - (first or deadline), 1e-6)
+    results[idx] = {"frames": frames, "fps": frames / elapsed if first else 0.0,
+                    "kb_per_frame": received / 1024 / frames if frames else 0.0, "slow": bool(kbps)}
+
+
+async def probe_api(host, port, deadline, latencies, path="/api/logs"):
+    while time.monotonic() < deadline:
+        t0 = time.monotonic()
+        try:
+            reader, writer, _ = await open_get(host, port, path)
+            await reader.read()
+            writer.close()
+            latencies.append((time.monotonic() - t0) * 1000)
+        except OSError:
+            latencies.append(float("inf"))
+        await asyncio.sleep(0.25)
+
+
+async def main_async(args):
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    deadline = time.monotonic() + args.duration
+    results = [None] * args.clients
+    latencies = []
+
+    path = (url.path or "/video_feed") + (f"?{url.query}" if url.query else "")
+    tasks = [asyncio.create_task(viewer(host, port, path, deadline, results, i,
+                                        args.slow_kbps if i < args.slow_clients else None))
+             for i in range(args.clients)]
+    tasks.append(asyncio.create_task(probe_api(host, port, deadline, latencies)))
+    await asyncio.gather(*tasks)
+
+    fps = [r["fps"] for r in results if r]
+    errors = [r["error"] for r in results if r and "error" in r]
+    print(f"\nClients: {args.clients}  duration: {args.duration}s")
+    if fps:
+        print(f"Per-client FPS  min {min(fps):.1f}  median {statistics.median(fps):.1f}  "
+              f"max {max(fps):.1f}  total {sum(fps):.1f}")
+        for label, group in (("fast", [r for r in results if r and not r.get("slow")]),
+                             ("slow", [r for r in results if r and r.get("slow")])):
+            if group and args.slow_clients:
+                print(f"  {label} clients: median {statistics.median(r['fps'] for r in group):.1f} fps, "
+                      f"{statistics.median(r.get('kb_per_frame', 0) for r in group):.1f} KB/frame")
+        if args.verbose:
+            for i, r in enumerate(results):
+                print(f"  client {i:4d}: {r['frames']:5d} frames  {r['fps']:.1f} fps  "
+                      f"{r.get('kb_per_frame', 0):.1f} KB/frame")
+    if errors:
+        print(f"Errors: {len(errors)} (first: {errors[0]})")
+    ok = [l for l in latencies if l != float("inf")]
+    if ok:
+        print(f"/api/logs latency under load  median {statistics.median(ok):.1f} ms  "
+              f"max {max(ok):.1f} ms  failures {len(latencies) - len(ok)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:5000/video_feed")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--slow-clients", type=int, default=0, help="How many clients read through a throttled link")
+    parser.add_argument("--slow-kbps", type=float, default=1000, help="Read rate of the slow clients")
+    parser.add_argument("--verbose", action="store_true", help="Print every client")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+
+import cv2
+import numpy as np
+
+import metrics
+
+
+def part_header(length, boundary=b'frame'):
+    """The multipart/x-mixed-replace part headers for a JPEG of `length` bytes"""
+    return (b'--' + boundary + b'\r\n'
+            b'Content-Type: image/jpeg\r\n'
+            b'Content-Length: ' + str(length).encode() + b'\r\n\r\n')
+
+
+def multipart_chunk(jpeg_bytes, boundary=b'frame'):
+    """Wrap one JPEG payload as a multipart/x-mixed-replace part"""
+    return part_header(len(jpeg_bytes), boundary) + jpeg_bytes + b'\r\n'
+
+
+def make_placeholder(text="Waiting for video feed...", size=(1280, 720)):
+    """Blank frame shown to viewers until the first real frame is published"""
+    w, h = size
+    blank = np.zeros((h, w, 3), dtype=np.uint8)
+    cv2.putText(blank, text, (w // 6, h // 2),
+                cv2.FONT_HERSHEY_SIMPLEX, 2 * w / 1280, (100, 200, 255), 4)
+    return blank
+
+
+class AsyncNotifier:
+    """
+    Lets a worker thread wake coroutines waiting on an asyncio event loop.
+
+    notify() may be called from any thread; wait() is awaited on the loop
+    given to attach_loop(). Each notify() releases everyone currently waiting;
+    notifications made before the loop got round to the previous one are
+    merged into it, so a burst costs one wakeup.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._event = None
+        self._scheduled = False
+
+    @property
+    def attached(self):
+        return self._loop is not None
+
+    def attach_loop(self, loop):
+        self._loop = loop
+        self._event = asyncio.Event()
+
+    def notify(self):
+        loop = self._loop
+        if loop is None or self._scheduled:
+            return
+        self._scheduled = True
+        try:
+            loop.call_soon_threadsafe(self._wake)
+        except RuntimeError:
+            # Event loop already closed (shutdown)
+            self._loop = None
+
+    def _wake(self):
+        # Runs on the event loop: release everyone waiting on the current event
+        # and hand out a fresh one for the next notification
+        self._scheduled = False
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    async def wait(self, timeout):
+        """Wait for the next notify(). Returns False on timeout"""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+# Requested sizes and qualities snap to these, so the number of distinct
+# renditions (and encodes per frame) stays small however clients ask
+RENDITION_WIDTHS = (320, 480, 640, 960, 1280, 1920)
+QUALITY_STEP = 5
+MIN_QUALITY, MAX_QUALITY = 30, 95
+
+# Steps an adaptive viewer walks down while its connection can't keep up
+ADAPTIVE_LADDER = ((None, 80), (None, 65), (1280, 60), (960, 55), (640, 50), (480, 45), (320, 40))
+
+
+def rendition_label(rendition):
+    width, quality = rendition
+    return f"{width or 'full'}w q{quality}"
+
+
+class AdaptiveRendition:
+    """
+    Picks the rendition for one viewer from how long its socket writes take.
+
+    When sending a frame keeps taking longer than SLOW_MS (the client's
+    buffers are full), the viewer moves one step down the ladder; after
+    `hold_up` seconds of fast writes it tries one step back up, never above
+    the rendition it asked for. A step up that has to be undone soon after
+    doubles `hold_up`, so a link that can't carry the bigger frames stops
+    being probed every few seconds.
+    """
+    SLOW_MS = 120
+    FAST_MS = 25
+    HOLD_DOWN = 0.5
+    HOLD_UP = 3.0
+    MAX_HOLD_UP = 60.0
+
+    def __init__(self, start):
+        def size(w):
+            return w or 1 << 30  # None is full size
+
+        width, quality = start
+        self.steps = [start] + [(w, q) for w, q in ADAPTIVE_LADDER
+                                if size(w) <= size(width) and q <= quality and (w, q) != start]
+        self.index = 0
+        self.send_ms = 0.0
+        self.changed_at = time.monotonic()
+        self.hold_up = self.HOLD_UP
+        self.stepped_up_at = None
+
+    @property
+    def current(self):
+        return self.steps[self.index]
+
+    def record(self, seconds):
+        """Feed one write duration. Returns True if the rendition changed"""
+        self.send_ms = self.send_ms * 0.7 + seconds * 1000 * 0.3
+        now = time.monotonic()
+        since = now - self.changed_at
+        if self.send_ms > self.SLOW_MS and since > self.HOLD_DOWN and self.index < len(self.steps) - 1:
+            self.index += 1
+            if self.stepped_up_at is not None and now - self.stepped_up_at < self.hold_up * 2:
+                # The last step up didn't hold: wait longer before the next try
+                self.hold_up = min(self.hold_up * 2, self.MAX_HOLD_UP)
+            self.stepped_up_at = None
+        elif self.send_ms < self.FAST_MS and since > self.hold_up and self.index > 0:
+            self.index -= 1
+            self.stepped_up_at = now
+        else:
+            return False
+        self.changed_at = now
+        return True
+
+
+class FrameBroadcaster:
+    """
+    Shares the latest processed frame with every connected viewer.
+
+    The processing thread calls publish() for each new frame, which bumps a
+    sequence number. Viewers wait until the sequence moves past the one they
+    last sent, so nobody gets the same frame twice and nobody spins on a fixed
+    sleep. The JPEG for a sequence is encoded at most once per rendition
+    (width, quality) and reused by every viewer of that rendition: publish()
+    encodes the renditions someone is watching up front, otherwise the first
+    viewer to ask encodes it.
+
+    Thread viewers use frames(); asyncio viewers use aframes(), which is woken
+    through the event loop given to attach_loop() and never blocks it.
+    """
+
+    def __init__(self, quality=80, name=None):
+        self.quality = quality
+        self.name = name  # source name, used as the metrics label
+        self._cond = threading.Condition()
+        self._encode_lock = threading.Lock()
+        self._seq = 0
+        self._frame = None
+        self._jpegs = {}            # rendition -> (seq, jpeg)
+        self._rendition_locks = {}  # rendition -> lock, so each is encoded once per frame
+        self._placeholder = None
+        self._notifier = AsyncNotifier()
+        self._viewers_lock = threading.Lock()
+        self.viewers = 0
+        self.watched = Counter()    # rendition -> viewers
+        self.encode_count = 0
+        self.encode_counts = Counter()
+        self._encode_seconds = metrics.histogram("drone_jpeg_encode_seconds", source=name)
+        self._send_seconds = metrics.histogram("drone_video_send_seconds", source=name)
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def attach_loop(self, loop):
+        """Wake asyncio viewers on `loop` whenever a frame is published"""
+        self._notifier.attach_loop(loop)
+
+    def rendition(self, width=None, quality=None):
+        """Snap a requested width/quality onto the ladder: (width, or None for full size, quality)"""
+        if width:
+            width = max([w for w in RENDITION_WIDTHS if w <= width], default=RENDITION_WIDTHS[0])
+        if quality is None:
+            quality = self.quality
+        quality = int(round(min(max(quality, MIN_QUALITY), MAX_QUALITY) / QUALITY_STEP) * QUALITY_STEP)
+        return (width or None, quality)
+
+    def _resolve(self, rendition, frame):
+        # A width at or above the frame's own is the full-size rendition
+        if rendition is None:
+            return (None, self.quality)
+        width, quality = rendition
+        if width is not None and width >= frame.shape[1]:
+            return (None, quality)
+        return rendition
+
+    def _rendition_lock(self, rendition):
+        with self._encode_lock:
+            return self._rendition_locks.setdefault(rendition, threading.Lock())
+
+    def publish(self, frame):
+        """Make `frame` the current frame and wake all waiting viewers"""
+        # Encode what viewers are watching before waking them, once per rendition
+        with self._viewers_lock:
+            watched = [r for r, n in self.watched.items() if n > 0]
+        jpegs = {}
+        for rendition in watched:
+            key = self._resolve(rendition, frame)
+            if key not in jpegs:
+                jpegs[key] = self.encode(frame, key)
+        with self._cond:
+            self._frame = frame
+            self._seq += 1
+            seq = self._seq
+            self._cond.notify_all()
+        for key, jpeg in jpegs.items():
+            if jpeg is None:
+                continue
+            with self._rendition_lock(key):
+                cached = self._jpegs.get(key)
+                if cached is None or seq > cached[0]:
+                    self._jpegs[key] = (seq, jpeg)
+        self._notifier.notify()
+        return seq
+
+    def encode(self, frame, rendition=None):
+        width, quality = rendition if rendition is not None else (None, self.quality)
+        t0 = time.perf_counter()
+        if width is not None and width < frame.shape[1]:
+            height = max(1, round(frame.shape[0] * width / frame.shape[1]))
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        ret, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+        if not ret:
+            return None
+        self.encode_count += 1
+        self.encode_counts[(width, quality)] += 1
+        self._encode_seconds.observe(time.perf_counter() - t0)
+        return buffer.tobytes()
+
+    def cached_jpeg(self, seq, rendition=None):
+        """JPEG for `seq` in `rendition` if it has already been encoded, else None"""
+        frame = self._frame
+        if frame is None:
+            return None
+        cached = self._jpegs.get(self._resolve(rendition, frame))
+        return cached[1] if cached is not None and cached[0] == seq else None
+
+    def get_jpeg(self, rendition=None):
+        """Return (seq, jpeg bytes) for the current frame in `rendition`, encoding it once"""
+        with self._cond:
+            seq, frame = self._seq, self._frame
+        if frame is None:
+            return 0, None
+        key = self._resolve(rendition, frame)
+        with self._rendition_lock(key):
+            cached = self._jpegs.get(key)
+            if cached is not None and cached[0] >= seq:
+                return cached
+            jpeg = self.encode(frame, key)
+            if jpeg is None:
+                return seq, cached[1] if cached is not None else None
+            self._jpegs[key] = (seq, jpeg)
+            return seq, jpeg
+
+    def placeholder_jpeg(self):
+        with self._encode_lock:
+            if self._placeholder is None:
+                self._placeholder = self.encode(make_placeholder())
+            return self._placeholder
+
+    def _add_viewer(self, delta, rendition=None):
+        with self._viewers_lock:
+            self.viewers += delta
+            self.watched[rendition or (None, self.quality)] += delta
+
+    def _switch_rendition(self, old, new):
+        with self._viewers_lock:
+            self.watched[old] -= 1
+            self.watched[new] += 1
+
+    def stats(self):
+        with self._viewers_lock:
+            watched = {rendition_label(r): n for r, n in self.watched.items() if n > 0}
+        return {
+            "viewers": self.viewers,
+            "renditions": watched,
+            "encodes": {rendition_label(r): n for r, n in self.encode_counts.items()},
+        }
+
+    def wait_next(self, last_seq, timeout=1.0, rendition=None):
+        """Block until a frame newer than `last_seq` exists. Returns (seq, jpeg) or (last_seq, None) on timeout"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > last_seq, timeout=timeout):
+                return last_seq, None
+        return self.get_jpeg(rendition)
+
+    async def await_next(self, last_seq, timeout=1.0, rendition=None):
+        """Async wait_next(): suspends on the loop instead of holding a thread"""
+        if self._seq <= last_seq:
+            await self._notifier.wait(timeout)
+            if self._seq <= last_seq:
+                return last_seq, None
+        seq = self._seq
+        jpeg = self.cached_jpeg(seq, rendition)
+        if jpeg is not None:
+            return seq, jpeg
+        # Nobody encoded this frame yet (e.g. first viewer just joined):
+        # do it off the event loop
+        return await asyncio.to_thread(self.get_jpeg, rendition)
+
+    def frames(self, timeout=1.0, rendition=None):
+        """Multipart generator for one viewer (blocking, one thread per viewer)"""
+        rendition = rendition or self.rendition()
+        self._add_viewer(1, rendition)
+        try:
+            last_seq = 0
+            while True:
+                seq, jpeg = self.wait_next(last_seq, timeout=timeout, rendition=rendition)
+                if jpeg is None:
+                    if last_seq == 0:
+                        # Nothing published yet: keep the connection alive with the placeholder
+                        yield multipart_chunk(self.placeholder_jpeg())
+                    continue
+                last_seq = seq
+                yield multipart_chunk(jpeg)
+        finally:
+            self._add_viewer(-1, rendition)
+
+    async def aframes(self, is_disconnected=None, timeout=1.0, rendition=None, adaptive=False):
+        """
+        Multipart async generator for one viewer.
+
+        `is_disconnected` is an optional coroutine function (Starlette's
+        Request.is_disconnected) polled whenever no frame arrives in `timeout`.
+        With `adaptive`, the viewer gets smaller or lower-quality frames while
+        its connection backs up (see AdaptiveRendition). A slow viewer always
+        skips to the newest frame, so it gets fewer frames, not older ones.
+        """
+        if not self._notifier.attached:
+            self.attach_loop(asyncio.get_running_loop())
+        rendition = rendition or self.rendition()
+        adapt = AdaptiveRendition(rendition) if adaptive else None
+        self._add_viewer(1, rendition)
+        try:
+            last_seq = 0
+            while True:
+                seq, jpeg = await self.await_next(last_seq, timeout=timeout, rendition=rendition)
+                if jpeg is None:
+                    if is_disconnected is not None and await is_disconnected():
+                        break
+                    if last_seq == 0:
+                        yield multipart_chunk(await asyncio.to_thread(self.placeholder_jpeg))
+                    continue
+                last_seq = seq
+                # The generator resumes only once the server has handed the
+                # chunk to the socket, so this is how long the write took
+                t0 = time.monotonic()
+                yield multipart_chunk(jpeg)
+                sent = time.monotonic() - t0
+                self._send_seconds.observe(sent)
+                if adapt is not None and adapt.record(sent):
+                    self._switch_rendition(rendition, adapt.current)
+                    rendition = adapt.current
+        finally:
+            self._add_viewer(-1, rendition)
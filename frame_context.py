@@ -0,0 +1,149 @@
+"""
+Per-frame shared context handed to model plugins.
+
+Several plugins need the same derived data (an RGB copy, a downscaled copy,
+MediaPipe pose landmarks...). A FrameContext computes each of these lazily on
+first request and memoizes it, so any combination of active models pays for
+each conversion and each pose pass once per frame.
+
+Plugins opt in by accepting a second argument:
+
+    def process_frame(frame, context=None):
+        context = FrameContext.ensure(frame, context)
+        rgb = context.rgb
+
+Plugins that only take `frame` keep receiving the bare ndarray.
+"""
+import inspect
+import threading
+import weakref
+
+import cv2
+
+
+class PoseEngine:
+    """One MediaPipe Pose graph shared by every plugin that needs landmarks (per source)"""
+
+    def __init__(self, model_complexity=1, min_detection_confidence=0.5):
+        import mediapipe as mp
+        self.mp_pose = mp.solutions.pose
+        self._pose = self.mp_pose.Pose(
+            static_image_mode=False,
+            model_complexity=model_complexity,
+            enable_segmentation=False,
+            min_detection_confidence=min_detection_confidence
+        )
+        self._lock = threading.Lock()  # MediaPipe graphs are not re-entrant
+
+    def process(self, rgb):
+        with self._lock:
+            return self._pose.process(rgb)
+
+
+# One engine per video source: the graph tracks landmarks from frame to frame,
+# so frames of different drones must not go through the same one
+_pose_engines = {}
+_pose_engines_lock = threading.Lock()
+
+
+def get_pose_engine(source=None):
+    with _pose_engines_lock:
+        engine = _pose_engines.get(source)
+        if engine is None:
+            engine = _pose_engines[source] = PoseEngine()
+        return engine
+
+
+class FrameContext:
+    def __init__(self, image, seq=None, timestamp=None, source=None):
+        self.image = image  # original BGR frame; treat as read-only
+        self.seq = seq
+        self.timestamp = timestamp
+        self.source = source  # name of the video source the frame came from
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    @staticmethod
+    def ensure(frame, context=None):
+        """Return `context`, or a fresh one for `frame` when called without the app"""
+        return context if context is not None else FrameContext(frame)
+
+    def get(self, key, compute):
+        """Memoize `compute()` under `key` for this frame (safe across model threads)"""
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # Concurrent callers for the same key wait for the first one
+        with key_lock:
+            if key not in self._cache:
+                self._cache[key] = compute()
+            return self._cache[key]
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    @property
+    def rgb(self):
+        return self.get("rgb", lambda: cv2.cvtColor(self.image, cv2.COLOR_BGR2RGB))
+
+    @property
+    def gray(self):
+        return self.get("gray", lambda: cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY))
+
+    def scaled(self, scale):
+        """BGR frame resized by `scale` (e.g. 0.25)"""
+        if scale == 1:
+            return self.image
+        return self.get(("scaled", scale),
+                        lambda: cv2.resize(self.image, (0, 0), fx=scale, fy=scale))
+
+    def scaled_rgb(self, scale):
+        if scale == 1:
+            return self.rgb
+        return self.get(("scaled_rgb", scale),
+                        lambda: cv2.cvtColor(self.scaled(scale), cv2.COLOR_BGR2RGB))
+
+    def scaled_gray(self, scale):
+        if scale == 1:
+            return self.gray
+        return self.get(("scaled_gray", scale),
+                        lambda: cv2.cvtColor(self.scaled(scale), cv2.COLOR_BGR2GRAY))
+
+    def pose(self):
+        """MediaPipe Pose results for this frame, from the shared engine of its source"""
+        return self.get("pose", lambda: get_pose_engine(self.source).process(self.rgb))
+
+
+# Weak keys: a model evicted from the registry must not be kept alive by this cache
+_accepts_context = weakref.WeakKeyDictionary()
+
+
+def _inspect_accepts_context(fn):
+    try:
+        params = inspect.signature(fn).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    positional = [p for p in params if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)]
+    return len(positional) >= 2 or any(p.kind == p.VAR_POSITIONAL for p in params)
+
+
+def accepts_context(process_frame):
+    try:
+        accepts = _accepts_context.get(process_frame)
+    except TypeError:  # not weak-referenceable (some builtins)
+        return _inspect_accepts_context(process_frame)
+    if accepts is None:
+        accepts = _accepts_context[process_frame] = _inspect_accepts_context(process_frame)
+    return accepts
+
+
+def call_with_context(fn, frame, context=None):
+    """Call a plugin entry point (process_frame, detect), passing the context only if it takes one"""
+    if context is not None and accepts_context(fn):
+        return fn(frame, context)
+    return fn(frame)
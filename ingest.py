@@ -0,0 +1,158 @@
+"""
+Push ingest: the drone connects out to server.py and streams its JPEGs.
+
+Protocol over one persistent TCP connection, all little-endian:
+
+    b"DRN1"                                  once, after connecting
+    uint32 length, float64 captured_at, JPEG  per frame (captured_at is unix time)
+
+Compared with pulling MJPEG over HTTP there is no multipart parsing and no
+connection setup per stall, and the relay no longer needs to know the drone's
+address: the drone reconnects to the relay whenever its link drops.
+
+The receiver reads straight into buffers allocated once per connection. Each
+frame's multipart part is assembled in place around the JPEG and copied out
+once into the bytes object that every viewer then shares.
+"""
+import socket
+import struct
+import threading
+import time
+
+import metrics
+from broadcast import part_header
+
+MAGIC = b"DRN1"
+FRAME_HEADER = struct.Struct("<Id")
+MAX_FRAME_BYTES = 8 * 1024 * 1024
+PART_ROOM = 128  # space before the JPEG for the multipart part headers
+
+latency_seconds = metrics.histogram("server_ingest_latency_seconds")
+
+
+def recv_exactly(sock, view):
+    """Fill the memoryview `view` from `sock`. False if the peer closed first"""
+    got, size = 0, len(view)
+    while got < size:
+        n = sock.recv_into(view[got:])
+        if n == 0:
+            return False
+        got += n
+    return True
+
+
+class IngestServer:
+    """Accepts drone connections on `port` and publishes their frames to `relay`"""
+
+    def __init__(self, relay, host="0.0.0.0", port=9000, max_frame_bytes=MAX_FRAME_BYTES):
+        self.relay = relay
+        self.max_frame_bytes = max_frame_bytes
+        self._sock = socket.create_server((host, port))
+        self.port = self._sock.getsockname()[1]
+        self.connections = 0
+        self.frames = 0
+        self.bytes = 0
+        self._thread = threading.Thread(target=self._accept, name="ingest", daemon=True)
+        self._thread.start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, addr = self._sock.accept()
+            except OSError:
+                return  # closed
+            threading.Thread(target=self._receive, args=(conn, addr), name=f"ingest-{addr[0]}",
+                             daemon=True).start()
+
+    def _receive(self, conn, addr):
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        header = bytearray(FRAME_HEADER.size)
+        header_view = memoryview(header)
+        # [part headers | JPEG | \r\n], sized for the largest frame accepted
+        buffer = bytearray(PART_ROOM + self.max_frame_bytes + 2)
+        view = memoryview(buffer)
+        self.connections += 1
+        print(f"✓ Drone connected from {addr[0]}:{addr[1]}")
+        try:
+            if not recv_exactly(conn, header_view[:len(MAGIC)]) or header[:len(MAGIC)] != MAGIC:
+                print(f"Rejected ingest connection from {addr[0]}: bad handshake")
+                return
+            while True:
+                if not recv_exactly(conn, header_view):
+                    break
+                length, captured_at = FRAME_HEADER.unpack_from(header)
+                if length > self.max_frame_bytes:
+                    print(f"Dropping drone connection: {length} byte frame exceeds {self.max_frame_bytes}")
+                    break
+                end = PART_ROOM + length
+                if not recv_exactly(conn, view[PART_ROOM:end]):
+                    break
+                prefix = part_header(length)
+                start = PART_ROOM - len(prefix)
+                buffer[start:PART_ROOM] = prefix
+                buffer[end:end + 2] = b"\r\n"
+                # WSGI servers only write bytes: one copy per frame, shared by every viewer
+                self.relay.publish_chunk(bytes(view[start:end + 2]), len(prefix))
+                if captured_at > 0:
+                    latency_seconds.observe(max(time.time() - captured_at, 0.0))
+                self.frames += 1
+                self.bytes += length
+        except OSError as e:
+            print(f"Drone connection error: {e}")
+        finally:
+            self.connections -= 1
+            conn.close()
+            print(f"Drone disconnected ({addr[0]})")
+
+    def close(self):
+        self._sock.close()
+
+    def stats(self):
+        return {"port": self.port, "connections": self.connections, "frames": self.frames, "bytes": self.bytes}
+
+
+class FrameSender:
+    """Drone side: pushes JPEGs to an IngestServer, reconnecting when the link drops"""
+
+    def __init__(self, host, port=9000, retry_delay=1.0):
+        self.host = host
+        self.port = port
+        self.retry_delay = retry_delay
+        self._sock = None
+        self.sent = 0
+
+    def connect(self):
+        while self._sock is None:
+            try:
+                sock = socket.create_connection((self.host, self.port), timeout=5)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sock.settimeout(None)
+                sock.sendall(MAGIC)
+                self._sock = sock
+            except OSError as e:
+                print(f"Relay {self.host}:{self.port} unreachable ({e}), retrying in {self.retry_delay:.0f}s")
+                time.sleep(self.retry_delay)
+
+    def send(self, jpeg, captured_at=None):
+        """Send one JPEG; on a broken connection reconnect and drop this frame. Returns True if sent"""
+        self.connect()
+        header = FRAME_HEADER.pack(len(jpeg), captured_at if captured_at is not None else time.time())
+        try:
+            # Header and JPEG in one syscall without concatenating them
+            sent = self._sock.sendmsg([header, jpeg])
+            if sent < len(header):
+                self._sock.sendall(header[sent:])
+                sent = len(header)
+            if sent < len(header) + len(jpeg):
+                self._sock.sendall(memoryview(jpeg)[sent - len(header):])
+        except OSError:
+            self.close()
+            return False
+        self.sent += 1
+        return True
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
@@ -1,35 +1,164 @@
+import atexit
 import datetime
+import itertools
+import queue
+import sys
+import threading
+import time
+from collections import deque
+
+MAX_LOGS = 1000
+AGGREGATE_WINDOW = 1.0  # seconds; repeats of the same AI message within it become one entry
+AGGREGATE_LEVELS = ("AI",)
 
 class LogManager:
-    def __init__(self):
-        self.logs = []
+    """
+    Ring buffer of the last MAX_LOGS entries, safe to use from any thread.
+
+    Every entry gets a monotonically increasing "id", so clients can ask only
+    for what they haven't seen (get_logs(since=id)). Identical AI messages
+    (same source, stream and text) are aggregated: the first one is stored
+    right away, repeats within AGGREGATE_WINDOW are only counted and stored
+    once per window as a single entry with "count" set.
+    """
 
-    def add_log(self, source: str, message: str, level: str = "INFO"):
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = {
-            "timestamp": timestamp,
+    def __init__(self, max_logs=MAX_LOGS, window=AGGREGATE_WINDOW):
+        self.logs = deque(maxlen=max_logs)
+        self.window = window
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._windows = {}  # (source, stream, level, message) -> [window start, repeats]
+        self.listeners = []  # callables(entry), called outside the lock for every stored entry
+
+    def _append(self, source, message, level, stream, count=1):
+        # Called with self._lock held
+        entry = {
+            "id": self._next_id,
+            "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "source": source,
             "level": level,
-            "message": message
+            "message": message,
         }
-        self.logs.append(log_entry)
-        # Keep only last 1000 logs to prevent memory overflow
-        if len(self.logs) > 1000:
-            self.logs.pop(0)
-        return log_entry
+        if count != 1:
+            entry["count"] = count
+        if stream is not None:
+            entry["stream"] = stream  # which video source this is about
+        self._next_id += 1
+        self.logs.append(entry)
+        return entry
+
+    def add_log(self, source: str, message: str, level: str = "INFO", stream: str = None):
+        """Store one log. Returns the new entry, or None if it was folded into an aggregate"""
+        with self._lock:
+            if level in AGGREGATE_LEVELS:
+                key = (source, stream, level, message)
+                window = self._windows.get(key)
+                if window is not None:
+                    window[1] += 1
+                    return None
+                self._windows[key] = [time.monotonic(), 0]
+            entry = self._append(source, message, level, stream)
+        self._notify((entry,))
+        return entry
+
+    def _flush_windows(self, now):
+        # Called with self._lock held: store one entry per expired window that saw repeats
+        flushed = []
+        for key, (start, repeats) in list(self._windows.items()):
+            if now - start < self.window:
+                continue
+            if repeats:
+                source, stream, level, message = key
+                flushed.append(self._append(source, message, level, stream, count=repeats))
+                # Keep folding while the message keeps coming
+                self._windows[key] = [now, 0]
+            else:
+                del self._windows[key]
+        return flushed
+
+    def flush(self):
+        """Store aggregates whose window has ended (the console writer calls this every 0.25 s)"""
+        with self._lock:
+            flushed = self._flush_windows(time.monotonic())
+        self._notify(flushed)
+        return flushed
+
+    def _notify(self, entries):
+        for entry in entries:
+            for listener in self.listeners:
+                listener(entry)
+
+    @property
+    def last_id(self):
+        return self._next_id - 1
 
-    def get_logs(self, limit: int = 100):
-        return self.logs[-limit:]
+    def get_logs(self, limit: int = 100, stream: str = None, since: int = None):
+        """Newest `limit` entries, or with `since` every retained entry with a larger id (oldest first)"""
+        with self._lock:
+            if since is not None:
+                first_id = self.logs[0]["id"] if self.logs else self._next_id
+                # ids are consecutive, so the start position is simple arithmetic
+                entries = list(itertools.islice(self.logs, max(since + 1 - first_id, 0), None))
+            else:
+                entries = list(self.logs)
+        if stream is not None:
+            entries = [l for l in entries if l.get("stream") == stream]
+        return entries if since is not None else entries[-limit:]
 
     def clear_logs(self):
-        self.logs = []
+        with self._lock:
+            self.logs.clear()
+            self._windows.clear()
+
+
+class ConsoleWriter:
+    """Prints log lines from a background thread so callers never wait on stdout"""
+
+    def __init__(self, manager, interval=0.25):
+        self.manager = manager
+        self.interval = interval
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, entry):
+        self._queue.put(entry)
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.interval)]
+            except queue.Empty:
+                batch = []
+            # Aggregates are stored (and so printed) when their window ends
+            self.manager.flush()
+            self.drain(batch)
+
+    def drain(self, batch=None):
+        batch = batch or []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            sys.stdout.write("".join(format_entry(e) for e in batch))
+            sys.stdout.flush()
+
+
+def format_entry(entry):
+    where = f"{entry['source']} [{entry['stream']}]" if "stream" in entry else entry["source"]
+    repeats = f" (x{entry['count']})" if "count" in entry else ""
+    return f"[{entry['level']}] {where}: {entry['message']}{repeats}\n"
 
 # Global instance
 logger = LogManager()
+console = ConsoleWriter(logger)
+logger.listeners.append(console.write)
+atexit.register(console.drain)
 
-def log(source: str, message: str, level: str = "INFO"):
-    print(f"[{level}] {source}: {message}")
-    logger.add_log(source, message, level)
+def log(source: str, message: str, level: str = "INFO", stream: str = None):
+    logger.add_log(source, message, level, stream)
 
-def get_all_logs():
-    return logger.get_logs()
+def get_all_logs(stream: str = None, since: int = None, limit: int = 100):
+    return logger.get_logs(limit=limit, stream=stream, since=since)
@@ -0,0 +1,200 @@
+"""
+Low-overhead pipeline metrics.
+
+Hot paths only call Histogram.observe() (a bisect and a few integer
+increments, about a microsecond), so instrumentation can stay on in
+production. Counters that already live elsewhere (StageStats, the model
+registry, broadcasters) are not duplicated: a collector callback reads them
+when /metrics is scraped.
+
+    hist = metrics.histogram("drone_model_inference_seconds", model="yolov8")
+    hist.observe(seconds)
+
+render_prometheus() produces the Prometheus text format for GET /metrics;
+summary() gives p50/p95/p99 over the last minute or so as JSON for the
+dashboard.
+"""
+import bisect
+import threading
+import time
+
+# Upper bounds in seconds, from sub-millisecond encodes to multi-second stalls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.002, 0.004, 0.006, 0.008, 0.01, 0.015, 0.02, 0.03, 0.04,
+                   0.05, 0.075, 0.1, 0.15, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+WINDOW = 30.0  # seconds per window; summaries cover the current and the previous one (30-60 s)
+
+
+class Histogram:
+    """Fixed-bucket histogram: cumulative for Prometheus, two fixed windows for percentiles"""
+
+    def __init__(self, name, labels, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.labels = labels
+        self.bounds = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+        self._window = [0] * (len(buckets) + 1)
+        self._previous = [0] * (len(buckets) + 1)
+        self._window_start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.bounds, seconds)
+        now = time.monotonic()
+        with self._lock:
+            self._rotate(now)  # also here: reads may be minutes apart
+            self.counts[i] += 1
+            self.count += 1
+            self.total += seconds
+            self._window[i] += 1
+
+    def _rotate(self, now):
+        # Called with self._lock held. Windows start on multiples of WINDOW after the first one
+        elapsed = now - self._window_start
+        if elapsed >= WINDOW:
+            fresh = [0] * len(self.counts)
+            # The current window becomes the previous one, unless a whole window has passed
+            # since it ended (nothing observed nor read), in which case both are stale
+            self._previous = self._window if elapsed < 2 * WINDOW else fresh
+            self._window = list(fresh)
+            self._window_start += elapsed // WINDOW * WINDOW
+
+    def recent(self):
+        with self._lock:
+            self._rotate(time.monotonic())
+            return [a + b for a, b in zip(self._window, self._previous)]
+
+    def percentile(self, q, counts=None):
+        """Estimate the q-th percentile (0-100) in seconds, interpolating inside the bucket"""
+        counts = self.recent() if counts is None else counts
+        n = sum(counts)
+        if n == 0:
+            return None
+        target = q / 100 * n
+        seen = 0
+        for i, c in enumerate(counts):
+            if c and seen + c >= target:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.bounds[-1] * 2
+                return lower + (upper - lower) * (target - seen) / c
+            seen += c
+        return self.bounds[-1]
+
+    def summary(self):
+        counts = self.recent()
+
+        def ms(q):
+            value = self.percentile(q, counts)
+            return round(value * 1000, 2) if value is not None else None
+
+        return {
+            "labels": self.labels,
+            "count": self.count,
+            "recent": sum(counts),
+            "mean_ms": round(self.total / self.count * 1000, 2) if self.count else None,
+            "p50_ms": ms(50),
+            "p95_ms": ms(95),
+            "p99_ms": ms(99),
+        }
+
+
+class MetricsStore:
+    def __init__(self):
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def histogram(self, name, buckets=DEFAULT_BUCKETS, **labels):
+        labels = {k: v for k, v in labels.items() if v is not None}
+        key = (name, tuple(sorted(labels.items())))
+        hist = self._histograms.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.setdefault(key, Histogram(name, labels, buckets))
+        return hist
+
+    def register_collector(self, collect):
+        """`collect()` returns [(name, type, labels, value)] for counters/gauges read at scrape time"""
+        self._collectors.append(collect)
+
+    def samples(self):
+        out = []
+        for collect in list(self._collectors):
+            try:
+                out.extend(collect())
+            except Exception:
+                continue  # a failing collector must not break the endpoint
+        return out
+
+    def render_prometheus(self):
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        # Each metric family has to be contiguous in the exposition format
+        families = {}
+        for sample in self.samples():
+            families.setdefault(sample[0], []).append(sample)
+        for name, kind, labels, value in (s for family in families.values() for s in family):
+            declare(name, kind)
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+        with self._lock:
+            histograms = sorted(self._histograms.values(), key=lambda h: h.name)
+        for hist in histograms:
+            declare(hist.name, "histogram")
+            with hist._lock:
+                counts, total, count = list(hist.counts), hist.total, hist.count
+            cumulative = 0
+            for bound, c in zip(hist.bounds + ("+Inf",), counts):
+                cumulative += c
+                lines.append(f"{hist.name}_bucket{_labels(dict(hist.labels, le=bound))} {cumulative}")
+            lines.append(f"{hist.name}_sum{_labels(hist.labels)} {_number(total)}")
+            lines.append(f"{hist.name}_count{_labels(hist.labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        with self._lock:
+            histograms = list(self._histograms.values())
+        out = {"histograms": {}, "values": {}}
+        for hist in histograms:
+            out["histograms"].setdefault(hist.name, []).append(hist.summary())
+        for name, _, labels, value in self.samples():
+            out["values"].setdefault(name, []).append({"labels": labels, "value": value})
+        out["timestamp"] = time.time()
+        return out
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Global instance
+store = MetricsStore()
+
+def histogram(name, buckets=DEFAULT_BUCKETS, **labels):
+    return store.histogram(name, buckets, **labels)
+
+def register_collector(collect):
+    store.register_collector(collect)
+
+def render_prometheus():
+    return store.render_prometheus()
+
+def summary():
+    return store.summary()
@@ -0,0 +1,194 @@
+"""
+Incremental multipart/x-mixed-replace (MJPEG) parser.
+
+Feed it raw chunks from a socket or `requests` response and it hands back
+complete JPEG payloads. Data is kept in one bytearray and every byte is
+scanned at most once, so cost stays linear in stream size regardless of
+chunk size or frame size.
+
+Frames are delimited, in order of preference, by:
+  1. the part's Content-Length header,
+  2. the multipart boundary (`--<boundary>`),
+  3. JPEG SOI/EOI markers, only when the stream has no multipart framing.
+"""
+
+SOI = b'\xff\xd8'
+EOI = b'\xff\xd9'
+
+_HEADERS = 0
+_BODY = 1
+_RAW = 2
+
+
+def boundary_from_content_type(content_type):
+    """Extract the boundary token from a multipart Content-Type header (or None)"""
+    if not content_type:
+        return None
+    for param in content_type.split(';')[1:]:
+        key, _, value = param.strip().partition('=')
+        if key.lower() == 'boundary' and value:
+            value = value.strip('"')
+            return value[2:] if value.startswith('--') else value
+    return None
+
+
+class MJPEGParser:
+    def __init__(self, boundary=None, max_frame_size=16 * 1024 * 1024):
+        self.boundary = boundary.encode() if isinstance(boundary, str) else boundary
+        self.max_frame_size = max_frame_size
+        self._buf = bytearray()
+        self._pos = 0       # start of unconsumed data
+        self._scan = 0      # where the next delimiter search resumes
+        self._state = _HEADERS
+        self._length = None
+        self.frames = 0
+        self.malformed = 0
+
+    @classmethod
+    def from_content_type(cls, content_type, **kwargs):
+        return cls(boundary_from_content_type(content_type), **kwargs)
+
+    def feed(self, data):
+        """Append a chunk (bytes/bytearray/memoryview) and return any complete JPEGs"""
+        self._buf += data
+        out = []
+        while True:
+            if self._state == _HEADERS:
+                if not self._parse_headers():
+                    break
+            elif self._state == _BODY:
+                jpg = self._parse_body()
+                if jpg is None:
+                    break
+                self._emit(jpg, out)
+            else:
+                jpg = self._parse_raw()
+                if jpg is None:
+                    break
+                self._emit(jpg, out)
+        self._compact()
+        return out
+
+    def _emit(self, jpg, out):
+        if jpg[:2] == SOI:
+            self.frames += 1
+            out.append(jpg)
+        else:
+            self.malformed += 1
+
+    def _parse_headers(self):
+        buf = self._buf
+        # Skip the CRLF that terminates the previous part
+        while self._pos < len(buf) and buf[self._pos] in (0x0d, 0x0a):
+            self._pos += 1
+        if len(buf) - self._pos < 2:
+            return False
+
+        if self.boundary is None and buf[self._pos:self._pos + 2] == SOI:
+            # Bare concatenated JPEGs with no multipart framing at all
+            self._state = _RAW
+            self._scan = self._pos + 2
+            return True
+
+        end = buf.find(b'\r\n\r\n', max(self._pos, self._scan))
+        if end == -1:
+            self._scan = max(self._pos, len(buf) - 3)
+            if len(buf) - self._pos > 64 * 1024:
+                # No header terminator in 64 KB: not a multipart stream we understand
+                self._reset_to(len(buf))
+                self.malformed += 1
+            return False
+
+        self._length = None
+        for line in bytes(buf[self._pos:end]).split(b'\r\n'):
+            if line.startswith(b'--'):
+                if self.boundary is None:
+                    self.boundary = line[2:].strip()
+                continue
+            key, _, value = line.partition(b':')
+            if key.strip().lower() == b'content-length':
+                try:
+                    self._length = int(value.strip())
+                except ValueError:
+                    self._length = None
+        if self._length is not None and not 0 < self._length <= self.max_frame_size:
+            self._length = None
+
+        self._pos = self._scan = end + 4
+        self._state = _BODY
+        return True
+
+    def _parse_body(self):
+        buf = self._buf
+        if self._length is not None:
+            if len(buf) - self._pos < self._length:
+                return None
+            start = self._pos
+            self._pos = self._scan = start + self._length
+            self._state = _HEADERS
+            return bytes(buf[start:self._pos])
+
+        if self.boundary is None:
+            self._state = _RAW
+            self._scan = self._pos
+            return None
+        delim = b'\r\n--' + self.boundary
+        idx = buf.find(delim, max(self._pos, self._scan))
+        if idx == -1:
+            self._scan = max(self._pos, len(buf) - len(delim) + 1)
+            if len(buf) - self._pos > self.max_frame_size:
+                self._reset_to(len(buf))
+                self.malformed += 1
+            return None
+        start = self._pos
+        self._pos = self._scan = idx + 2  # leave "--boundary" for the header parser
+        self._state = _HEADERS
+        return bytes(buf[start:idx])
+
+    def _parse_raw(self):
+        buf = self._buf
+        start = buf.find(SOI, self._pos)
+        if start == -1:
+            self._pos = max(self._pos, len(buf) - 1)
+            return None
+        end = buf.find(EOI, max(start + 2, self._scan))
+        if end == -1:
+            self._pos = start
+            self._scan = max(start + 2, len(buf) - 1)
+            return None
+        self._pos = self._scan = end + 2
+        return bytes(buf[start:end + 2])
+
+    def _reset_to(self, pos):
+        self._pos = self._scan = pos
+        self._state = _HEADERS
+
+    def _compact(self):
+        # Drop consumed bytes only once they dominate the buffer, so the
+        # memmove cost is amortised over many frames
+        if self._pos and self._pos >= len(self._buf) // 2:
+            del self._buf[:self._pos]
+            self._scan -= self._pos
+            self._pos = 0
+
+
+def read_chunks(raw, size=64 * 1024):
+    """
+    Yield whatever is available from a file-like stream, up to `size` bytes.
+
+    Uses read1() when the stream has it (urllib3 2.x, sockets' makefile) so a
+    large chunk size never stalls waiting for the buffer to fill up.
+    """
+    read = getattr(raw, 'read1', None) or raw.read
+    while True:
+        data = read(size)
+        if not data:
+            return
+        yield data
+
+
+def iter_frames(chunks, boundary=None):
+    """Yield JPEG payloads from an iterable of byte chunks"""
+    parser = MJPEGParser(boundary)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
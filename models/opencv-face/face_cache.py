@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png')
+MANIFEST_VERSION = 1
+
+
+def file_hash(path, block=1 << 20):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(block), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class EncodingCache:
+    """
+    On-disk cache of known-face embeddings.
+
+    `<cache_dir>/embeddings.npy` holds one float32 row per encoded image and
+    `<cache_dir>/manifest.json` maps each image (path relative to the gallery)
+    to its size, mtime, SHA-1 and row. On sync() only images whose size/mtime
+    changed are hashed, only images whose hash changed are re-encoded, and
+    images that disappeared are dropped. Renamed or copied images are matched
+    by hash and never re-encoded.
+    """
+
+    def __init__(self, faces_dir, cache_dir, dim=128):
+        self.faces_dir = faces_dir
+        self.cache_dir = cache_dir
+        self.dim = dim
+        self.embeddings_path = os.path.join(cache_dir, "embeddings.npy")
+        self.manifest_path = os.path.join(cache_dir, "manifest.json")
+
+    def scan(self):
+        """List (relpath, person, size, mtime_ns) for every gallery image"""
+        found = []
+        if not os.path.isdir(self.faces_dir):
+            return found
+        for person in sorted(os.listdir(self.faces_dir)):
+            person_dir = os.path.join(self.faces_dir, person)
+            if not os.path.isdir(person_dir):
+                continue
+            with os.scandir(person_dir) as it:
+                for entry in sorted(it, key=lambda e: e.name):
+                    if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTS):
+                        st = entry.stat()
+                        found.append((f"{person}/{entry.name}", person, st.st_size, st.st_mtime_ns))
+        return found
+
+    def _load(self):
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+            if manifest.get("version") != MANIFEST_VERSION or manifest.get("dim") != self.dim:
+                return {}, None
+            # Read fully rather than memory-map: the file is replaced on the next
+            # sync, which Windows refuses while a mapping is open
+            embeddings = np.load(self.embeddings_path)
+            if embeddings.ndim != 2 or embeddings.shape[1] != self.dim:
+                return {}, None
+            return manifest["files"], embeddings
+        except (OSError, ValueError, KeyError):
+            return {}, None
+
+    def _save(self, files, embeddings):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_npy = self.embeddings_path + ".tmp.npy"
+        tmp_json = self.manifest_path + ".tmp"
+        np.save(tmp_npy, embeddings)
+        with open(tmp_json, 'w') as f:
+            json.dump({"version": MANIFEST_VERSION, "dim": self.dim, "files": files}, f)
+        os.replace(tmp_npy, self.embeddings_path)
+        os.replace(tmp_json, self.manifest_path)
+
+    def is_stale(self):
+        """Cheap check (stat only) for added, removed or modified images"""
+        files, _ = self._load()
+        current = {rel: (size, mtime) for rel, _, size, mtime in self.scan()}
+        if current.keys() != files.keys():
+            return True
+        return any(files[rel]["size"] != size or files[rel]["mtime_ns"] != mtime
+                   for rel, (size, mtime) in current.items())
+
+    def sync(self, encode_fn, log=print):
+        """
+        Bring the cache in line with the gallery.
+
+        `encode_fn(path)` returns a 128-d embedding or None (no face found).
+        Returns (embeddings float32 [N, dim], person names [N], stats dict).
+        """
+        old_files, old_emb = self._load()
+        by_hash = {meta["sha1"]: meta for meta in old_files.values()}
+        stats = {"reused": 0, "rehashed": 0, "encoded": 0, "removed": 0, "no_face": 0}
+
+        files = {}
+        rows = []
+        names = []
+        for rel, person, size, mtime in self.scan():
+            path = os.path.join(self.faces_dir, *rel.split("/"))
+            old = old_files.get(rel)
+            if old and old["size"] == size and old["mtime_ns"] == mtime:
+                meta, digest = old, old["sha1"]
+                stats["reused"] += 1
+            else:
+                digest = file_hash(path)
+                meta = by_hash.get(digest)
+                stats["rehashed"] += 1
+
+            if meta is not None:
+                vec = old_emb[meta["row"]] if meta["row"] >= 0 else None
+            else:
+                try:
+                    vec = encode_fn(path)
+                except Exception as e:
+                    log(f"   - Error loading {rel}: {e}")
+                    continue
+                stats["encoded"] += 1
+                if vec is None:
+                    log(f"   - No face found in {rel}")
+                else:
+                    log(f"   - Encoded {rel}")
+
+            entry = {"size": size, "mtime_ns": mtime, "sha1": digest, "row": -1}
+            if vec is not None:
+                entry["row"] = len(rows)
+                rows.append(np.asarray(vec, dtype=np.float32))
+                names.append(person)
+            else:
+                stats["no_face"] += 1
+            files[rel] = entry
+
+        stats["removed"] = len(old_files.keys() - files.keys())
+        embeddings = np.stack(rows) if rows else np.zeros((0, self.dim), dtype=np.float32)
+
+        changed = (stats["encoded"] or stats["removed"] or stats["rehashed"]
+                   or old_emb is None or len(old_files) != len(files))
+        if changed:
+            try:
+                self._save(files, embeddings)
+            except OSError as e:
+                log(f"   - Could not write embedding cache: {e}")
+        return embeddings, names, stats
@@ -0,0 +1,135 @@
+"""
+Cascaded face detection: find people first, then look for faces only there.
+
+From drone altitude a face is a few pixels wide. Shrinking the whole frame
+for dlib's HOG detector loses it, and most of the detector's work goes into
+sky and ground. Here a person stage proposes head regions (from the shared
+MediaPipe Pose pass, or YOLOv8's person class), each region is cut out of
+the full-resolution frame and scaled to about `crop_size` pixels, and all
+crops are packed into one mosaic. Face detection and encoding then run once
+on the mosaic for the whole frame, and the boxes are mapped back.
+"""
+import math
+import os
+import threading
+
+import cv2
+import numpy as np
+
+HEAD_PAD = 2.0     # head region side, relative to the head's own size
+MOSAIC_GAP = 16    # blank pixels between crops, so no face spans two of them
+MIN_REGION = 8     # regions smaller than this (full-frame pixels) are skipped
+DUPLICATE_IOU = 0.4
+
+
+def pose_regions(context):
+    """Head region of the person found by the shared pose pass (at most one)"""
+    results = context.pose()
+    if not results.pose_landmarks:
+        return []
+    h, w = context.shape[:2]
+    landmarks = results.pose_landmarks.landmark
+    head = np.array([(landmarks[i].x, landmarks[i].y) for i in range(11)], np.float32) * (w, h)  # face points
+    shoulders = np.array([(landmarks[i].x, landmarks[i].y) for i in (11, 12)], np.float32) * (w, h)
+    center = head.mean(axis=0)
+    side = max(np.ptp(head, axis=0).max(), 0.5 * np.linalg.norm(shoulders[0] - shoulders[1])) * HEAD_PAD
+    return [(center[0] - side / 2, center[1] - side / 2, center[0] + side / 2, center[1] + side / 2)]
+
+
+def head_region(box):
+    """Upper part of a person box, where the head is when seen from the side or above"""
+    x1, y1, x2, y2 = box
+    side = max(x2 - x1, 0.3 * (y2 - y1))
+    cx = (x1 + x2) / 2
+    top = y1 - 0.1 * side
+    return cx - side / 2, top, cx + side / 2, top + side
+
+
+class PersonDetector:
+    """YOLOv8 restricted to the person class, loaded on first use"""
+
+    def __init__(self, weights, imgsz=640, confidence=0.3):
+        self.weights = weights
+        self.imgsz = imgsz
+        self.confidence = confidence
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._model is None:
+                from ultralytics import YOLO
+                self._model = YOLO(self.weights if os.path.exists(self.weights) else os.path.basename(self.weights))
+            return self._model
+
+    def regions(self, frame):
+        result = self._load()(frame, classes=[0], imgsz=self.imgsz, conf=self.confidence, verbose=False)[0]
+        return [head_region(box) for box in result.boxes.xyxy.cpu().numpy().tolist()]
+
+
+class Mosaic:
+    """
+    Crops of `image` around `regions`, each scaled so its long side is
+    `crop_size` (upscaled at most `max_upscale` times), packed into one image.
+    """
+
+    def __init__(self, image, regions, crop_size=160, max_upscale=4.0):
+        h, w = image.shape[:2]
+        self.tiles = []  # (x, y in the mosaic, scale, x1, y1 in the frame, width, height in the mosaic)
+        crops = []
+        for x1, y1, x2, y2 in regions:
+            x1, y1 = max(int(x1), 0), max(int(y1), 0)
+            x2, y2 = min(int(math.ceil(x2)), w), min(int(math.ceil(y2)), h)
+            if x2 - x1 < MIN_REGION or y2 - y1 < MIN_REGION:
+                continue
+            scale = min(crop_size / max(x2 - x1, y2 - y1), max_upscale)
+            size = (max(1, round((x2 - x1) * scale)), max(1, round((y2 - y1) * scale)))
+            interpolation = cv2.INTER_CUBIC if scale > 1 else cv2.INTER_AREA
+            crops.append((cv2.resize(image[y1:y2, x1:x2], size, interpolation=interpolation), scale, x1, y1))
+
+        # Rows of ceil(sqrt(n)) crops
+        columns = max(1, math.ceil(math.sqrt(len(crops))))
+        x = y = row_height = width = 0
+        for i, (crop, scale, x1, y1) in enumerate(crops):
+            if i and i % columns == 0:
+                x, y, row_height = 0, y + row_height + MOSAIC_GAP, 0
+            ch, cw = crop.shape[:2]
+            self.tiles.append((x, y, scale, x1, y1, cw, ch))
+            x += cw + MOSAIC_GAP
+            row_height = max(row_height, ch)
+            width = max(width, x - MOSAIC_GAP)
+        self.image = np.zeros((y + row_height, width) + image.shape[2:], image.dtype)
+        for (crop, _, _, _), (tx, ty, _, _, _, cw, ch) in zip(crops, self.tiles):
+            self.image[ty:ty + ch, tx:tx + cw] = crop
+
+    @property
+    def pixels(self):
+        return sum(cw * ch for *_, cw, ch in self.tiles)
+
+    def to_frame(self, locations):
+        """
+        Map face_recognition (top, right, bottom, left) boxes found in the
+        mosaic back to the frame, dropping duplicates from overlapping crops.
+        Returns (mosaic locations, frame locations) of the faces kept.
+        """
+        kept_mosaic, kept_frame = [], []
+        for top, right, bottom, left in locations:
+            cx, cy = (left + right) / 2, (top + bottom) / 2
+            tile = next((t for t in self.tiles if t[0] <= cx < t[0] + t[5] and t[1] <= cy < t[1] + t[6]), None)
+            if tile is None:
+                continue  # in the gap between crops
+            tx, ty, scale, x1, y1, _, _ = tile
+            box = (round((top - ty) / scale + y1), round((right - tx) / scale + x1),
+                   round((bottom - ty) / scale + y1), round((left - tx) / scale + x1))
+            if any(_iou(box, other) > DUPLICATE_IOU for other in kept_frame):
+                continue
+            kept_mosaic.append((top, right, bottom, left))
+            kept_frame.append(box)
+        return kept_mosaic, kept_frame
+
+
+def _iou(a, b):
+    """IoU of two (top, right, bottom, left) boxes"""
+    inter = max(min(a[1], b[1]) - max(a[3], b[3]), 0) * max(min(a[2], b[2]) - max(a[0], b[0]), 0)
+    union = (a[1] - a[3]) * (a[2] - a[0]) + (b[1] - b[3]) * (b[2] - b[0]) - inter
+    return inter / union if union > 0 else 0.0
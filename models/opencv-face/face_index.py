@@ -0,0 +1,115 @@
+import numpy as np
+
+UNKNOWN = "Unknown"
+
+
+class FaceIndex:
+    """
+    Identity index over the known-face gallery.
+
+    Gallery embeddings live in one contiguous float32 matrix with a parallel
+    label array. match() scores every face of a frame against the gallery in
+    a single matrix product, using |q - g|^2 = |q|^2 + |g|^2 - 2 q.g with the
+    gallery norms precomputed.
+
+    Once the gallery grows past `partition_threshold` an inverted-file
+    partition is built (k-means over the gallery): a query is compared with
+    the partition centroids first and then only with the members of the
+    `n_probe` nearest partitions, so cost grows roughly with sqrt(N) instead of N.
+    """
+
+    def __init__(self, encodings=(), labels=(), tolerance=0.6,
+                 partition_threshold=20000, n_probe=8):
+        self.tolerance = tolerance
+        self.partition_threshold = partition_threshold
+        self.n_probe = n_probe
+
+        enc = np.asarray(encodings, dtype=np.float32)
+        if enc.size == 0:
+            enc = np.zeros((0, 128), dtype=np.float32)  # reshape(0, -1) can't infer the width
+        else:
+            enc = enc.reshape(len(enc), -1)
+        self.embeddings = np.ascontiguousarray(enc)
+        self.labels = np.asarray(list(labels), dtype=object)
+        if len(self.labels) != len(self.embeddings):
+            raise ValueError("encodings and labels must have the same length")
+        self._sq_norms = np.einsum('ij,ij->i', self.embeddings, self.embeddings)
+
+        self._centroids = None
+        self._lists = None
+        if len(self.embeddings) >= partition_threshold:
+            self._build_partitions()
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    @property
+    def partitioned(self):
+        return self._centroids is not None
+
+    def _build_partitions(self, iterations=8, seed=0):
+        x = self.embeddings
+        n_lists = max(1, int(np.sqrt(len(x))))
+        rng = np.random.default_rng(seed)
+        centroids = x[rng.choice(len(x), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assign = self._nearest(x, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, x)
+            counts = np.bincount(assign, minlength=n_lists).astype(np.float32)
+            nonempty = counts > 0
+            centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+        assign = self._nearest(x, centroids)
+        order = np.argsort(assign, kind='stable')
+        bounds = np.searchsorted(assign[order], np.arange(n_lists + 1))
+        self._centroids = np.ascontiguousarray(centroids)
+        self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(n_lists)]
+
+    @staticmethod
+    def _sq_distances(q, g, g_sq=None):
+        if g_sq is None:
+            g_sq = np.einsum('ij,ij->i', g, g)
+        q_sq = np.einsum('ij,ij->i', q, q)
+        d = q_sq[:, None] + g_sq[None, :] - 2.0 * (q @ g.T)
+        np.maximum(d, 0.0, out=d)
+        return d
+
+    @classmethod
+    def _nearest(cls, x, centroids, chunk=8192):
+        out = np.empty(len(x), dtype=np.intp)
+        c_sq = np.einsum('ij,ij->i', centroids, centroids)
+        for i in range(0, len(x), chunk):
+            out[i:i + chunk] = np.argmin(cls._sq_distances(x[i:i + chunk], centroids, c_sq), axis=1)
+        return out
+
+    def search(self, queries):
+        """Nearest gallery entry per query. Returns (indices, distances); index -1 if the gallery is empty"""
+        q = np.asarray(queries, dtype=np.float32).reshape(-1, self.embeddings.shape[1])
+        if len(q) == 0 or len(self) == 0:
+            return np.full(len(q), -1, dtype=np.intp), np.full(len(q), np.inf, dtype=np.float32)
+
+        if not self.partitioned:
+            d = self._sq_distances(q, self.embeddings, self._sq_norms)
+            best = np.argmin(d, axis=1)
+            return best, np.sqrt(d[np.arange(len(q)), best])
+
+        cd = self._sq_distances(q, self._centroids)
+        n_probe = min(self.n_probe, len(self._centroids))
+        probes = np.argpartition(cd, n_probe - 1, axis=1)[:, :n_probe]
+        best = np.empty(len(q), dtype=np.intp)
+        dist = np.empty(len(q), dtype=np.float32)
+        for i in range(len(q)):
+            cand = np.concatenate([self._lists[p] for p in probes[i]])
+            if len(cand) == 0:
+                cand = np.arange(len(self))
+            d = self._sq_distances(q[i:i + 1], self.embeddings[cand], self._sq_norms[cand])[0]
+            j = int(np.argmin(d))
+            best[i], dist[i] = cand[j], np.sqrt(d[j])
+        return best, dist
+
+    def match(self, queries):
+        """Label per query ("Unknown" beyond tolerance) plus the best distances"""
+        best, dist = self.search(queries)
+        names = [self.labels[b] if b >= 0 and d <= self.tolerance else UNKNOWN
+                 for b, d in zip(best, dist)]
+        return names, dist
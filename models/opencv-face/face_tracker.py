@@ -0,0 +1,148 @@
+import numpy as np
+
+from face_index import UNKNOWN
+
+
+class FaceTrack:
+    __slots__ = ("id", "box", "name", "distance", "encoded_at", "last_seen", "match_iou")
+
+    def __init__(self, track_id, box, frame_idx):
+        self.id = track_id
+        self.box = box              # (top, right, bottom, left), same as face_recognition
+        self.name = None            # None until the encoder has run once
+        self.distance = np.inf
+        self.encoded_at = None
+        self.last_seen = frame_idx
+        self.match_iou = 0.0
+
+
+def _iou_matrix(a, b):
+    """IoU between every box in a [N,4] and b [M,4], boxes as (top, right, bottom, left)"""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    top = np.maximum(a[:, None, 0], b[None, :, 0])
+    right = np.minimum(a[:, None, 1], b[None, :, 1])
+    bottom = np.minimum(a[:, None, 2], b[None, :, 2])
+    left = np.maximum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(right - left, 0, None) * np.clip(bottom - top, 0, None)
+    area_a = (a[:, 1] - a[:, 3]) * (a[:, 2] - a[:, 0])
+    area_b = (b[:, 1] - b[:, 3]) * (b[:, 2] - b[:, 0])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+def _centroids(boxes):
+    b = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    return np.stack([(b[:, 1] + b[:, 3]) / 2, (b[:, 0] + b[:, 2]) / 2], axis=1), \
+        np.maximum(b[:, 1] - b[:, 3], b[:, 2] - b[:, 0])
+
+
+class FaceTracker:
+    """
+    Associates face detections across frames and caches each track's identity.
+
+    Detections are matched to existing tracks greedily by IoU, falling back to
+    centroid distance (relative to face size) for fast motion. A track only
+    needs the expensive encoder when it is new, when its identity is older than
+    `refresh_interval` frames, when it is Unknown or a borderline match
+    (`confident_distance`) and older than `unsure_refresh_interval`, or when
+    the association was weak (IoU below `reencode_iou`) and it might be a
+    different person.
+    """
+
+    def __init__(self, iou_threshold=0.3, centroid_factor=0.5, max_missed=5,
+                 refresh_interval=30, unsure_refresh_interval=5,
+                 confident_distance=0.5, reencode_iou=0.3):
+        self.iou_threshold = iou_threshold
+        self.centroid_factor = centroid_factor
+        self.max_missed = max_missed
+        self.refresh_interval = refresh_interval
+        self.unsure_refresh_interval = unsure_refresh_interval
+        self.confident_distance = confident_distance
+        self.reencode_iou = reencode_iou
+        self.tracks = []
+        self.frame_idx = 0
+        self._next_id = 1
+        self.encoder_calls = 0
+        self.encoder_skipped = 0
+
+    def update(self, boxes):
+        """Associate this frame's boxes with tracks. Returns one FaceTrack per box, in order"""
+        self.frame_idx += 1
+        boxes = [tuple(int(v) for v in b) for b in boxes]
+        assigned = [None] * len(boxes)
+        free = list(range(len(self.tracks)))
+
+        if boxes and self.tracks:
+            iou = _iou_matrix([t.box for t in self.tracks], boxes)
+            # Greedy: strongest overlaps first
+            for flat in np.argsort(-iou, axis=None):
+                ti, di = np.unravel_index(flat, iou.shape)
+                if iou[ti, di] < self.iou_threshold:
+                    break
+                if assigned[di] is None and ti in free:
+                    assigned[di] = self.tracks[ti]
+                    assigned[di].match_iou = float(iou[ti, di])
+                    free.remove(ti)
+
+            # Centroid fallback for detections that moved too far to overlap
+            pending = [i for i, t in enumerate(assigned) if t is None]
+            if pending and free:
+                tc, tsize = _centroids([self.tracks[i].box for i in free])
+                dc, _ = _centroids([boxes[i] for i in pending])
+                dist = np.linalg.norm(tc[:, None, :] - dc[None, :, :], axis=2) / tsize[:, None]
+                for flat in np.argsort(dist, axis=None):
+                    fi, pi = np.unravel_index(flat, dist.shape)
+                    if dist[fi, pi] > self.centroid_factor:
+                        break
+                    track = self.tracks[free[fi]] if free[fi] is not None else None
+                    if track is not None and assigned[pending[pi]] is None:
+                        assigned[pending[pi]] = track
+                        track.match_iou = 0.0
+                        free[fi] = None
+
+        for i, box in enumerate(boxes):
+            if assigned[i] is None:
+                assigned[i] = FaceTrack(self._next_id, box, self.frame_idx)
+                self._next_id += 1
+                self.tracks.append(assigned[i])
+            assigned[i].box = box
+            assigned[i].last_seen = self.frame_idx
+
+        self.tracks = [t for t in self.tracks if self.frame_idx - t.last_seen <= self.max_missed]
+        return assigned
+
+    def needs_encoding(self, track):
+        if track.encoded_at is None:
+            return True
+        age = self.frame_idx - track.encoded_at
+        if age >= self.refresh_interval:
+            return True
+        unsure = track.name == UNKNOWN or track.distance > self.confident_distance
+        if unsure and age >= self.unsure_refresh_interval:
+            return True
+        # Weak association: could be someone else who stepped into the same spot
+        return track.match_iou < self.reencode_iou
+
+    def resolve(self, track, name, distance):
+        track.name = name
+        track.distance = float(distance)
+        track.encoded_at = self.frame_idx
+
+    def count(self, encoded, total):
+        self.encoder_calls += encoded
+        self.encoder_skipped += total - encoded
+
+    def invalidate(self):
+        """Force every track to be re-encoded (e.g. after the gallery changed)"""
+        for t in self.tracks:
+            t.encoded_at = None
+
+    def stats(self):
+        total = self.encoder_calls + self.encoder_skipped
+        return {
+            "tracks": len(self.tracks),
+            "encoder_calls": self.encoder_calls,
+            "encoder_skipped": self.encoder_skipped,
+            "skip_ratio": round(self.encoder_skipped / total, 3) if total else 0.0,
+        }
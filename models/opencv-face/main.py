@@ -1,103 +1,210 @@
 import cv2
 import face_recognition
+import json
 import numpy as np
 import os
+import sys
+import threading
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.abspath(os.path.join(current_dir, "..", ".."))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)  # app.py loads us by path, so make siblings importable
+if root_dir not in sys.path:
+    sys.path.append(root_dir)  # for frame_context when run standalone
+
+from frame_context import FrameContext
+from results import Detections
+from face_index import FaceIndex, UNKNOWN
+from face_cache import EncodingCache
+from face_tracker import FaceTracker
+from face_cascade import Mosaic, PersonDetector, pose_regions
+from annotate import draw_name_tags
+
+# Identity caching: re-run the encoder for a tracked face only every
+# REFRESH_INTERVAL frames (sooner if it is Unknown or a weak match)
+REFRESH_INTERVAL = 30
+UNSURE_REFRESH_INTERVAL = 5
+
+# One tracker per video source: tracks only make sense within one stream
+trackers = {}
+trackers_lock = threading.Lock()
+
+def get_tracker(source=None):
+    with trackers_lock:
+        tracker = trackers.get(source)
+        if tracker is None:
+            tracker = trackers[source] = FaceTracker(refresh_interval=REFRESH_INTERVAL,
+                                                     unsure_refresh_interval=UNSURE_REFRESH_INTERVAL)
+        return tracker
 
 # Load known faces
 known_face_encodings = []
 known_face_names = []
+face_index = FaceIndex()
 
-current_dir = os.path.dirname(os.path.abspath(__file__))
 faces_dir = os.path.join(current_dir, "known_faces")
+cache_dir = os.path.join(current_dir, ".face_cache")
+encoding_cache = EncodingCache(faces_dir, cache_dir)
+
+
+def encode_image(img_path):
+    img = face_recognition.load_image_file(img_path)
+    enc = face_recognition.face_encodings(img)
+    return enc[0] if enc else None
+
 
 def load_faces():
-    global known_face_encodings, known_face_names
+    """Sync the embedding cache with known_faces/ and swap in a fresh index"""
+    global known_face_encodings, known_face_names, face_index
 
     if not os.path.exists(faces_dir):
         os.makedirs(faces_dir)
         return
 
-    # Loop through each folder (each person)
-    for person_name in os.listdir(faces_dir):
-        person_folder = os.path.join(faces_dir, person_name)
+    print("[FaceDetect] Loading known faces...")
+    embeddings, names, stats = encoding_cache.sync(encode_image)
+    print(f"[FaceDetect] {len(names)} faces ({stats['encoded']} encoded, "
+          f"{stats['reused']} cached, {stats['removed']} removed)")
 
-        if not os.path.isdir(person_folder):
-            continue  # skip files
+    known_face_encodings = embeddings
+    known_face_names = names
+    # Single assignment, so process_frame sees either the old or the new gallery
+    face_index = FaceIndex(embeddings, names)
+    with trackers_lock:
+        for tracker in trackers.values():
+            tracker.invalidate()
 
-        print(f"[FaceDetect] Loading faces for: {person_name}")
 
-        # Load all images for this person
-        for img_name in os.listdir(person_folder):
-            if img_name.lower().endswith(('.jpg', '.jpeg', '.png')):
-                img_path = os.path.join(person_folder, img_name)
-                
-                try:
-                    img = face_recognition.load_image_file(img_path)
-                    enc = face_recognition.face_encodings(img)
-
-                    if enc:
-                        known_face_encodings.append(enc[0])
-                        known_face_names.append(person_name)
-                        print(f"   - Loaded {img_name}")
-                    else:
-                        print(f"   - No face found in {img_name}")
-
-                except Exception as e:
-                    print(f"   - Error loading {img_name}: {e}")
+def reload():
+    """Pick up added, changed or deleted gallery images without restarting the app"""
+    if encoding_cache.is_stale():
+        load_faces()
+        return True
+    return False
 
 
 # Load on startup
 load_faces()
 
-def process_frame(frame):
+SCALE = 0.25  # Detection runs on a downscaled frame for speed
+
+# Where to look for faces:
+#   "frame" - the whole frame at SCALE
+#   "pose"  - around the head of the person found by the shared MediaPipe Pose pass
+#   "yolo"  - in the upper part of every YOLOv8 person box (needs ultralytics)
+# In the cascaded modes the head regions are cut from the full-resolution
+# frame and scaled to about crop_size pixels (face_cascade.py), so small
+# faces seen from altitude are found while dlib sees far fewer pixels.
+values_path = os.path.join(current_dir, "values.json")
+config = {
+    "detector": "frame",
+    "crop_size": 160,
+    "max_upscale": 4.0,
+    "person_imgsz": 640,
+}
+
+# External override
+if os.path.exists(values_path):
+    with open(values_path, "r") as f:
+        config.update(json.load(f))
+
+person_detector = PersonDetector(os.path.join(root_dir, "models", "yolov8", "yolov8n.pt"),
+                                 imgsz=config["person_imgsz"])
+detector_stats = {"frames": 0, "pixels": 0, "regions": 0}
+
+def find_faces(context):
+    """
+    Face locations as (top, right, bottom, left). Returns (image the faces
+    were found in, locations in that image, locations in the frame at `scale`, scale)
+    """
+    if config["detector"] == "frame":
+        # Downscaled RGB for faster processing (face_recognition expects RGB);
+        # shared with any other model asking for the same view
+        image = context.scaled_rgb(SCALE)
+        locations = face_recognition.face_locations(image)
+        detector_stats["pixels"] += image.shape[0] * image.shape[1]
+        return image, locations, locations, SCALE
+
+    if config["detector"] == "pose":
+        regions = pose_regions(context)
+    else:
+        regions = person_detector.regions(context.image)
+    mosaic = Mosaic(context.rgb, regions, config["crop_size"], config["max_upscale"])
+    detector_stats["regions"] += len(mosaic.tiles)
+    if not mosaic.tiles:
+        return mosaic.image, [], [], 1.0
+    # Every person's crop goes through one detector call
+    found = face_recognition.face_locations(mosaic.image)
+    detector_stats["pixels"] += mosaic.pixels
+    in_mosaic, in_frame = mosaic.to_frame(found)
+    return mosaic.image, in_mosaic, in_frame, 1.0
+
+def detect(frame, context=None):
     if frame is None:
-        return None, []
-        
+        return Detections()
+
     logs = []
-    
-    # Resize frame for faster processing
-    small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-    rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB) # face_recognition expects RGB
-    
+    context = FrameContext.ensure(frame, context)
+
     # Detect faces
-    face_locations = face_recognition.face_locations(rgb_small_frame)
-    face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-    
-    face_names = []
-    for face_encoding in face_encodings:
-        matches = face_recognition.compare_faces(known_face_encodings, face_encoding)
-        name = "Unknown"
-        
-        # Use distance for better match
-        face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
-        if len(face_distances) > 0:
-            best_match_index = np.argmin(face_distances)
-            if matches[best_match_index]:
-                name = known_face_names[best_match_index]
-        
-        face_names.append(name)
-        if name != "Unknown":
+    image, locations, face_locations, scale = find_faces(context)
+    detector_stats["frames"] += 1
+
+    # Only new tracks (or ones due for a refresh) go through the encoder
+    tracker = get_tracker(context.source)
+    tracks = tracker.update(face_locations)
+    stale = [i for i, t in enumerate(tracks) if tracker.needs_encoding(t)]
+    if stale:
+        # One encoder call for all of them (in the cascaded modes, on the upscaled crops)
+        face_encodings = face_recognition.face_encodings(
+            image, [locations[i] for i in stale])
+        # Match every encoded face against the gallery in one batched pass
+        names, distances = face_index.match(face_encodings)
+        for i, name, dist in zip(stale, names, distances):
+            tracker.resolve(tracks[i], name, dist)
+    tracker.count(len(stale), len(tracks))
+
+    face_names = [t.name for t in tracks]
+    for name in face_names:
+        if name != UNKNOWN:
             logs.append(f"Identified: {name}")
-        else:
-            # logs.append("Detected Unknown Person")
-            pass
-
-    # Display results
-    for (top, right, bottom, left), name in zip(face_locations, face_names):
-        # Scale back up
-        top *= 4
-        right *= 4
-        bottom *= 4
-        left *= 4
-        
-        color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
-        
-        cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-        
-        cv2.rectangle(frame, (left, bottom - 35), (right, bottom), color, cv2.FILLED)
-        cv2.putText(frame, name, (left + 6, bottom - 6), cv2.FONT_HERSHEY_DUPLEX, 0.8, (255, 255, 255), 1)
-        
-    return frame, logs
+
+    # (top, right, bottom, left) at `scale` -> (x1, y1, x2, y2) in the full frame
+    locs = np.asarray(face_locations, dtype=np.float32).reshape(-1, 4) / scale
+    boxes = locs[:, [3, 0, 1, 2]]
+    return Detections(boxes, identities=face_names, logs=logs)
+
+def draw(frame, detections):
+    colors = [(0, 255, 0) if name != UNKNOWN else (0, 0, 255) for name in detections.identities]
+    return draw_name_tags(frame, detections.boxes, colors, detections.identities)
+
+def process_frame(frame, context=None):
+    if frame is None:
+        return None, []
+
+    detections = detect(frame, context)
+    return draw(frame, detections), detections.logs
+
+def get_stats():
+    with trackers_lock:
+        per_source = {source: t.stats() for source, t in trackers.items()}
+    if len(per_source) <= 1:
+        stats = dict(next(iter(per_source.values()), {}))
+    else:
+        # Totals across sources, plus each source's own counters
+        stats = {key: sum(s[key] for s in per_source.values())
+                 for key in ("tracks", "encoder_calls", "encoder_skipped")}
+        done = stats["encoder_calls"] + stats["encoder_skipped"]
+        stats["skip_ratio"] = round(stats["encoder_skipped"] / done, 3) if done else 0.0
+        stats["sources"] = per_source
+    # Pixels handed to the face detector per frame, and person regions per frame when cascaded
+    frames = detector_stats["frames"]
+    stats["detector"] = config["detector"]
+    stats["detector_pixels"] = round(detector_stats["pixels"] / frames) if frames else 0
+    if config["detector"] != "frame":
+        stats["regions"] = round(detector_stats["regions"] / frames, 2) if frames else 0.0
+    return stats
 
 def run_standalone():
     cap = cv2.VideoCapture(0)
@@ -3,9 +3,19 @@ import mediapipe as mp
 import numpy as np
 import json
 import os
+import sys
+import threading
 
-# Load values
 current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.abspath(os.path.join(current_dir, "..", ".."))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)  # for frame_context / results when run standalone
+
+from frame_context import FrameContext
+from results import Detections
+from annotate import draw_points, draw_skeletons
+
+# Load values
 values_path = os.path.join(current_dir, "values.json")
 
 config = {
@@ -29,62 +39,74 @@ if os.path.exists(values_path):
         config.update(json.load(f))
 
 mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(
-    static_image_mode=False,
-    max_num_hands=config["max_num_hands"],
-    min_detection_confidence=config["min_detection_confidence"],
-    min_tracking_confidence=config["min_tracking_confidence"]
-)
-
-def draw_hand_skeleton(image, hand_landmarks, connections):
+
+# One graph per video source: it tracks hands between frames, so streams must not share one
+hands = {}
+hands_lock = threading.Lock()
+
+def get_hands(source=None):
+    """(graph, lock) of `source`; MediaPipe graphs are not re-entrant"""
+    with hands_lock:
+        entry = hands.get(source)
+        if entry is None:
+            entry = hands[source] = (mp_hands.Hands(
+                static_image_mode=False,
+                max_num_hands=config["max_num_hands"],
+                min_detection_confidence=config["min_detection_confidence"],
+                min_tracking_confidence=config["min_tracking_confidence"]
+            ), threading.Lock())
+        return entry
+
+INDEX_LABELS = [str(i) for i in range(21)]
+
+def draw_hand_skeleton(image, points, connections):
+    """`points` are the 21 landmarks of one hand in pixel coordinates"""
     colors = config["colors"]
     dims = config["dimensions"]
 
-    circle_color = tuple(colors["circle"])
-    line_color = tuple(colors["line"])
-    text_color = tuple(colors["text"])
+    # 1️⃣ Draw connections only (one polylines call)
+    draw_skeletons(image, points[None], connections, tuple(colors["line"]), dims["line_thickness"])
 
-    h, w, _ = image.shape
+    # 2️⃣ Draw joint circles + numbers
+    draw_points(image, points, tuple(colors["circle"]), dims["circle_radius"],
+                labels=INDEX_LABELS, label_color=tuple(colors["text"]))
 
-    # 1️⃣ Draw connections only
-    for start_idx, end_idx in connections:
-        start = hand_landmarks[start_idx]
-        end = hand_landmarks[end_idx]
+    return image
 
-        p1 = (int(start.x * w), int(start.y * h))
-        p2 = (int(end.x * w), int(end.y * h))
 
-        cv2.line(image, p1, p2, line_color, dims["line_thickness"])
+def detect(frame, context=None):
+    if frame is None:
+        return Detections()
 
-    # 2️⃣ Draw joint circles + numbers
-    for idx, landmark in enumerate(hand_landmarks):
-        cx = int(landmark.x * w)
-        cy = int(landmark.y * h)
+    context = FrameContext.ensure(frame, context)
+    graph, lock = get_hands(context.source)
+    with lock:
+        result = graph.process(context.rgb)
+    if not result.multi_hand_landmarks:
+        return Detections()
 
-        # circle
-        cv2.circle(image, (cx, cy), dims["circle_radius"], circle_color, -1)
+    h, w = frame.shape[:2]
+    landmarks = np.array([[(lm.x, lm.y) for lm in hand.landmark]
+                          for hand in result.multi_hand_landmarks], np.float32) * (w, h)
+    boxes = np.concatenate([landmarks.min(axis=1), landmarks.max(axis=1)], axis=1)
+    labels = [info.classification[0].label for info in result.multi_handedness]
+    logs = [f"Detected {label} Hand" for label in labels]
+    return Detections(boxes, labels=labels, landmarks=landmarks, logs=logs)
 
-        # index text
-        cv2.putText(image, str(idx), (cx + 5, cy - 5), cv2.FONT_HERSHEY_SIMPLEX, 
-                    0.4, text_color, 1)
 
-    return image
+def draw(frame, detections):
+    if detections.landmarks is not None:
+        for points in detections.landmarks:
+            draw_hand_skeleton(frame, points, mp_hands.HAND_CONNECTIONS)
+    return frame
 
 
-def process_frame(frame):
+def process_frame(frame, context=None):
     if frame is None:
         return None, []
 
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    result = hands.process(frame_rgb)
-    logs = []
-
-    if result.multi_hand_landmarks:
-        for hand_landmarks, hand_info in zip(result.multi_hand_landmarks, result.multi_handedness):
-            frame = draw_hand_skeleton(frame, hand_landmarks.landmark, mp_hands.HAND_CONNECTIONS)
-            logs.append(f"Detected {hand_info.classification[0].label} Hand")
-
-    return frame, logs
+    detections = detect(frame, context)
+    return draw(frame, detections), detections.logs
 
 
 def run_standalone():
@@ -1,56 +1,51 @@
 import cv2
 import mediapipe as mp
 import numpy as np
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.abspath(os.path.join(current_dir, "..", ".."))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)  # for frame_context / results when run standalone
+
+from frame_context import FrameContext
+from results import Detections
+from annotate import draw_boxes
 
 mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(
-    static_image_mode=False,
-    model_complexity=1,
-    enable_segmentation=False,
-    min_detection_confidence=0.5
-)
 
-def process_frame(frame):
+BOX_COLOR = (0, 255, 0)
+PAD = 20
+
+def detect(frame, context=None):
+    if frame is None:
+        return Detections()
+
+    # Pose landmarks come from the shared engine, once per frame for all models
+    context = FrameContext.ensure(frame, context)
+    results = context.pose()
+    if not results.pose_landmarks:
+        return Detections()
+
+    h, w = frame.shape[:2]
+    points = np.array([(lm.x, lm.y) for lm in results.pose_landmarks.landmark], np.float32) * (w, h)
+
+    # Bounding box of all landmarks, padded and clipped to the frame
+    x_min, y_min = np.maximum(points.min(axis=0).astype(int) - PAD, 0)
+    x_max, y_max = np.minimum(points.max(axis=0).astype(int) + PAD, (w, h))
+    return Detections([[x_min, y_min, x_max, y_max]], labels=["Person"], logs=["Person Detected"])
+
+def draw(frame, detections):
+    return draw_boxes(frame, detections.boxes, BOX_COLOR, 2, detections.labels or [],
+                      label_offset=(0, -10), scale=0.9)
+
+def process_frame(frame, context=None):
     if frame is None:
         return None, []
-    
-    logs = []
-    
-    # Convert RGB
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    results = pose.process(frame_rgb)
-    
-    if results.pose_landmarks:
-        h, w, c = frame.shape
-        
-        # Calculate Bounding Box
-        x_min, x_max = w, 0
-        y_min, y_max = h, 0
-        
-        detected = False
-        for lm in results.pose_landmarks.landmark:
-            x, y = int(lm.x * w), int(lm.y * h)
-            if x < x_min: x_min = x
-            if x > x_max: x_max = x
-            if y < y_min: y_min = y
-            if y > y_max: y_max = y
-            detected = True
-            
-        if detected:
-            # Add padding
-            pad = 20
-            x_min = max(0, x_min - pad)
-            x_max = min(w, x_max + pad)
-            y_min = max(0, y_min - pad)
-            y_max = min(h, y_max + pad)
-            
-            # Draw Box
-            cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 255, 0), 2)
-            cv2.putText(frame, "Person", (x_min, y_min - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-            
-            logs.append("Person Detected")
 
-    return frame, logs
+    detections = detect(frame, context)
+    return draw(frame, detections), detections.logs
 
 def run_standalone():
     cap = cv2.VideoCapture(0)
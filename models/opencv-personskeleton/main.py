@@ -1,37 +1,59 @@
 import cv2
 import mediapipe as mp
 import numpy as np
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.abspath(os.path.join(current_dir, "..", ".."))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)  # for frame_context / results when run standalone
+
+from frame_context import FrameContext
+from results import Detections
 
-mp_drawing = mp.solutions.drawing_utils
 mp_pose = mp.solutions.pose
 
-pose = mp_pose.Pose(
-    static_image_mode=False,
-    model_complexity=1,
-    enable_segmentation=False,
-    min_detection_confidence=0.5
-)
+JOINT_COLOR = (245, 117, 66)
+BONE_COLOR = (245, 66, 230)
+MIN_VISIBILITY = 0.5
+
+def detect(frame, context=None):
+    if frame is None:
+        return Detections()
+
+    # Pose landmarks come from the shared engine, once per frame for all models
+    context = FrameContext.ensure(frame, context)
+    results = context.pose()
+    if not results.pose_landmarks:
+        return Detections()
+
+    h, w = frame.shape[:2]
+    landmarks = np.array([(lm.x, lm.y, lm.visibility) for lm in results.pose_landmarks.landmark], np.float32)
+    landmarks[:, :2] *= (w, h)
+    box = np.concatenate([landmarks[:, :2].min(axis=0), landmarks[:, :2].max(axis=0)])
+    return Detections([box], landmarks=landmarks[None], logs=["Skeleton Checked"])
 
-def process_frame(frame):
+def draw(frame, detections):
+    if detections.landmarks is None:
+        return frame
+    for skeleton in detections.landmarks:
+        points = [tuple(p) for p in skeleton[:, :2].astype(int).tolist()]
+        visible = (skeleton[:, 2] >= MIN_VISIBILITY).tolist()
+        for start_idx, end_idx in mp_pose.POSE_CONNECTIONS:
+            if visible[start_idx] and visible[end_idx]:
+                cv2.line(frame, points[start_idx], points[end_idx], BONE_COLOR, 2)
+        for point, vis in zip(points, visible):
+            if vis:
+                cv2.circle(frame, point, 2, JOINT_COLOR, 2)
+    return frame
+
+def process_frame(frame, context=None):
     if frame is None:
         return None, []
-    
-    logs = []
-    
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    results = pose.process(frame_rgb)
-    
-    if results.pose_landmarks:
-        mp_drawing.draw_landmarks(
-            frame, 
-            results.pose_landmarks, 
-            mp_pose.POSE_CONNECTIONS,
-            mp_drawing.DrawingSpec(color=(245,117,66), thickness=2, circle_radius=2),
-            mp_drawing.DrawingSpec(color=(245,66,230), thickness=2, circle_radius=2)
-        )
-        logs.append("Skeleton Checked")
-        
-    return frame, logs
+
+    detections = detect(frame, context)
+    return draw(frame, detections), detections.logs
 
 def run_standalone():
     cap = cv2.VideoCapture(0)
@@ -1,12 +1,22 @@
 import cv2
+import numpy as np
 from ultralytics import YOLO
 import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.abspath(os.path.join(current_dir, "..", ".."))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)  # for results / batching when run standalone
+
+from results import Detections
+from batching import MicroBatcher
+from annotate import draw_boxes
 
 # ------------------------------
 # Load YOLO Model
 # ------------------------------
 
-current_dir = os.path.dirname(os.path.abspath(__file__))
 # We will use 'yolov8n.pt' which is the standard nano model name. 
 # Ultralytics auto-downloads it to the current working dir if not found of specific path.
 # To keep it inside our model folder, we specify the path.
@@ -37,44 +47,84 @@ def load_model():
 yolo_model = load_model()
 
 # ------------------------------
-# Process Frame
+# Detect / Draw
 # ------------------------------
 
-def process_frame(frame):
+BOX_COLOR = (0, 255, 255)
+
+# Frames from several video sources are run through YOLO together: one
+# forward pass over a batch costs much less than one pass per frame.
+MAX_BATCH = 8
+MAX_WAIT = 0.02  # seconds a frame may wait for the other sources' frames
+
+# With `--motion-crop` the app may pass crops of the regions that changed.
+# An input smaller than the network size runs at its own size instead of
+# being scaled up, so a small crop costs a fraction of a full frame.
+SUPPORTS_CROPS = True
+INPUT_SIZE = 640
+
+def to_detections(r):
+    boxes = r.boxes.xyxy.cpu().numpy()
+    scores = r.boxes.conf.cpu().numpy()
+    class_ids = r.boxes.cls.cpu().numpy().astype(np.int32)
+
+    # Safety check if class index is in names
+    labels = [yolo_model.names[c] if c in yolo_model.names else str(c) for c in class_ids.tolist()]
+    # No confidence in the text: identical messages are aggregated by the log
+    # store, and the scores are in the structured results anyway
+    logs = [f"Detected: {label}" for label in labels]
+    return Detections(boxes, scores, class_ids, labels, logs=logs)
+
+def input_size(frame):
+    side = max(frame.shape[:2])
+    return INPUT_SIZE if side >= INPUT_SIZE else -(-side // 32) * 32  # multiple of the stride
+
+def detect_batch(frames):
+    # Frames of the same input size share one forward pass
+    groups = {}
+    for i, frame in enumerate(frames):
+        groups.setdefault(input_size(frame), []).append(i)
+    detections = [None] * len(frames)
+    for size, indices in groups.items():
+        # run detection (verbose=False to keep stdout clean)
+        results = yolo_model([frames[i] for i in indices], imgsz=size, verbose=False)
+        for i, r in zip(indices, results):
+            detections[i] = to_detections(r)
+    return detections
+
+batcher = MicroBatcher(detect_batch, max_batch=MAX_BATCH, max_wait=MAX_WAIT, name="yolov8-batcher")
+
+def detect(frame, context=None):
     if frame is None:
-        return frame, []
+        return Detections()
 
-    logs = []
+    # Waits (at most MAX_WAIT) for the freshest frame of every other active
+    # source, then all of them go through one batched YOLO call
+    source = context.source if context is not None else None
+    return batcher.submit(frame, key=source)
 
-    # run detection (verbose=False to keep stdout clean)
-    results = yolo_model(frame, verbose=False)
 
-    annotated = frame.copy()
+def draw(frame, detections):
+    texts = [f"{label} {conf:.2f}" for label, conf in zip(detections.labels, detections.scores.tolist())]
+    return draw_boxes(frame, detections.boxes, BOX_COLOR, 2, texts)
 
-    for r in results:
-        for box in r.boxes:
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
-            cls = int(box.cls[0])
-            conf = float(box.conf[0])
-            
-            # Safety check if class index is in names
-            class_name = yolo_model.names[cls] if cls in yolo_model.names else str(cls)
-            label = f"{class_name} {conf:.2f}"
-
-            cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 255, 255), 2)
-            cv2.putText(
-                annotated,
-                label,
-                (x1, y1 - 8),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.7,
-                (0, 255, 255),
-                2
-            )
-
-            logs.append(f"Detected: {label}")
-
-    return annotated, logs
+
+# ------------------------------
+# Process Frame
+# ------------------------------
+
+def get_stats():
+    return batcher.stats()
+
+def close():
+    batcher.close()
+
+def process_frame(frame):
+    if frame is None:
+        return frame, []
+
+    detections = detect(frame)
+    return draw(frame.copy(), detections), detections.logs
 
 
 # ------------------------------
@@ -0,0 +1,237 @@
+import cv2
+import numpy as np
+import threading
+import time
+
+import metrics
+from broadcast import FrameBroadcaster
+from frame_context import call_with_context
+from recorder import REPLAY_PREFIX, ReplayCapture
+from results import ResultsFeed
+
+
+class FramePacket:
+    """A captured frame travelling through the capture -> inference -> publish stages"""
+    __slots__ = ("seq", "frame", "captured_at", "output", "results", "model_logs", "inferred_at", "recorded")
+
+    def __init__(self, seq, frame, captured_at=None):
+        self.seq = seq
+        self.frame = frame
+        self.captured_at = captured_at if captured_at is not None else time.monotonic()
+        self.output = None    # frame plus any legacy (process_frame) annotations
+        self.results = []     # (model_id, module, Detections) from structured models
+        self.model_logs = []  # (model_id, message) pairs
+        self.inferred_at = None
+        self.recorded = None  # [(model_id, Detections)] replayed with the frame (replay: sources)
+
+
+class LatestSlot:
+    """
+    Depth-1 mailbox between two pipeline stages.
+
+    put() never blocks: if the consumer hasn't taken the previous item yet it
+    is dropped and replaced, so the consumer always gets the freshest one.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Take the newest item, waiting up to `timeout` seconds. Returns None on timeout"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._item is not None, timeout=timeout):
+                return None
+            item, self._item = self._item, None
+            return item
+
+    def clear(self):
+        with self._cond:
+            self._item = None
+
+
+class StageStats:
+    """Counters and timing for one pipeline stage, with a latency histogram for /metrics"""
+
+    def __init__(self, name, source=None):
+        self.name = name
+        self.frames = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_ms = 0.0
+        self.avg_ms = 0.0
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self.histogram = metrics.histogram("drone_stage_duration_seconds", source=source, stage=name)
+
+    def record(self, seconds):
+        self.histogram.observe(seconds)
+        ms = seconds * 1000.0
+        with self._lock:
+            self.frames += 1
+            self.last_ms = ms
+            # Exponential moving average so the number tracks the current model
+            self.avg_ms = ms if self.frames == 1 else self.avg_ms * 0.9 + ms * 0.1
+
+    def snapshot(self):
+        elapsed = max(time.monotonic() - self._started, 1e-6)
+        latency = self.histogram.summary()
+        with self._lock:
+            return {
+                "frames": self.frames,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "fps": round(self.frames / elapsed, 2),
+                "last_ms": round(self.last_ms, 2),
+                "avg_ms": round(self.avg_ms, 2),
+                "p50_ms": latency["p50_ms"],
+                "p95_ms": latency["p95_ms"],
+                "p99_ms": latency["p99_ms"],
+            }
+
+
+class VideoSource:
+    """
+    One named video input (a drone, a webcam...) and everything downstream of it.
+
+    Each source runs its own capture -> inference -> publish threads and has
+    its own stage slots, stats, /video_feed/<name> broadcaster and results
+    feed; the loaded models are shared by all sources.
+    """
+
+    def __init__(self, name, url, quality=80):
+        self.name = name
+        self.url = url  # stream URL, or a camera index for cv2.VideoCapture
+        self.capture = None
+        self.capture_slot = LatestSlot()  # capture -> inference, newest frame only
+        self.result_slot = LatestSlot()   # inference -> publish
+        self.broadcaster = FrameBroadcaster(quality=quality, name=name)  # Encodes each processed frame once for all viewers
+        self.results_feed = ResultsFeed()  # Structured detections for API / WebSocket consumers
+        self.stage_stats = {stage: StageStats(stage, name) for stage in ("capture", "inference", "publish")}
+        self.reconnects = 0
+        self.recorder = None  # optional recorder.FlightRecorder
+
+    def stats(self):
+        return {stage: stats.snapshot() for stage, stats in self.stage_stats.items()}
+
+
+def parse_source(spec, default_name):
+    """'name=url' (or a bare url) -> (name, url); digits mean a local camera index"""
+    name, sep, url = spec.partition("=")
+    if not sep or "://" in name:
+        name, url = default_name, spec
+    return name, int(url) if url.isdigit() else url
+
+
+def open_capture(url):
+    """cv2.VideoCapture for a stream URL or camera index, or a ReplayCapture for 'replay:<dir>'"""
+    if isinstance(url, str) and url.startswith(REPLAY_PREFIX):
+        return ReplayCapture.from_url(url)
+    return cv2.VideoCapture(url)
+
+
+def composite(base, outputs):
+    """
+    Merge several models' annotated copies of `base` into one frame.
+
+    Every pixel a model changed (compared with the untouched frame) is taken
+    from that model's output; later models draw over earlier ones.
+    """
+    out = base.copy()
+    for annotated in outputs:
+        if annotated is None or annotated is base or annotated.shape != base.shape:
+            continue
+        changed = cv2.absdiff(annotated, base).max(axis=2, keepdims=True) > 0
+        np.copyto(out, annotated, where=changed)
+    return out
+
+
+def is_structured(module):
+    """True for models that return Detections via detect() and draw separately"""
+    return hasattr(module, 'detect') and hasattr(module, 'draw')
+
+
+def infer(module, frame, context=None, copy=False, scheduler=None, model_id=None, gate=None):
+    """Run one model. Returns (annotated frame or None, Detections or None, log lines)"""
+    t0 = time.perf_counter()
+    if is_structured(module):
+        if gate is not None and gate.can_crop(model_id, module, context):
+            # Only the regions that changed since the last run are looked at again
+            detections = gate.detect(model_id, module, frame, context)
+        elif scheduler is not None and scheduler.enabled and context is not None:
+            # Detector every K frames, boxes carried forward by optical flow in between
+            detections = scheduler.detect(model_id, module, frame, context)
+        else:
+            detections = call_with_context(module.detect, frame, context)
+        outcome = None, detections, detections.logs
+    else:
+        annotated, lines = call_with_context(module.process_frame, frame.copy() if copy else frame, context)
+        outcome = annotated, None, lines
+    source = context.source if context is not None else None
+    metrics.histogram("drone_model_inference_seconds", model=model_id, source=source).observe(time.perf_counter() - t0)
+    return outcome
+
+
+def run_models(models, frame, executor, context=None, scheduler=None, gate=None):
+    """
+    Run every (model_id, module) on the same frame, concurrently if there are several.
+
+    Structured models only compute results. Legacy models draw in place, so in
+    multi-model mode each gets its own copy and their drawings are composited;
+    the shared `context` is built from the untouched frame. An optional
+    DetectionScheduler decides when structured models really run, and an
+    optional MotionGate lets models that support it detect on crops.
+    Returns (frame with legacy annotations, [(model_id, module, Detections)],
+    [(model_id, log)], {model_id: error}).
+    """
+    if len(models) == 1:
+        model_id, module = models[0]
+        futures = [(model_id, module, None)]
+        try:
+            outcomes = [infer(module, frame, context, False, scheduler, model_id, gate)]
+        except Exception as e:
+            return frame, [], [], {model_id: e}
+    else:
+        futures = [(model_id, module, executor.submit(infer, module, frame, context, True, scheduler, model_id,
+                                                      gate))
+                   for model_id, module in models]
+        outcomes = []
+
+    annotated = []
+    results = []
+    model_logs = []
+    errors = {}
+    for i, (model_id, module, future) in enumerate(futures):
+        try:
+            output, detections, lines = outcomes[i] if future is None else future.result()
+        except Exception as e:
+            errors[model_id] = e
+            continue
+        if detections is not None:
+            results.append((model_id, module, detections))
+        elif output is not None:
+            annotated.append(output)
+        model_logs.extend((model_id, l) for l in lines)
+
+    if not annotated:
+        base = frame
+    elif len(annotated) == 1:
+        base = annotated[0]
+    else:
+        base = composite(frame, annotated)
+    return base, results, model_logs, errors
+
+
+def render(frame, results):
+    """Draw structured results onto `frame` (in place where the model allows)"""
+    for _, module, detections in results:
+        frame = module.draw(frame, detections)
+    return frame
@@ -0,0 +1,384 @@
+"""
+Flight recorder: keeps every frame and its structured results on disk.
+
+The publish stage hands each frame to FlightRecorder.record(), which only
+queues it; a background thread JPEG-encodes (unless it was given JPEG bytes
+already) and appends it to the current segment file. The app's capture stage
+reads sources through cv2.VideoCapture, which only hands out decoded frames,
+so live frames are re-encoded (at `quality`, on the writer thread); a caller
+that still has the source's JPEG passes `jpeg=` and skips the encode. The queue is bounded in
+bytes, so a slow disk costs dropped recordings, never memory or pipeline
+latency.
+
+Segments rotate by size or age. Each one is two files:
+
+    20250101-120000-0001.rec   magic, then records: header (timestamp, seq,
+                               jpeg length, results length), JPEG, results JSON
+    20250101-120000-0001.idx   one (timestamp, offset) pair per record
+
+Index entries are fixed-size and in timestamp order, so seeking to a time is
+a binary search over segment start times and then over one index. A segment
+whose index is missing or short (the app was killed) is re-indexed by
+scanning it.
+
+A recording directory can be played back as a video source, with the
+results recorded along with each frame (shown while no model is active):
+
+    python app.py --source drone=replay:recordings/drone
+    python app.py --source drone=replay:recordings/drone?speed=4&start=1735732800
+"""
+import bisect
+import json
+import os
+import struct
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qs
+
+import cv2
+import numpy as np
+
+from annotate import draw_boxes, draw_points
+from results import Detections
+
+MAGIC = b"DRONEREC"
+RECORD = struct.Struct("<dIII")  # wall-clock timestamp, frame seq, JPEG bytes, results bytes
+INDEX_DTYPE = np.dtype([("timestamp", "<f8"), ("offset", "<u8")])
+REPLAY_PREFIX = "replay:"
+
+
+class FlightRecorder:
+    """Records one source's frames and results into rotating segments under `directory`"""
+
+    def __init__(self, directory, quality=90, max_segment_bytes=256 * 1024 * 1024,
+                 max_segment_seconds=300, max_queue_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.quality = quality
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_seconds = max_segment_seconds
+        self.max_queue_bytes = max_queue_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._queued_bytes = 0
+        self._closed = False
+        self._data = None
+        self._index = None
+        self._segment_started = 0.0
+        self._segment_count = 0
+        self.segment_path = None
+        self.frames = 0
+        self.dropped = 0
+        self.bytes_written = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name=f"recorder-{os.path.basename(directory)}",
+                                        daemon=True)
+        self._thread.start()
+
+    def record(self, seq, timestamp, frame=None, jpeg=None, results=None):
+        """
+        Queue one frame (an ndarray to encode, or JPEG bytes) with its
+        [(model_id, Detections)] results. Never blocks; returns False if the
+        frame was dropped because the writer is too far behind.
+
+        The recorder keeps a reference to `frame` until it is encoded, so the
+        caller must not draw on it afterwards.
+        """
+        size = len(jpeg) if jpeg is not None else frame.nbytes
+        with self._cond:
+            if self._closed or self._queued_bytes + size > self.max_queue_bytes:
+                self.dropped += 1
+                return False
+            self._queue.append((seq, timestamp, frame, jpeg, results, size))
+            self._queued_bytes += size
+            self._cond.notify()
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    # Wake up now and then so an idle segment still rotates on time
+                    self._cond.wait(timeout=1.0)
+                    if not self._queue:
+                        self._rotate_if_due(time.time(), 0)
+                if not self._queue and self._closed:
+                    break
+                batch = list(self._queue)
+                self._queue.clear()
+            for seq, timestamp, frame, jpeg, results, size in batch:
+                try:
+                    self._write(seq, timestamp, frame, jpeg, results)
+                except Exception:
+                    self.errors += 1
+                with self._cond:
+                    self._queued_bytes -= size
+            if self._data is not None:
+                self._data.flush()
+                self._index.flush()
+        self._close_segment()
+
+    def _write(self, seq, timestamp, frame, jpeg, results):
+        if jpeg is None:
+            ok, buffer = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
+            if not ok:
+                raise ValueError("JPEG encoding failed")
+            jpeg = buffer.tobytes()
+        meta = b""
+        if results:
+            meta = json.dumps({model_id: det.to_dict() for model_id, det in results},
+                              separators=(",", ":")).encode()
+        record_size = RECORD.size + len(jpeg) + len(meta)
+        self._rotate_if_due(timestamp, record_size)
+        if self._data is None:
+            self._open_segment(timestamp)
+        offset = self._data.tell()
+        self._data.write(RECORD.pack(timestamp, seq & 0xFFFFFFFF, len(jpeg), len(meta)))
+        self._data.write(jpeg)
+        self._data.write(meta)
+        self._index.write(struct.pack("<dQ", timestamp, offset))
+        self.frames += 1
+        self.bytes_written += record_size
+
+    def _rotate_if_due(self, now, next_size):
+        if self._data is None:
+            return
+        too_big = self._data.tell() + next_size > self.max_segment_bytes
+        too_old = now - self._segment_started >= self.max_segment_seconds
+        if too_big or too_old:
+            self._close_segment()
+
+    def _open_segment(self, timestamp):
+        self._segment_count += 1
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(timestamp))
+        base = os.path.join(self.directory, f"{stamp}-{self._segment_count:04d}")
+        self.segment_path = base + ".rec"
+        self._data = open(self.segment_path, "wb")
+        self._data.write(MAGIC)
+        self._index = open(base + ".idx", "wb")
+        self._segment_started = timestamp
+
+    def _close_segment(self):
+        if self._data is not None:
+            self._data.close()
+            self._index.close()
+            self._data = self._index = None
+
+    def close(self, timeout=5.0):
+        """Write out whatever is queued and close the current segment"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "directory": self.directory,
+            "segment": self.segment_path,
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "bytes_written": self.bytes_written,
+            "queued_bytes": self._queued_bytes,
+        }
+
+
+class Segment:
+    """Read access to one .rec file through its time index"""
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path[:-len(".rec")] + ".idx"
+        self.index = self._load_index()
+
+    def _load_index(self):
+        size = os.path.getsize(self.path)
+        index = np.zeros(0, INDEX_DTYPE)
+        if os.path.exists(self.index_path):
+            count = os.path.getsize(self.index_path) // INDEX_DTYPE.itemsize
+            index = np.fromfile(self.index_path, INDEX_DTYPE, count=count)
+        # The index is written after its record, so a complete one never points past the end
+        if len(index) and int(index["offset"][-1]) < size:
+            with open(self.path, "rb") as f:
+                f.seek(int(index["offset"][-1]))
+                if _read_record(f) is not None and f.tell() == size:
+                    return index
+        return self._scan()
+
+    def _scan(self):
+        entries = []
+        with open(self.path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return np.zeros(0, INDEX_DTYPE)
+            while True:
+                offset = f.tell()
+                record = _read_record(f)
+                if record is None:
+                    break
+                entries.append((record[0], offset))
+        return np.array(entries, INDEX_DTYPE)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def start(self):
+        return float(self.index["timestamp"][0]) if len(self.index) else None
+
+    @property
+    def end(self):
+        return float(self.index["timestamp"][-1]) if len(self.index) else None
+
+    def find(self, timestamp):
+        """Position of the first record at or after `timestamp`"""
+        return int(np.searchsorted(self.index["timestamp"], timestamp, side="left"))
+
+    def records(self, position=0):
+        """Yield (timestamp, seq, jpeg, results) from `position` on"""
+        if position >= len(self.index):
+            return
+        with open(self.path, "rb") as f:
+            f.seek(int(self.index["offset"][position]))
+            for _ in range(len(self.index) - position):
+                record = _read_record(f)
+                if record is None:
+                    return
+                yield record
+
+
+def _read_record(f):
+    header = f.read(RECORD.size)
+    if len(header) < RECORD.size:
+        return None
+    timestamp, seq, jpeg_size, meta_size = RECORD.unpack(header)
+    jpeg = f.read(jpeg_size)
+    meta = f.read(meta_size)
+    if len(jpeg) < jpeg_size or len(meta) < meta_size:
+        return None  # truncated by a crash
+    return timestamp, seq, jpeg, json.loads(meta) if meta else {}
+
+
+class Recording:
+    """All segments in one recording directory, in time order"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        names = sorted(n for n in os.listdir(directory) if n.endswith(".rec"))
+        self.segments = [s for s in (Segment(os.path.join(directory, n)) for n in names) if len(s)]
+        self.segments.sort(key=lambda s: s.start)
+        self._starts = [s.start for s in self.segments]
+
+    @property
+    def start(self):
+        return self._starts[0] if self.segments else None
+
+    @property
+    def end(self):
+        return self.segments[-1].end if self.segments else None
+
+    def find(self, timestamp):
+        """(segment number, position) of the first record at or after `timestamp`"""
+        i = max(bisect.bisect_right(self._starts, timestamp) - 1, 0)
+        while i < len(self.segments):
+            position = self.segments[i].find(timestamp)
+            if position < len(self.segments[i]):
+                return i, position
+            i += 1
+        return len(self.segments), 0
+
+    def records(self, start=None):
+        """Yield (timestamp, seq, jpeg, results) from `start` (wall-clock seconds) to the end"""
+        i, position = self.find(start) if start is not None else (0, 0)
+        for segment in self.segments[i:]:
+            yield from segment.records(position)
+            position = 0
+
+
+def detections_from_dict(d):
+    """Detections back from their recorded to_dict() form"""
+    return Detections(d.get("boxes"), d.get("scores"), d.get("class_ids"), d.get("labels"),
+                      d.get("identities"), d.get("landmarks"))
+
+
+class RecordedModel:
+    """Stands in for the models whose replayed results are shown: boxes with their names, and landmarks"""
+    COLOR = (0, 200, 255)
+
+    @staticmethod
+    def draw(frame, detections):
+        names = detections.identities or detections.labels
+        draw_boxes(frame, detections.boxes, RecordedModel.COLOR, 2, names)
+        if detections.landmarks is not None:
+            draw_points(frame, detections.landmarks, RecordedModel.COLOR, 2)
+        return frame
+
+
+class ReplayCapture:
+    """
+    Plays a recording back with the part of the cv2.VideoCapture interface
+    the capture stage uses, paced by the recorded timestamps.
+
+    `speed` scales playback (0 = as fast as frames can be decoded); with
+    `loop` the recording starts over at the end, like a stream that never stops.
+    """
+
+    def __init__(self, directory, start=None, speed=1.0, loop=True):
+        self.directory = directory
+        self.start = start
+        self.speed = speed
+        self.loop = loop
+        self.last_results = None  # [(model_id, Detections)] recorded with the frame read last
+        try:
+            self.recording = Recording(directory)
+        except OSError:
+            self.recording = None
+        self._records = None
+        self._origin = None  # (recorded timestamp, monotonic time it was played)
+
+    @classmethod
+    def from_url(cls, url):
+        """'replay:<dir>?speed=2&start=<unix time>&loop=0'"""
+        directory, _, query = url[len(REPLAY_PREFIX):].partition("?")
+        params = {k: v[-1] for k, v in parse_qs(query).items()}
+        return cls(directory,
+                   start=float(params["start"]) if "start" in params else None,
+                   speed=float(params.get("speed", 1.0)),
+                   loop=params.get("loop", "1") not in ("0", "false"))
+
+    def isOpened(self):
+        return self.recording is not None and bool(self.recording.segments)
+
+    def set(self, prop, value):
+        return False  # buffering and fps options don't apply to a recording
+
+    def read(self):
+        if not self.isOpened():
+            return False, None
+        record = None
+        for _ in range(2):  # the rest of this pass, then (with loop) one fresh pass
+            fresh = self._records is None
+            if fresh:
+                self._records = self.recording.records(self.start)
+                self._origin = None
+            record = next(self._records, None)
+            if record is not None:
+                break
+            if fresh or not self.loop:
+                # A fresh pass with nothing in it (start past the end, no frames) would loop forever
+                return False, None
+            self._records = None
+        timestamp, _, jpeg, results = record
+        if self.speed > 0:
+            now = time.monotonic()
+            if self._origin is None:
+                self._origin = (timestamp, now)
+            due = self._origin[1] + (timestamp - self._origin[0]) / self.speed
+            if due > now:
+                time.sleep(due - now)
+        self.last_results = [(model_id, detections_from_dict(d)) for model_id, d in results.items()]
+        frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        return frame is not None, frame
+
+    def release(self):
+        self._records = None
@@ -0,0 +1,304 @@
+import gc
+import importlib.util
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import logs
+
+
+def rss_bytes():
+    """Resident memory of this process, or 0 if it can't be measured"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def import_model(models_dir, model_id):
+    """Import models/<model_id>/main.py under its own module name"""
+    model_path = os.path.join(models_dir, model_id, "main.py")
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model {model_id} not found")
+    # One module name per model so cached instances never collide
+    module_name = "model_" + "".join(c if c.isalnum() else "_" for c in model_id)
+    spec = importlib.util.spec_from_file_location(module_name, model_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class LoadedModel:
+    __slots__ = ("id", "module", "load_ms", "memory_bytes", "last_used")
+
+    def __init__(self, model_id, module, load_ms, memory_bytes):
+        self.id = model_id
+        self.module = module
+        self.load_ms = load_ms
+        self.memory_bytes = memory_bytes
+        self.last_used = time.time()
+
+
+class ModelRegistry:
+    """
+    Keeps loaded model modules warm and switches between them without a gap.
+
+    Each `models/<id>/main.py` is imported once under its own module name and
+    kept in an LRU cache bounded by `max_models` and, when memory can be
+    measured, by `memory_budget_mb` (RSS growth while importing is charged to
+    the model). activate() warms the requested model (or set of models) in a
+    background thread; `active` keeps pointing at the previous set until every
+    new model is fully imported, then ids and modules are swapped in one
+    assignment so the processing thread never sees a half-switched state.
+    """
+
+    def __init__(self, models_dir="models", max_models=3, memory_budget_mb=None, use_workers=False):
+        self.models_dir = models_dir
+        self.use_workers = use_workers  # run each model in a worker process (workers.py)
+        self.max_models = max_models
+        self.memory_budget = memory_budget_mb * 1024 * 1024 if memory_budget_mb else None
+        self.active = ()  # ((model_id, module), ...) - read and replaced as one tuple
+        self.last_switch = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._import_lock = threading.Lock()
+        self._pending = {}
+        self._target = None
+        self._users = {}    # module -> calls in flight (frames, background detections)
+        self._closing = {}  # module -> evicted entry, closed once its last call is done
+
+    @property
+    def active_ids(self):
+        return tuple(model_id for model_id, _ in self.active)
+
+    def _import(self, model_id):
+        if self.use_workers:
+            # Imported in its own process; the proxy has the plugin's interface
+            from workers import ProcessModel
+            if not os.path.exists(os.path.join(self.models_dir, model_id, "main.py")):
+                raise FileNotFoundError(f"Model {model_id} not found")
+            return ProcessModel(model_id, self.models_dir)
+        return import_model(self.models_dir, model_id)
+
+    def get(self, model_id):
+        """Return a loaded model, importing it (blocking) on a cache miss"""
+        with self._lock:
+            entry = self._cache.get(model_id)
+            if entry is not None:
+                self._cache.move_to_end(model_id)
+                entry.last_used = time.time()
+                return entry, True
+
+        # Serialise imports: measuring RSS growth only works one model at a time
+        with self._import_lock:
+            with self._lock:
+                entry = self._cache.get(model_id)
+            if entry is not None:
+                return entry, True
+            before = rss_bytes()
+            t0 = time.perf_counter()
+            module = self._import(model_id)
+            load_ms = (time.perf_counter() - t0) * 1000
+            # A worker process reports its own memory; in-process models are charged the RSS growth
+            memory = module.rss_bytes() if hasattr(module, "rss_bytes") else max(rss_bytes() - before, 0)
+            entry = LoadedModel(model_id, module, load_ms, memory)
+            with self._lock:
+                self._cache[model_id] = entry
+                evicted = self._evict()
+        self._release(evicted)
+        return entry, False
+
+    def _evict(self):
+        # Called with self._lock held; returns the entries it dropped
+        keep = set(self.active_ids) | set(self._target or ())
+        evicted = []
+
+        def over_budget():
+            if len(self._cache) > self.max_models:
+                return True
+            if self.memory_budget is not None:
+                return sum(e.memory_bytes for e in self._cache.values()) > self.memory_budget
+            return False
+
+        for model_id in list(self._cache):
+            if not over_budget():
+                break
+            if model_id in keep:
+                continue
+            evicted.append(self._cache.pop(model_id))
+        return evicted
+
+    def acquire(self, modules):
+        """Keep `modules` open (not closed if evicted) until release()"""
+        with self._lock:
+            self._acquire(modules)
+
+    def _acquire(self, modules):
+        # Called with self._lock held
+        for module in modules:
+            self._users[module] = self._users.get(module, 0) + 1
+
+    def release(self, modules):
+        done = []
+        with self._lock:
+            for module in modules:
+                count = self._users.get(module, 0) - 1
+                if count > 0:
+                    self._users[module] = count
+                    continue
+                self._users.pop(module, None)
+                entry = self._closing.pop(module, None)
+                if entry is not None:
+                    done.append(entry)
+        self._release(done)
+
+    @contextmanager
+    def using(self):
+        """The active ((model_id, module), ...), kept open while the block runs"""
+        with self._lock:
+            # Taken together, so nothing in the snapshot can be closed before it is held
+            active = self.active
+            modules = [module for _, module in active]
+            self._acquire(modules)
+        try:
+            yield active
+        finally:
+            self.release(modules)
+
+    def _release(self, evicted):
+        # Outside self._lock: close() may take a while (worker processes, sessions...).
+        # A model the inference stage is still running is closed by its last release()
+        with self._lock:
+            busy = [e for e in evicted if e.module in self._users]
+            for entry in busy:
+                self._closing[entry.module] = entry
+        evicted = [e for e in evicted if e not in busy]
+        for entry in evicted:
+            self._close(entry)
+        if evicted:
+            gc.collect()
+
+    @staticmethod
+    def _close(entry):
+        # Models may define close() to release cameras, sessions, GPU memory...
+        close = getattr(entry.module, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception as e:
+                logs.log("App", f"Error closing model {entry.id}: {e}", "WARNING")
+        logs.log("App", f"Evicted model from cache: {entry.id}", "INFO")
+
+    def _switch_info(self, ids, entries, cached, requested, superseded=False):
+        return {
+            "model_ids": list(ids),
+            "cached": cached,
+            "load_ms": round(sum(e.load_ms for e in entries) if not cached else 0.0, 1),
+            "memory_mb": round(sum(e.memory_bytes for e in entries) / (1024 * 1024), 1),
+            "switch_ms": round((time.perf_counter() - requested) * 1000, 3),
+            "superseded": superseded,
+        }
+
+    def activate(self, model_ids):
+        """
+        Switch to one model id or a list of ids run together. Returns a Future
+        resolving to the switch info dict.
+
+        The current set keeps serving until every model in the new set is
+        ready. If another activate() arrives while this one is still loading,
+        only the latest request is swapped in.
+        """
+        ids = (model_ids,) if isinstance(model_ids, str) else tuple(dict.fromkeys(model_ids))
+        if not ids:
+            raise ValueError("No model selected")
+        requested = time.perf_counter()
+        evicted = []
+        with self._lock:
+            self._target = ids
+            pending = self._pending.get(ids)
+            if pending is not None:
+                return pending
+            future = Future()
+
+            entries = [self._cache.get(i) for i in ids]
+            if all(e is not None for e in entries):
+                # Warm hit: swap right away, no thread needed
+                for e in entries:
+                    self._cache.move_to_end(e.id)
+                    e.last_used = time.time()
+                self.active = tuple((e.id, e.module) for e in entries)
+                # The outgoing set was kept while active; now it can go if the cache is over its limits
+                evicted = self._evict()
+                info = self._switch_info(ids, entries, True, requested)
+                self.last_switch = dict(info, at=time.time())
+                future.set_result(info)
+            else:
+                self._pending[ids] = future
+        if future.done():
+            self._release(evicted)
+            return future
+
+        def warm():
+            try:
+                loaded = [self.get(i) for i in ids]
+                entries = [e for e, _ in loaded]
+                cached = all(hit for _, hit in loaded)
+                evicted = []
+                with self._lock:
+                    superseded = self._target != ids
+                    if not superseded:
+                        self.active = tuple((e.id, e.module) for e in entries)
+                        evicted = self._evict()
+                self._release(evicted)
+                info = self._switch_info(ids, entries, cached, requested, superseded)
+                if not superseded:
+                    self.last_switch = dict(info, at=time.time())
+                future.set_result(info)
+            except Exception as e:
+                with self._lock:
+                    if self._target == ids:
+                        self._target = self.active_ids
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._pending.pop(ids, None)
+
+        threading.Thread(target=warm, name=f"warm-{'+'.join(ids)}", daemon=True).start()
+        return future
+
+    def close(self):
+        """Release every cached model (worker processes, sessions...) at shutdown"""
+        with self._lock:
+            entries = list(self._cache.values()) + list(self._closing.values())
+            self._cache.clear()
+            self._closing.clear()
+            self.active = ()
+        for entry in entries:
+            self._close(entry)
+
+    def status(self):
+        with self._lock:
+            cached = [{
+                "id": e.id,
+                "load_ms": round(e.load_ms, 1),
+                "memory_mb": round(e.memory_bytes / (1024 * 1024), 1),
+                "last_used": e.last_used,
+            } for e in self._cache.values()]
+            loading = [list(ids) for ids in self._pending]
+        return {
+            "active": list(self.active_ids),
+            "loading": loading,
+            "cached": cached,
+            "max_models": self.max_models,
+            "memory_budget_mb": self.memory_budget / (1024 * 1024) if self.memory_budget else None,
+            "last_switch": self.last_switch,
+        }
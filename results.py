@@ -0,0 +1,125 @@
+"""
+Structured model output.
+
+Models that define `detect(frame, context=None)` return a Detections object
+instead of an annotated image. Drawing is done separately by the model's
+`draw(frame, detections)`, and only when someone is watching the video, so
+headless runs skip all copy and annotation work. The same results are served
+as JSON (`/api/results`) and over a WebSocket (`/ws/results`) for downstream
+consumers such as the autopilot.
+"""
+import asyncio
+import threading
+import time
+
+import numpy as np
+
+from broadcast import AsyncNotifier
+
+
+def _round(a, digits=2):
+    return None if a is None else np.round(a.astype(np.float64), digits).tolist()
+
+
+class Detections:
+    """
+    Compact per-frame results of one model, all in full-frame pixel coordinates.
+
+    boxes       float32 [N, 4]  x1, y1, x2, y2
+    scores      float32 [N]     confidence (optional)
+    class_ids   int32   [N]     (optional)
+    labels      list[str]       class names, handedness, ... (optional)
+    identities  list[str]       recognised names (optional)
+    landmarks   float32 [N, K, 2 or 3]  x, y[, visibility] (optional)
+    logs        list[str]       messages for the mission log
+    """
+    __slots__ = ("boxes", "scores", "class_ids", "labels", "identities", "landmarks", "logs")
+
+    def __init__(self, boxes=None, scores=None, class_ids=None, labels=None,
+                 identities=None, landmarks=None, logs=None):
+        self.boxes = np.zeros((0, 4), np.float32) if boxes is None else np.asarray(boxes, np.float32).reshape(-1, 4)
+        self.scores = None if scores is None else np.asarray(scores, np.float32)
+        self.class_ids = None if class_ids is None else np.asarray(class_ids, np.int32)
+        self.labels = labels
+        self.identities = identities
+        self.landmarks = None if landmarks is None else np.asarray(landmarks, np.float32)
+        self.logs = logs if logs is not None else []
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def to_dict(self):
+        d = {"count": len(self), "boxes": _round(self.boxes, 1)}
+        if self.scores is not None:
+            d["scores"] = _round(self.scores, 3)
+        if self.class_ids is not None:
+            d["class_ids"] = self.class_ids.tolist()
+        if self.labels is not None:
+            d["labels"] = list(self.labels)
+        if self.identities is not None:
+            d["identities"] = list(self.identities)
+        if self.landmarks is not None:
+            d["landmarks"] = _round(self.landmarks, 1)
+        return d
+
+
+class ResultsFeed:
+    """
+    Latest structured results, shared with API and WebSocket consumers.
+
+    The JSON-ready payload for a sequence is built at most once, on first
+    request, so publishing costs nothing when nobody is listening.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._raw = None
+        self._payload_seq = 0
+        self._payload = None
+        self._notifier = AsyncNotifier()
+        self.subscribers = 0
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def attach_loop(self, loop):
+        self._notifier.attach_loop(loop)
+
+    def publish(self, seq, captured_at, frame_shape, results):
+        """`results` is a list of (model_id, Detections)"""
+        with self._lock:
+            self._raw = (seq, captured_at, time.time(), frame_shape, results)
+            self._seq += 1
+        self._notifier.notify()
+
+    def payload(self):
+        with self._lock:
+            if self._raw is None:
+                return None
+            captured_at = self._raw[1]
+            if self._payload_seq != self._seq:
+                frame_seq, _, published_at, shape, results = self._raw
+                self._payload = {
+                    "seq": self._seq,
+                    "frame_seq": frame_seq,
+                    "timestamp": published_at,
+                    "frame": {"width": shape[1], "height": shape[0]},
+                    "models": {model_id: det.to_dict() for model_id, det in results},
+                }
+                self._payload_seq = self._seq
+            payload = dict(self._payload)
+        # How old the underlying frame is right now (capture -> this response)
+        payload["age_ms"] = round((time.monotonic() - captured_at) * 1000, 1)
+        return payload
+
+    async def next_payload(self, last_seq, timeout=1.0):
+        """Wait for results newer than `last_seq`. Returns None on timeout"""
+        if not self._notifier.attached:
+            self.attach_loop(asyncio.get_running_loop())
+        if self._seq <= last_seq:
+            await self._notifier.wait(timeout)
+            if self._seq <= last_seq:
+                return None
+        return self.payload()
@@ -0,0 +1,234 @@
+"""
+Detect-every-K scheduling for structured models.
+
+Running a heavy detector (YOLO, pose) on every frame caps the display at the
+detector's speed. The DetectionScheduler runs a model's detect() only on
+every K-th frame, in a background thread, and carries the last boxes forward
+on the frames in between with sparse optical flow (falling back to each
+box's last velocity when its points are lost). The inference stage then
+keeps up with the capture rate and detector load drops by about K.
+
+K is either fixed (`every`) or chosen from a per-frame budget (`target_ms`):
+the smallest K whose average cost per frame, one detection plus K-1 cheap
+propagations, stays within the budget.
+"""
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from frame_context import FrameContext, call_with_context
+from results import Detections
+
+FLOW_SCALE = 0.5       # optical flow runs on a half-size gray frame
+POINTS_PER_BOX = 20
+MIN_POINTS = 3         # fewer tracked points than this -> constant-velocity prediction
+STALE_AFTER = 1.0      # seconds without frames before a stream's state is dropped
+
+LK_PARAMS = dict(winSize=(15, 15), maxLevel=2,
+                 criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+
+def shifted(detections, offsets, logs=None):
+    """Copy of `detections` with each box (and its landmarks) moved by offsets[i] = (dx, dy)"""
+    boxes = detections.boxes + np.tile(offsets, 2)
+    landmarks = detections.landmarks
+    if landmarks is not None and len(landmarks) == len(offsets):
+        landmarks = landmarks.copy()
+        landmarks[..., :2] += offsets[:, None, :]
+    return Detections(boxes, detections.scores, detections.class_ids, detections.labels,
+                      detections.identities, landmarks, logs if logs is not None else [])
+
+
+def seed_points(gray, boxes):
+    """Good features to track inside each box (boxes in flow coordinates). Returns (points [M,1,2], owner [M])"""
+    h, w = gray.shape
+    points, owner = [], []
+    for i, (x1, y1, x2, y2) in enumerate(boxes.astype(int).tolist()):
+        x1, y1, x2, y2 = max(x1, 0), max(y1, 0), min(x2, w), min(y2, h)
+        if x2 - x1 < 4 or y2 - y1 < 4:
+            continue
+        found = cv2.goodFeaturesToTrack(gray[y1:y2, x1:x2], POINTS_PER_BOX, 0.01, 3)
+        if found is not None:
+            points.append(found + np.float32([x1, y1]))
+            owner.append(np.full(len(found), i))
+    if not points:
+        return np.zeros((0, 1, 2), np.float32), np.zeros(0, int)
+    return np.concatenate(points).astype(np.float32), np.concatenate(owner)
+
+
+class _StreamState:
+    """What the scheduler knows about one (model, source) pair"""
+
+    def __init__(self):
+        self.detections = None   # latest boxes, already moved to the previous frame
+        self.gray = None         # flow frame the detections/points refer to
+        self.points = None
+        self.owner = None
+        self.velocity = None     # per-box (dx, dy) per frame, full-frame pixels
+        self.pending = None      # Future of a detect() running in the background
+        self.pending_gray = None
+        self.since_detect = 0
+        self.updated_at = 0.0
+
+    def adopt(self, detections, gray):
+        self.detections = detections
+        self.gray = gray
+        self.velocity = np.zeros((len(detections), 2), np.float32)
+        self.points, self.owner = seed_points(gray, detections.boxes * FLOW_SCALE)
+
+
+class DetectionScheduler:
+    def __init__(self, every=1, target_ms=None, max_every=15, workers=2, models=None):
+        self.every = every          # fixed K (1 = detect on every frame)
+        self.models = models        # ModelRegistry: keeps a model open while its background detect() runs
+        self.target_ms = target_ms  # per-frame budget; overrides `every` when set
+        self.max_every = max_every
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="detect")
+        self._states = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.target_ms is not None or self.every > 1
+
+    def configure(self, every=None, target_ms=None):
+        """Change K or the budget at runtime (target_ms=0 switches back to a fixed K)"""
+        if every is not None:
+            self.every = max(1, min(int(every), self.max_every))
+        if target_ms is not None:
+            self.target_ms = float(target_ms) if target_ms > 0 else None
+
+    def _model_stats(self, model_id):
+        stats = self._stats.get(model_id)
+        if stats is None:
+            stats = self._stats[model_id] = {
+                "detect_runs": 0, "propagated": 0, "frames": 0,
+                "detect_ms": 0.0, "propagate_ms": 0.0, "k": self.every,
+            }
+        return stats
+
+    def _current_k(self, stats):
+        if self.target_ms is None:
+            return self.every
+        detect_ms, propagate_ms = stats["detect_ms"], stats["propagate_ms"]
+        if stats["detect_runs"] == 0 or detect_ms <= self.target_ms:
+            return 1
+        # (detect + (K - 1) * propagate) / K <= target  ->  K >= (detect - propagate) / (target - propagate)
+        if propagate_ms >= self.target_ms:
+            return self.max_every
+        k = math.ceil((detect_ms - propagate_ms) / (self.target_ms - propagate_ms))
+        return max(1, min(k, self.max_every))
+
+    def _timed_detect(self, module, frame, context, stats):
+        t0 = time.perf_counter()
+        detections = call_with_context(module.detect, frame, context)
+        ms = (time.perf_counter() - t0) * 1000
+        with self._lock:
+            stats["detect_runs"] += 1
+            stats["detect_ms"] = ms if stats["detect_runs"] == 1 else stats["detect_ms"] * 0.8 + ms * 0.2
+        return detections
+
+    def detect(self, model_id, module, frame, context):
+        """Detections for `frame`: fresh from the model every K frames, propagated otherwise"""
+        with self._lock:
+            stats = self._model_stats(model_id)
+            stats["frames"] += 1
+            k = stats["k"] = self._current_k(stats)
+        if k <= 1 and self.target_ms is None:
+            return self._timed_detect(module, frame, context, stats)
+
+        key = (model_id, context.source)
+        state = self._states.get(key)
+        now = time.monotonic()
+        if state is None or now - state.updated_at > STALE_AFTER:
+            # New stream, or the model was switched away from and back: start over
+            state = self._states[key] = _StreamState()
+        state.updated_at = now
+        gray = context.scaled_gray(FLOW_SCALE)
+
+        logs = []
+        gap = 1  # frames between state.gray and this one
+        if state.pending is not None and state.pending.done():
+            future, state.pending = state.pending, None
+            # Re-raises detector errors; the next frame submits a new detection
+            state.adopt(future.result(), state.pending_gray)
+            logs = state.detections.logs  # detector logs once per detection, not per frame
+            gap = max(state.since_detect, 1)
+
+        if state.detections is None:
+            # Nothing to propagate yet: detect this frame synchronously. (A background
+            # run is only submitted once there are detections, so none is pending here)
+            state.adopt(self._timed_detect(module, frame, context, stats), gray)
+            state.since_detect = 1
+            return state.detections
+        if state.pending is None and state.since_detect >= k:
+            # The publish stage may draw on `frame` while the detector still
+            # reads it, so the background run gets its own copy and context
+            own = frame.copy()
+            own_context = FrameContext(own, context.seq, context.timestamp, context.source)
+            state.pending = self._executor.submit(self._timed_detect, module, own, own_context, stats)
+            if self.models is not None:
+                # The run may outlive this frame and a switch that evicts the model
+                self.models.acquire([module])
+                state.pending.add_done_callback(lambda _: self.models.release([module]))
+            state.pending_gray = gray
+            state.since_detect = 0
+
+        t0 = time.perf_counter()
+        result = self._propagate(state, gray, logs, gap)
+        ms = (time.perf_counter() - t0) * 1000
+        state.since_detect += 1
+        with self._lock:
+            stats["propagated"] += 1
+            stats["propagate_ms"] = ms if stats["propagated"] == 1 else stats["propagate_ms"] * 0.8 + ms * 0.2
+        return result
+
+    def _propagate(self, state, gray, logs, gap=1):
+        n = len(state.detections)
+        if n == 0 or gray is state.gray:
+            state.gray = gray
+            state.detections = shifted(state.detections, np.zeros((n, 2), np.float32), logs)
+            return state.detections
+
+        offsets = state.velocity * gap  # constant-velocity guess for boxes that lose their points
+        if len(state.points):
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(state.gray, gray, state.points, None, **LK_PARAMS)
+            good = status.ravel() == 1
+            delta = (moved - state.points).reshape(-1, 2)
+            for i in range(n):
+                mine = good & (state.owner == i)
+                if mine.sum() >= MIN_POINTS:
+                    offsets[i] = np.median(delta[mine], axis=0) / FLOW_SCALE
+            state.points, state.owner = moved[good], state.owner[good]
+
+        state.velocity = offsets / gap
+        state.detections = shifted(state.detections, offsets, logs)
+        state.gray = gray
+        # Top up boxes whose points drifted away or were lost
+        counts = np.bincount(state.owner, minlength=n) if len(state.owner) else np.zeros(n, int)
+        thin = counts < MIN_POINTS
+        if thin.any():
+            points, owner = seed_points(gray, state.detections.boxes[thin] * FLOW_SCALE)
+            state.points = np.concatenate([state.points.reshape(-1, 1, 2), points]).astype(np.float32)
+            state.owner = np.concatenate([state.owner, np.flatnonzero(thin)[owner]])
+        return state.detections
+
+    def stats(self):
+        with self._lock:
+            out = {}
+            for model_id, s in self._stats.items():
+                out[model_id] = {
+                    "k": s["k"],
+                    "effective_k": round(s["frames"] / s["detect_runs"], 2) if s["detect_runs"] else None,
+                    "frames": s["frames"],
+                    "detect_runs": s["detect_runs"],
+                    "propagated": s["propagated"],
+                    "detect_ms": round(s["detect_ms"], 2),
+                    "propagate_ms": round(s["propagate_ms"], 3),
+                }
+        return {"every": self.every, "target_ms": self.target_ms, "models": out}
@@ -4,27 +4,133 @@ Laptop Server - Receives Pi stream and serves to website
 Run this on your laptop
 """
 
+import argparse
 from flask import Flask, Response, send_file
 import cv2
 import requests
 import numpy as np
 import threading
+import time
+import metrics
+from broadcast import make_placeholder, multipart_chunk, part_header
+from ingest import IngestServer
+from mjpeg import MJPEGParser, read_chunks
 
-app = Flask(_name_)
+app = Flask(__name__)
 
 # Configuration
 PI_IP = "10.52.156.90"  # CHANGE THIS to your Raspberry Pi's IP
 PI_PORT = 5000
 LAPTOP_PORT = 8080
+INGEST_PORT = 9000  # the drone pushes frames here (see ingest.py)
+CHUNK_SIZE = 64 * 1024  # Large reads keep per-chunk overhead low on 1080p streams
 
-# Global variable for latest frame
-latest_frame = None
-frame_lock = threading.Lock()
+decode_seconds = metrics.histogram("server_decode_seconds")
+
+
+class JpegRelay:
+    """
+    Latest JPEG from the drone, forwarded to every viewer as received.
+
+    The compressed bytes are never re-encoded, so relaying costs the same at
+    any resolution and for any number of viewers, and the picture is exactly
+    the Pi's. Each frame is wrapped in its multipart part once and every
+    viewer writes that same bytes object. Viewers block until a newer frame
+    than the one they last sent arrives. Pixels are decoded only if someone
+    asks for them (frame()), at most once per frame.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._chunk = None     # multipart part of the latest frame
+        self._jpeg_at = 0      # where the JPEG starts inside it
+        self._decoded = (0, None)  # (seq, ndarray) of the last frame() call
+        self._decode_lock = threading.Lock()
+        self.received = 0
+        self.viewers = 0
+
+    def publish(self, jpeg):
+        header = part_header(len(jpeg))
+        self.publish_chunk(header + jpeg + b"\r\n", len(header))
+
+    def publish_chunk(self, chunk, jpeg_at):
+        """Publish a ready multipart part whose JPEG starts at `jpeg_at` (see ingest.py)"""
+        with self._cond:
+            self._seq += 1
+            self._chunk = chunk
+            self._jpeg_at = jpeg_at
+            self.received += 1
+            self._cond.notify_all()
+
+    def wait_next(self, last_seq, timeout=1.0):
+        """(seq, multipart part) newer than `last_seq`, or (last_seq, None) after `timeout`"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > last_seq, timeout=timeout):
+                return last_seq, None
+            return self._seq, self._chunk
+
+    def frame(self):
+        """Decoded latest frame (BGR ndarray), or None before the first one"""
+        with self._cond:
+            seq, chunk, start = self._seq, self._chunk, self._jpeg_at
+        if chunk is None:
+            return None
+        with self._decode_lock:
+            if self._decoded[0] != seq:
+                t0 = time.perf_counter()
+                jpeg = np.frombuffer(chunk, dtype=np.uint8, count=len(chunk) - start - 2, offset=start)
+                img = cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+                decode_seconds.observe(time.perf_counter() - t0)
+                self._decoded = (seq, img)
+            return self._decoded[1]
+
+    def frames(self):
+        """Multipart chunks for one viewer: every new frame once, never a repeat"""
+        with self._cond:
+            self.viewers += 1
+        try:
+            last_seq = 0
+            while True:
+                seq, chunk = self.wait_next(last_seq)
+                if chunk is None:
+                    if last_seq == 0:
+                        yield multipart_chunk(placeholder_jpeg())
+                    continue
+                last_seq = seq
+                yield chunk
+        finally:
+            with self._cond:
+                self.viewers -= 1
+
+
+relay = JpegRelay()
+ingest = None  # IngestServer once started
+_placeholder = None
+
+
+def placeholder_jpeg():
+    global _placeholder
+    if _placeholder is None:
+        _placeholder = cv2.imencode('.jpg', make_placeholder("Connecting to Pi...", (640, 480)))[1].tobytes()
+    return _placeholder
+
+
+def collect_metrics():
+    samples = [
+        ("server_frames_received_total", "counter", {}, relay.received),
+        ("server_viewers", "gauge", {}, relay.viewers),
+    ]
+    if ingest is not None:
+        samples.append(("server_ingest_connections", "gauge", {}, ingest.connections))
+        samples.append(("server_ingest_bytes_total", "counter", {}, ingest.bytes))
+    return samples
+
+
+metrics.register_collector(collect_metrics)
 
 def receive_stream():
     """Receive stream from Raspberry Pi"""
-    global latest_frame
-    
     stream_url = f"http://{PI_IP}:{PI_PORT}/video_feed"
     print(f"Connecting to Pi stream at {stream_url}...")
     
@@ -34,50 +140,22 @@ def receive_stream():
         if response.status_code == 200:
             print("✓ Connected to Pi camera stream!")
             
-            bytes_data = b''
-            for chunk in response.iter_content(chunk_size=1024):
-                bytes_data += chunk
-                
-                # Find start and end of JPEG
-                a = bytes_data.find(b'\xff\xd8')  # JPEG start
-                b = bytes_data.find(b'\xff\xd9')  # JPEG end
-                
-                if a != -1 and b != -1:
-                    jpg = bytes_data[a:b+2]
-                    bytes_data = bytes_data[b+2:]
-                    
-                    # Decode image
-                    img = cv2.imdecode(np.frombuffer(jpg, dtype=np.uint8), cv2.IMREAD_COLOR)
-                    
-                    if img is not None:
-                        with frame_lock:
-                            latest_frame = img
-                            
+            parser = MJPEGParser.from_content_type(response.headers.get('Content-Type'))
+            for chunk in read_chunks(response.raw, CHUNK_SIZE):
+                jpegs = parser.feed(chunk)
+                if not jpegs:
+                    continue
+
+                # Several frames may complete in one chunk; only the newest is worth forwarding
+                relay.publish(jpegs[-1])
+
     except Exception as e:
         print(f"Error receiving stream: {e}")
         print("Make sure the Pi server is running!")
 
 def generate_frames():
-    """Generate frames for web browser"""
-    global latest_frame
-    
-    while True:
-        with frame_lock:
-            if latest_frame is None:
-                # Create waiting message
-                blank = np.zeros((480, 640, 3), dtype=np.uint8)
-                cv2.putText(blank, "Connecting to Pi...", (150, 240), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-                frame = blank
-            else:
-                frame = latest_frame.copy()
-        
-        # Encode as JPEG
-        ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-        frame_bytes = buffer.tobytes()
-        
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+    """Generate frames for web browser: the Pi's own JPEGs, each sent once"""
+    return relay.frames()
 
 @app.route('/')
 def index():
@@ -103,19 +181,37 @@ def video_feed():
     return Response(generate_frames(),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
-if _name_ == '_main_':
-    # Start stream receiver in background thread
-    receiver_thread = threading.Thread(target=receive_stream, daemon=True)
-    receiver_thread.start()
+@app.route('/metrics')
+def prometheus_metrics():
+    """Relay counters and lazy decode times in Prometheus text format"""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Drone video relay")
+    parser.add_argument("--pi", default=PI_IP, help="Pull the MJPEG stream from this Pi")
+    parser.add_argument("--no-pull", action="store_true", help="Only accept frames pushed by the drone")
+    parser.add_argument("--ingest-port", type=int, default=INGEST_PORT, help="Port for pushed frames (0 disables)")
+    args = parser.parse_args()
+    PI_IP = args.pi
+
+    if args.ingest_port:
+        ingest = IngestServer(relay, port=args.ingest_port)
+    if not args.no_pull:
+        # Start stream receiver in background thread
+        receiver_thread = threading.Thread(target=receive_stream, daemon=True)
+        receiver_thread.start()
     
     print("\n" + "="*60)
     print("Laptop Server Starting...")
     print("="*60)
-    print(f"\nReceiving stream from Pi: http://{PI_IP}:{PI_PORT}")
+    if not args.no_pull:
+        print(f"\nReceiving stream from Pi: http://{PI_IP}:{PI_PORT}")
+    if ingest is not None:
+        print(f"\nAccepting pushed frames on port {ingest.port} (python benchmarks/fake_drone.py)")
     print(f"\nAccess website at:")
     print(f"  • http://localhost:{LAPTOP_PORT}")
     print(f"  • http://<your-laptop-ip>:{LAPTOP_PORT}")
     print("\nPress Ctrl+C to stop")
     print("="*60 + "\n")
     
-    app.run(host='0.0.0.0', port=LAPTOP_PORT, threaded=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=LAPTOP_PORT, threaded=True)
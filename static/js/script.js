@@ -6,7 +6,10 @@ document.addEventListener('DOMContentLoaded', () => {
     const statusDot = document.querySelector('.dot');
 
     let isConnected = false;
-    let knownLogSignatures = new Set(); // To avoid duplicates if we re-fetch same logs
+    const MAX_LOG_NODES = 500; // Oldest entries are dropped from the panel past this
+    let lastLogId = 0; // Highest server log id rendered so far
+    let pendingLogs = [];
+    let renderScheduled = false;
 
     function setStatus(connected) {
         isConnected = connected;
@@ -74,12 +77,12 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // Clear Logs
     clearLogsBtn.addEventListener('click', () => {
+        // lastLogId is kept, so cleared entries don't come back
         logsContainer.innerHTML = '';
-        knownLogSignatures.clear();
     });
 
-    // Add Log Entry to DOM
-    function addLogEntry(source, message, level, timestamp = null) {
+    // Build one log entry element
+    function createLogEntry(source, message, level, timestamp = null) {
         if (!timestamp) {
             const now = new Date();
             timestamp = now.toLocaleTimeString();
@@ -97,48 +100,78 @@ document.addEventListener('DOMContentLoaded', () => {
         <span class="message">${message}</span>
     </div>
 `;
+        return div;
+    }
 
-        logsContainer.appendChild(div);
+    // Keep the panel bounded however long the mission runs
+    function trimLogs() {
+        while (logsContainer.childElementCount > MAX_LOG_NODES) {
+            logsContainer.removeChild(logsContainer.firstElementChild);
+        }
         logsContainer.scrollTop = logsContainer.scrollHeight;
     }
 
-    // Poll Logs
+    // Add Log Entry to DOM
+    function addLogEntry(source, message, level, timestamp = null) {
+        logsContainer.appendChild(createLogEntry(source, message, level, timestamp));
+        trimLogs();
+    }
+
+    // Server logs are queued and rendered together once per animation frame
+    function queueLogs(logs) {
+        // Ids only go back when the server restarted: take its numbering from here
+        if (logs.length && logs[0].id <= lastLogId) {
+            lastLogId = logs[0].id - 1;
+        }
+        logs.forEach(log => {
+            if (log.id > lastLogId) {
+                pendingLogs.push(log);
+                lastLogId = log.id;
+            }
+        });
+        if (pendingLogs.length && !renderScheduled) {
+            renderScheduled = true;
+            requestAnimationFrame(renderPendingLogs);
+        }
+    }
+
+    function renderPendingLogs() {
+        renderScheduled = false;
+        // Only the newest MAX_LOG_NODES can stay on screen anyway
+        const batch = pendingLogs.slice(-MAX_LOG_NODES);
+        pendingLogs = [];
+
+        const fragment = document.createDocumentFragment();
+        batch.forEach(log => {
+            // With several video sources, show which one the log is about
+            const source = log.stream ? `${log.source} · ${log.stream}` : log.source;
+            // Repeats of the same AI message arrive folded into one entry
+            const message = log.count ? `${log.message} (×${log.count})` : log.message;
+            fragment.appendChild(createLogEntry(source, message, log.level, log.timestamp));
+        });
+        logsContainer.appendChild(fragment);
+        trimLogs();
+    }
+
+    // Stream Logs: the server pushes new entries as they are logged. EventSource
+    // reconnects by itself and resumes after the last entry it received.
+    function connectLogStream() {
+        const events = new EventSource('/api/logs/stream');
+        events.addEventListener('logs', (e) => {
+            if (!isConnected) setStatus(true);
+            queueLogs(JSON.parse(e.data));
+        });
+        events.onopen = () => setStatus(true);
+        events.onerror = () => setStatus(false);
+    }
+
+    // Fallback for browsers without EventSource: fetch only what's new
     async function pollLogs() {
         try {
-            const response = await fetch('/api/logs');
+            const response = await fetch(`/api/logs?since=${lastLogId}`);
             if (response.ok) {
                 if (!isConnected) setStatus(true);
-
-                const logs = await response.json();
-
-                // If we have significantly fewer logs than before, the server might have restarted or cleared logs.
-                // In that case, we should clear our local display.
-                // However, for now, let's just assume appending new ones.
-
-                // Sort logs by timestamp just in case
-                // logs.sort((a, b) => new Date(a.timestamp) - new Date(b.timestamp));
-
-                let newLogsCount = 0;
-
-                logs.forEach(log => {
-                    // Create a unique signature for the log to dedup
-                    const signature = `${log.timestamp}-${log.source}-${log.message}`;
-                    if (!knownLogSignatures.has(signature)) {
-                        addLogEntry(log.source, log.message, log.level, log.timestamp);
-                        knownLogSignatures.add(signature);
-                        newLogsCount++;
-                    }
-                });
-
-                // Prune knownLogSignatures if it gets too big (optional memory management)
-                if (knownLogSignatures.size > 2000) {
-                    knownLogSignatures.clear();
-                    // This might cause re-rendering execution if we don't clear DOM, but usually server keeps last 100. 
-                    // So actually, we should align with server.
-                    // A simple way is: if server logs != what we have, sync. 
-                    // But appending is safer for "streaming" feel.
-                }
-
+                queueLogs(await response.json());
             } else {
                 setStatus(false);
             }
@@ -151,7 +184,11 @@ document.addEventListener('DOMContentLoaded', () => {
     // Initial Load
     fetchModels();
 
-    // Interval
-    setInterval(pollLogs, 1000);
+    // Live logs
+    if (window.EventSource) {
+        connectLogStream();
+    } else {
+        setInterval(pollLogs, 1000);
+    }
 
 });
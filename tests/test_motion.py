@@ -0,0 +1,69 @@
+"""MotionGate reuse and crop paths when the model found nothing"""
+import os
+import sys
+import types
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from frame_context import FrameContext  # noqa: E402
+from motion import MotionGate, concat  # noqa: E402
+from pipeline import FramePacket  # noqa: E402
+from results import Detections  # noqa: E402
+
+
+def empty_detections():
+    return Detections(np.zeros((0, 4)), np.zeros(0), np.zeros(0), labels=[], identities=[], logs=["nothing"])
+
+
+def draw(frame, detections):
+    # What yolov8 / opencv-face draw() rely on
+    for _ in zip(detections.labels, detections.scores.tolist(), detections.identities):
+        pass
+    return frame
+
+
+def fake_model():
+    return types.SimpleNamespace(detect=lambda frame, context=None: empty_detections(), draw=draw,
+                                 SUPPORTS_CROPS=True)
+
+
+def test_concat_of_empty_parts_keeps_empty_fields():
+    merged = concat([empty_detections(), empty_detections()], logs=["a"])
+    assert len(merged) == 0
+    assert merged.scores is not None and merged.scores.shape == (0,)
+    assert merged.labels == [] and merged.identities == []
+    assert merged.logs == ["a"]
+    assert concat([]).scores is None
+
+
+def test_reused_and_cropped_empty_results_can_be_drawn():
+    gate = MotionGate(threshold=0.001, crop=True, refresh=60)
+    model = fake_model()
+    still = np.zeros((480, 640, 3), np.uint8)
+
+    context = FrameContext(still, 1, 0.0, "drone")
+    assert not gate.check(context, ["fake"])
+    packet = FramePacket(1, still)
+    packet.output, packet.results = still, [("fake", model, model.detect(still))]
+    gate.update(context, [("fake", model)], packet)
+
+    # Same frame again: skipped, the empty results are reused
+    context = FrameContext(still.copy(), 2, 0.0, "drone")
+    assert gate.check(context, ["fake"])
+    packet = FramePacket(2, context.image)
+    gate.reuse("drone", packet)
+    for _, module, detections in packet.results:
+        assert detections.logs == []
+        module.draw(packet.output, detections)
+
+    # Something moved in one corner: only a crop around it is searched
+    moved = still.copy()
+    moved[20:80, 20:80] = 255
+    context = FrameContext(moved, 3, 0.0, "drone")
+    assert not gate.check(context, ["fake"])
+    assert gate.can_crop("fake", model, context)
+    detections = gate.detect("fake", model, moved, context)
+    assert len(detections) == 0 and detections.logs == ["nothing"]
+    model.draw(moved, detections)
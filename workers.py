@@ -0,0 +1,349 @@
+"""
+Out-of-process model workers.
+
+With `python app.py --model-workers`, each model runs in its own worker
+process instead of in the server process. Python-level model code (box and
+landmark loops, drawing) then no longer competes with the web server for the
+GIL, and a crash inside native code (dlib, MediaPipe) only takes the worker
+down.
+
+A ProcessModel stands in for the plugin module: it has detect()/draw() or
+process_frame() exactly when the plugin does, so the pipeline and registry
+use it unchanged. Pixels never go through pickle: the server copies each frame
+into a free slot of a shared-memory ring, the worker runs the plugin on a
+numpy view of that slot (and draws into it), and only the slot number, the
+frame's shape and the small results (Detections, log lines) cross the pipe.
+
+The worker is supervised: if it dies or a call takes longer than `timeout`,
+the calls in flight fail, the process is killed and a new one is started
+(with backoff if it keeps failing), and later calls go to the new worker.
+"""
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import logs
+
+MAX_FRAME_BYTES = 3840 * 2160 * 3  # one 4K BGR frame per slot; pages are only touched as used
+SLOTS = 4                          # frames in flight at once (e.g. several sources)
+STARTUP_TIMEOUT = 120.0            # plugins load their weights at import
+CALL_TIMEOUT = 10.0
+MAX_RESTART_DELAY = 30.0
+FLAGS = ("SUPPORTS_CROPS",)        # plugin constants the pipeline checks, copied onto the proxy
+STABLE_UPTIME = 60.0               # a worker that dies sooner than this is restarted with backoff
+
+
+class WorkerError(RuntimeError):
+    """The worker died, hung or is restarting; the call did not complete"""
+
+
+def _worker_main(model_id, models_dir, shm_name, slot_bytes, conn, threads):
+    """Worker process: import the plugin and serve requests from `conn`"""
+    from frame_context import FrameContext, call_with_context
+    from registry import import_model
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        module = import_model(models_dir, model_id)
+    except BaseException as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    functions = [name for name in ("detect", "draw", "process_frame", "get_stats", "reload", "close")
+                 if callable(getattr(module, name, None))]
+    flags = {name: getattr(module, name) for name in FLAGS if hasattr(module, name)}
+    conn.send(("ready", (functions, flags)))
+
+    send_lock = threading.Lock()
+
+    def view(slot, shape):
+        return np.ndarray(shape, np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+
+    def handle(request_id, op, slot, shape, meta):
+        try:
+            if op == "detect":
+                frame = view(slot, shape)
+                result = call_with_context(module.detect, frame, FrameContext(frame, *meta))
+            elif op == "draw":
+                frame = view(slot, shape)
+                out = module.draw(frame, meta)
+                if out is not frame:
+                    np.copyto(frame, out)
+                result = None
+            elif op == "process_frame":
+                frame = view(slot, shape)
+                out, lines = call_with_context(module.process_frame, frame, FrameContext(frame, *meta))
+                if out is not None and out is not frame:
+                    np.copyto(frame, out)
+                result = (out is not None, lines)
+            else:
+                result = getattr(module, op)()
+            reply = (request_id, True, result)
+        except Exception as e:
+            reply = (request_id, False, f"{type(e).__name__}: {e}")
+        with send_lock:
+            conn.send(reply)
+
+    # Several requests at once, so plugins that batch across sources (yolov8) still can
+    executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="worker")
+    try:
+        while True:
+            request = conn.recv()
+            if request is None:
+                break
+            executor.submit(handle, *request)
+    except (EOFError, OSError):
+        pass  # the server went away
+    finally:
+        executor.shutdown(wait=True)
+        if "close" in functions:
+            module.close()
+        shm.close()
+
+
+class ProcessModel:
+    """A model plugin running in a supervised worker process"""
+
+    def __init__(self, model_id, models_dir="models", slots=SLOTS, max_frame_bytes=MAX_FRAME_BYTES,
+                 timeout=CALL_TIMEOUT, startup_timeout=STARTUP_TIMEOUT):
+        self.model_id = model_id
+        self.models_dir = models_dir
+        self.slots = slots
+        self.slot_bytes = max_frame_bytes
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self._ctx = multiprocessing.get_context("spawn")  # forking a threaded server is unsafe
+        self._shm = shared_memory.SharedMemory(create=True, size=slots * max_frame_bytes)
+        self._free = queue.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+        self._ids = itertools.count(1)
+        self._pending = {}   # request id -> [Event, ok, result]
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._process = None
+        self._conn = None
+        self._generation = 0
+        self._restarting = False
+        self._closed = False
+        self._started_at = None
+        self._restart_delay = 1.0   # grows while workers keep dying soon after starting
+        self.restarts = 0
+        self.calls = 0
+        self.failures = 0
+        try:
+            self.functions, flags = self._start()
+        except BaseException:
+            self._shm.close()
+            self._shm.unlink()
+            raise
+        # Expose exactly the plugin's interface, so hasattr() checks see what they would in-process
+        for name in ("detect", "draw", "process_frame", "reload"):
+            if name in self.functions:
+                setattr(self, name, getattr(self, "_" + name))
+        for name, value in flags.items():
+            setattr(self, name, value)
+
+    # === Process management ===
+
+    def _start(self):
+        """Spawn a worker and wait until the plugin is imported. Returns the plugin's (functions, flags)"""
+        parent, child = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main, name=f"model-{self.model_id}", daemon=True,
+            args=(self.model_id, self.models_dir, self._shm.name, self.slot_bytes, child, self.slots))
+        process.start()
+        child.close()
+        if not parent.poll(self.startup_timeout):
+            process.kill()
+            raise WorkerError(f"{self.model_id} worker did not start within {self.startup_timeout:.0f}s")
+        try:
+            status, payload = parent.recv()
+        except EOFError:
+            process.join(1)
+            raise WorkerError(f"{self.model_id} worker exited during startup (code {process.exitcode})")
+        if status != "ready":
+            process.join(1)
+            raise ImportError(payload)
+        with self._lock:
+            self._process, self._conn = process, parent
+            self._started_at = time.monotonic()
+            self._generation += 1
+            generation = self._generation
+        threading.Thread(target=self._read_replies, args=(parent, generation),
+                         name=f"worker-replies-{self.model_id}", daemon=True).start()
+        return payload
+
+    def _read_replies(self, conn, generation):
+        while True:
+            try:
+                request_id, ok, result = conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                waiter = self._pending.pop(request_id, None)
+            if waiter is not None:
+                waiter[1], waiter[2] = ok, result
+                waiter[0].set()
+        self._failed(generation, "exited")
+
+    def _failed(self, generation, reason):
+        """Fail everything in flight on `generation` and restart the worker (once per generation)"""
+        with self._lock:
+            if generation != self._generation or self._restarting or self._closed:
+                return
+            self._restarting = True
+            pending, self._pending = self._pending, {}
+            process = self._process
+        for waiter in pending.values():
+            waiter[1], waiter[2] = False, f"worker {reason}"
+            waiter[0].set()
+        if process is not None and process.is_alive():
+            process.kill()
+        if process is not None:
+            process.join(1)
+        code = process.exitcode if process is not None else None
+        logs.log("Worker", f"{self.model_id} worker {reason} (exit code {code}), restarting", "ERROR")
+        threading.Thread(target=self._restart, name=f"worker-restart-{self.model_id}", daemon=True).start()
+
+    def _restart(self):
+        # A worker that crashes on every frame would otherwise be respawned (and
+        # its weights reloaded) as fast as frames arrive
+        if self._started_at is not None and time.monotonic() - self._started_at < STABLE_UPTIME:
+            delay = self._restart_delay
+            self._restart_delay = min(delay * 2, MAX_RESTART_DELAY)
+            logs.log("Worker", f"{self.model_id} worker died soon after starting, restarting in {delay:.0f}s",
+                     "WARNING")
+            time.sleep(delay)
+        else:
+            self._restart_delay = 1.0
+        delay = 1.0
+        while not self._closed:
+            try:
+                self._start()
+                self.restarts += 1
+                logs.log("Worker", f"{self.model_id} worker restarted", "SUCCESS")
+                break
+            except Exception as e:
+                logs.log("Worker", f"{self.model_id} worker failed to start: {e}", "ERROR")
+                time.sleep(delay)
+                delay = min(delay * 2, MAX_RESTART_DELAY)
+        with self._lock:
+            self._restarting = False
+
+    def rss_bytes(self):
+        """Resident memory of the worker process (what the registry charges to this model)"""
+        process = self._process
+        try:
+            with open(f"/proc/{process.pid}/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, AttributeError):
+            return 0
+
+    # === Calls ===
+
+    def _call(self, op, frame=None, meta=None, copy_back=None):
+        """Send one request; frames travel through a shared-memory slot, the rest through the pipe"""
+        slot = None
+        if frame is not None:
+            if frame.nbytes > self.slot_bytes or frame.dtype != np.uint8:
+                raise ValueError(f"Frame {frame.shape} {frame.dtype} does not fit a worker slot")
+            try:
+                slot = self._free.get(timeout=self.timeout)
+            except queue.Empty:
+                raise WorkerError(f"{self.model_id}: no free frame slot")
+        try:
+            view = None
+            if slot is not None:
+                view = np.ndarray(frame.shape, np.uint8, buffer=self._shm.buf, offset=slot * self.slot_bytes)
+                np.copyto(view, frame)
+            waiter = [threading.Event(), False, None]
+            with self._lock:
+                if self._restarting or self._conn is None:
+                    raise WorkerError(f"{self.model_id} worker is restarting")
+                request_id = next(self._ids)
+                self._pending[request_id] = waiter
+                conn, generation = self._conn, self._generation
+            try:
+                with self._send_lock:
+                    conn.send((request_id, op, slot, frame.shape if frame is not None else None, meta))
+            except (OSError, ValueError):
+                self._failed(generation, "pipe closed")
+            self.calls += 1
+            if not waiter[0].wait(self.timeout):
+                self.failures += 1
+                self._failed(generation, f"hung in {op}() for over {self.timeout:.0f}s")
+                raise WorkerError(f"{self.model_id}: {op}() timed out")
+            ok, result = waiter[1], waiter[2]
+            if not ok:
+                self.failures += 1
+                raise WorkerError(f"{self.model_id}: {result}")
+            if copy_back is not None:
+                copy_back(view)
+            return result
+        finally:
+            if slot is not None:
+                self._free.put(slot)
+
+    @staticmethod
+    def _meta(context):
+        return (context.seq, context.timestamp, context.source) if context is not None else (None, None, None)
+
+    def _detect(self, frame, context=None):
+        return self._call("detect", frame, self._meta(context))
+
+    def _draw(self, frame, detections):
+        # Drawing runs in the worker too; the annotated pixels come back into `frame`
+        self._call("draw", frame, detections, copy_back=lambda view: np.copyto(frame, view))
+        return frame
+
+    def _process_frame(self, frame, context=None):
+        out = {}
+
+        def copy_back(view):
+            out["frame"] = view.copy()
+
+        annotated, lines = self._call("process_frame", frame, self._meta(context), copy_back)
+        return (out["frame"] if annotated else None), lines
+
+    def get_stats(self):
+        stats = self._call("get_stats") if "get_stats" in self.functions else {}
+        return dict(stats or {}, worker=self.stats())
+
+    def _reload(self):
+        return self._call("reload")
+
+    def stats(self):
+        process = self._process
+        return {
+            "pid": process.pid if process is not None else None,
+            "alive": process is not None and process.is_alive(),
+            "calls": self.calls,
+            "failures": self.failures,
+            "restarts": self.restarts,
+            "rss_mb": round(self.rss_bytes() / (1024 * 1024), 1),
+        }
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            process, conn = self._process, self._conn
+        if conn is not None:
+            try:
+                with self._send_lock:
+                    conn.send(None)
+            except (OSError, ValueError):
+                pass
+        if process is not None:
+            process.join(5)
+            if process.is_alive():
+                process.kill()
+                process.join(1)
+        self._shm.close()
+        self._shm.unlink()